@@ -1,35 +1,59 @@
 # ============ Descriptive Statistics for the data =================
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from collections import defaultdict
-from itertools import combinations
 from datetime import datetime
-import seaborn as sns
-from matplotlib import pyplot as plt
-from IPython.display import display
+from data_cache import ORG_FILE, PROJ_FILE, TOPIC_FILE, read_table
+
+def display(obj):
+    """Rich display inside a notebook, plain print elsewhere; IPython is imported only here"""
+    try:
+        from IPython.display import display as ipython_display
+    except ImportError:
+        print(obj)
+        return
+    ipython_display(obj)
+
+def build_incidence_matrix(org_df, key='organisationID'):
+    """Integer-coded sparse binary project x organization incidence matrix B.
+
+    B[p, o] = 1 when organization o takes part in project p (repeated rows count
+    once), so the co-occurrence matrix BᵀB holds, for every pair of organizations,
+    the number of projects they share.
+    Returns (B, the participation rows used, their project codes, organization IDs by code).
+    """
+    rows = org_df[org_df['projectID'].notna() & org_df[key].notna()]
+    rows = rows[~rows[['projectID', key]].astype(str).duplicated()]
+    project_codes, project_ids = pd.factorize(rows['projectID'].astype(str))
+    org_codes, org_ids = pd.factorize(rows[key].astype(str))
+    incidence = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (project_codes, org_codes)),
+        shape=(len(project_ids), len(org_ids)),
+    )
+    return incidence, rows, project_codes, np.asarray(org_ids)
 
 def build_network_analysis():
     print('Loading data...')
 
     try: 
         # ============= 0. Preprocessing Data =============
-        # Read the excel files
-        org_df = pd.read_excel('dataset/projects/organization.xlsx') 
+        # Read the excel files (through the columnar cache)
+        org_df = read_table(ORG_FILE)
         print(f'Loaded {len(org_df)} organization observations.')
 
-        proj_df = pd.read_excel('dataset/projects/project.xlsx')
+        proj_df = read_table(PROJ_FILE)
         print(f'Loaded {len(proj_df)} projects.')
 
-        topic_df = pd.read_excel('dataset/projects/topics.xlsx')    
+        topic_df = read_table(TOPIC_FILE)
         print(f'Loaded {len(topic_df)} topics.')
 
-        # Group organizations by `projectID`
-        project_org = org_df.groupby('projectID').apply(lambda x: x.to_dict('records')).to_dict()
-        # lambda x: x.to_dict('records') converts each df to a list of dictionaries. keys = col, values = row  
-        print(f'{len(project_org)} unique projects with organizations.')
+        # Count organizations (rows) per `projectID`
+        project_sizes = org_df['projectID'].value_counts()
+        print(f'{len(project_sizes)} unique projects with organizations.')
 
         # Identify collaborations between organizations 
-        collaborative_proj = [project_id for project_id, orgs in project_org.items() if len(orgs) > 1] 
+        collaborative_proj = project_sizes.index[project_sizes > 1].tolist()
         print(f'{len(collaborative_proj)} projects with multiple organizations.')
 
         # Calculate the distribution of organizations per project
@@ -39,70 +63,58 @@ def build_network_analysis():
         #    print(f'{count} organizations: {projects} projects')
 
         # ================= 1. Build Network pairs =================
-        collaborations = []
-        total_collaborations_pairs = 0 
-
-        for project_id in collaborative_proj:
-            orgs = project_org[project_id]
-
-            # Generate all possible pairs of organizations
-            for org1, org2 in combinations(orgs, 2):
-            # combinations() returns all possible pairs between orgs
-                collaborations.append({
-                    'projectID': project_id,
-                    'org1': org1.get('organizationID'),
-                    'org1_name': org1.get('name'),
-                    'org1_country': org1.get('country'),
-                    'org2': org2.get('organizationID'),
-                    'org2_name': org2.get('name'),
-                    'org2_country': org2.get('country')
-                })
-                total_collaborations_pairs += 1 
+        # Sparse incidence matrix instead of one dict per pair: memory grows with the nonzeros
+        incidence, org_rows, project_codes, org_ids = build_incidence_matrix(org_df)
+        orgs_per_project = np.asarray(incidence.sum(axis=1)).ravel()
+        total_collaborations_pairs = int((orgs_per_project * (orgs_per_project - 1) // 2).sum())
+
+        # co_occurrence[a, b] = number of projects shared by organizations a and b
+        co_occurrence = (incidence.T @ incidence).tocsr()
+        co_occurrence.setdiag(0)
+        co_occurrence.eliminate_zeros()
 
         print(f'Generated {total_collaborations_pairs} collaboration pairs.')
 
         # ================= 2. Calculate Institution Degrees =================
-        org_partners = defaultdict(set)  # defaultdict is a dictionary that initializes missing keys with a default value
-
-        # Create a dictionary of organizations and their partners
-        for collab in collaborations:
-            org1_name = collab['org1_name']  
-            org2_name = collab['org2_name']
-            org_partners[org1_name].add(org2_name)
-            org_partners[org2_name].add(org1_name)
-            
-        print(f'Number of collaboration: {len(collaborations)}\n')
+        # Number of distinct partners = nonzeros per row of the co-occurrence matrix
+        degrees = np.diff(co_occurrence.indptr)
+        connected = np.flatnonzero(degrees > 0)
+        org_degrees = dict(zip(org_ids[connected].tolist(), degrees[connected].tolist()))
 
-        # Convert sets to counts 
-        org_degrees = {org: len(partners) for org, partners in org_partners.items()}
+        print(f'Number of collaboration: {total_collaborations_pairs}\n')
 
         # Find organizations with the highest degree of collaborations
         print('Top10 organizations with the highest number of collaborations:\n')
-        top10_orgs = sorted(org_degrees.items(), key = lambda x: x[1], reverse = True)[:10]
-
-        def get_organization_by_name(org_name, org_df):
-            matching_orgs = org_df[org_df['name'] == org_name]
-            if matching_orgs.empty:
-                return None 
-            return matching_orgs.iloc[0] # .iloc[0] returns the first row
+        first_rows = org_rows.assign(organisationID=org_rows['organisationID'].astype(str)).drop_duplicates('organisationID')
+        org_info = first_rows.set_index('organisationID')
+        top10_orgs = np.argsort(-degrees, kind='stable')[:10]
 
-        for i, (org_name, degree) in enumerate(top10_orgs, 1): # enumerate(, 1) starts the index at 1
-            org = get_organization_by_name(org_name, org_df)
-            if org is not None:
-                print(f'{i}. {org_name} ({org["country"]}): {degree} partners')
-            else:
-                print(f'{i}. {org_name} (Unknown): {degree} partners')
+        for i, code in enumerate(top10_orgs, 1): # enumerate(, 1) starts the index at 1
+            org = org_info.loc[org_ids[code]]
+            country = org['country'] if pd.notna(org.get('country')) else 'Unknown'
+            print(f'{i}. {org["name"]} ({country}): {degrees[code]} partners')
 
         # ================= 3. Calculate Country Contributions =================
-        country_collaborations = defaultdict(int)
-        # print(collaborations[:2])
-
-        for collab in collaborations:
-            # Skip collaborations with missing country information 
-            if pd.isna(collab['org1_country']) or pd.isna(collab['org2_country']):
-                continue
-            country_pair = '-'.join(sorted([collab['org1_country'], collab['org2_country']]))
-            country_collaborations[country_pair] += 1
+        # Same trick with a project x country matrix K: (KᵀK)[a, b] counts the pairs between
+        # countries a != b, and pairs inside country a are (KᵀK[a, a] - participations of a) / 2.
+        # Rows with missing country information are skipped
+        country_codes, countries = pd.factorize(org_rows['country'])
+        has_country = country_codes >= 0
+        country_incidence = sp.csr_matrix(
+            (np.ones(int(has_country.sum()), dtype=np.int64), (project_codes[has_country], country_codes[has_country])),
+            shape=(incidence.shape[0], len(countries)),
+        )
+        country_pairs = sp.triu(country_incidence.T @ country_incidence).tocoo()
+        country_totals = np.asarray(country_incidence.sum(axis=0)).ravel()
+        pair_counts = np.where(
+            country_pairs.row == country_pairs.col,
+            (country_pairs.data - country_totals[country_pairs.row]) // 2,
+            country_pairs.data,
+        )
+        country_collaborations = {}
+        for a, b, count in zip(country_pairs.row.tolist(), country_pairs.col.tolist(), pair_counts.tolist()):
+            if count > 0:
+                country_collaborations['-'.join(sorted([countries[a], countries[b]]))] = count
 
         print('Top 10 country collaborations:\n')
         top_countries = sorted(country_collaborations.items(), key = lambda x: x[1], reverse = True)[:10]
@@ -110,23 +122,12 @@ def build_network_analysis():
             print(f"{i}. {country_pair}: {count} collaborations")
 
         # ================= 4. Calculate Network Metrics =================
-        unique_organizations = set() # set() is a collection of unique elements
-        for collab in collaborations:
-            unique_organizations.add(collab['org1_name'])
-            unique_organizations.add(collab['org2_name'])
-        # list(unique_organizations)[:2]
-
-        # Count nodes
-        num_nodes = len(unique_organizations)
+        # Count nodes (organizations with at least one partner)
+        num_nodes = len(connected)
         max_possible_edges = (num_nodes * (num_nodes - 1)) / 2 
 
-        # Count unique organization pairs 
-        unique_pairs = set()
-        for collab in collaborations:
-            pair = '-'.join(sorted([collab['org1_name'], collab['org2_name']]))
-            unique_pairs.add(pair)
-
-        actual_edges = len(unique_pairs)
+        # Count unique organization pairs (each stored twice in the symmetric matrix)
+        actual_edges = co_occurrence.nnz // 2
         network_density = actual_edges / max_possible_edges 
         print("Network metrics:\n")
         print(f"Nodes (organizations): {num_nodes}")
@@ -135,6 +136,14 @@ def build_network_analysis():
         print(f"Network density: {network_density:.6f}")
         print(f"Average degree (collaborations): {(2 * actual_edges / num_nodes):.2f}")
 
+        # Unique collaborating pairs with the number of shared projects, keyed by organisationID
+        pairs = sp.triu(co_occurrence, k=1).tocoo()
+        collaborations = pd.DataFrame({
+            'org1': org_ids[pairs.row],
+            'org2': org_ids[pairs.col],
+            'projects': pairs.data,
+        })
+
         # ================= 5. Organization/Coordinator Types =================
         # - `HES`: Higher Education Institutions
         # - `PRC`: PRivate Companies 
@@ -191,8 +200,10 @@ def build_network_analysis():
             'proj_df': proj_df,
             'topic_df': topic_df, 
             'collaborations': collaborations,
+            'co_occurrence': co_occurrence,
+            'organisation_ids': org_ids,
             'org_degrees': org_degrees,
-            'country_collaborations': dict(country_collaborations),
+            'country_collaborations': country_collaborations,
             'network_metrics': {
                 'nodes': num_nodes,
                 'edges': actual_edges,
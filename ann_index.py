@@ -0,0 +1,308 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from collaboration_engine import EMBEDDINGS_FILE, GAE_DIR, blocked_top_k, load_collaboration_engine, _sigmoid
+from data_cache import publish_dir, source_fingerprint, tmp_dir_for
+
+IVF_DIR = os.path.join(GAE_DIR, "ivf")
+IVF_FORMAT_VERSION = 1
+# Lists probed per query by default; more probes trade throughput for recall
+DEFAULT_N_PROBE = 8
+# Extra candidates fetched per organization during regeneration, to survive partner exclusion
+EXCLUSION_MARGIN = 20
+QUERY_BATCH_SIZE = 4096
+# Queries per exact blocked search: bounds its dense (queries x block rows) score block
+EXACT_QUERY_BLOCK = 256
+# Below this many organizations exact search is fast enough and regeneration skips the index
+EXACT_SEARCH_MAX_ROWS = 20000
+_ARRAYS = ("centroids", "list_offsets", "list_rows", "list_vectors")
+
+
+def _assign(vectors, centroids, block_rows=65536):
+    """Nearest centroid (L2) of every vector, computed in row blocks"""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+def kmeans(vectors, n_clusters, iterations=15, seed=42):
+    """Lloyd's k-means with vectorized assignment; empty clusters are re-seeded"""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        if not filled.all():
+            centroids[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index for maximum inner product search over the GAE embeddings.
+
+    Embeddings are clustered with k-means into `n_lists` lists; vectors are
+    stored contiguously per list (`list_vectors`, with their original rows in
+    `list_rows`). A query scores the centroids, probes the `n_probe` best lists
+    and ranks only their members, so cost falls from O(N) to about
+    O(n_lists + n_probe * N / n_lists) per query. `n_probe` is the recall/latency knob.
+    """
+
+    def __init__(self, centroids, list_offsets, list_rows, list_vectors):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.list_vectors = list_vectors
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, iterations=15, sample_size=None, seed=42):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n = len(embeddings)
+        n_lists = int(np.clip(n_lists or 4 * np.sqrt(n), 1, max(n, 1)))
+        sample_size = sample_size or min(n, 256 * n_lists)
+        sample = embeddings[np.random.default_rng(seed).choice(n, sample_size, replace=False)] if sample_size < n else embeddings
+        centroids = kmeans(sample, n_lists, iterations=iterations, seed=seed)
+        labels = _assign(embeddings, centroids)
+        list_rows = np.argsort(labels, kind="stable")
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+        return cls(centroids, list_offsets, list_rows, embeddings[list_rows])
+
+    def search(self, queries, k, n_probe=DEFAULT_N_PROBE, batch_size=QUERY_BATCH_SIZE):
+        """Approximate top-k rows by inner product for each query: (rows, scores), best first.
+
+        Queries are processed in batches, list by list: every list is scored once
+        against all queries of the batch that probe it, with a single matrix product.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n_probe = min(n_probe, self.n_lists)
+        all_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for batch_start in range(0, len(queries), batch_size):
+            batch = queries[batch_start:batch_start + batch_size]
+            best_rows = np.full((len(batch), k), -1, dtype=np.int64)
+            best_scores = np.full((len(batch), k), -np.inf, dtype=np.float32)
+
+            centroid_scores = batch @ self.centroids.T
+            if n_probe < self.n_lists:
+                probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+            else:
+                probes = np.broadcast_to(np.arange(self.n_lists), centroid_scores.shape)
+            # Invert (query, list) pairs so each probed list is visited once per batch
+            probe_lists = probes.ravel()
+            probe_queries = np.repeat(np.arange(len(batch)), n_probe)
+            order = np.argsort(probe_lists, kind="stable")
+            probe_lists, probe_queries = probe_lists[order], probe_queries[order]
+            bounds = np.flatnonzero(np.diff(probe_lists)) + 1
+            for group in np.split(np.arange(len(probe_lists)), bounds):
+                if len(group) == 0:
+                    continue
+                lst = probe_lists[group[0]]
+                start, stop = self.list_offsets[lst], self.list_offsets[lst + 1]
+                if start == stop:
+                    continue
+                members = probe_queries[group]
+                scores = batch[members] @ np.asarray(self.list_vectors[start:stop]).T
+                rows = np.broadcast_to(np.asarray(self.list_rows[start:stop]), scores.shape)
+                merged_scores = np.concatenate([best_scores[members], scores], axis=1)
+                merged_rows = np.concatenate([best_rows[members], rows], axis=1)
+                keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+                best_scores[members] = np.take_along_axis(merged_scores, keep, axis=1)
+                best_rows[members] = np.take_along_axis(merged_rows, keep, axis=1)
+
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            all_rows[batch_start:batch_start + len(batch)] = np.take_along_axis(best_rows, order, axis=1)
+            all_scores[batch_start:batch_start + len(batch)] = np.take_along_axis(best_scores, order, axis=1)
+        all_rows[~np.isfinite(all_scores)] = -1
+        return all_rows, all_scores
+
+    def save(self, directory):
+        directory = os.fspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        directory = os.fspath(directory)
+        mode = "r" if mmap else None
+        return cls(**{name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in _ARRAYS})
+
+
+def load_or_build_ivf_index(embeddings_file=EMBEDDINGS_FILE, directory=IVF_DIR, n_lists=None, rebuild=False):
+    """Load the IVF index of the current embeddings, (re)building it when they changed"""
+    meta_path = os.path.join(directory, "meta.json")
+    expected = {"format": IVF_FORMAT_VERSION, "embeddings": source_fingerprint(embeddings_file)}
+    if os.path.exists(meta_path) and not rebuild:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if all(meta.get(key) == value for key, value in expected.items()) and (n_lists is None or meta.get("n_lists") == n_lists):
+                return IVFIndex.load(directory)
+        except Exception as e:
+            print(f"Error loading IVF index from {directory}, rebuilding it: {e}")
+
+    start = time.perf_counter()
+    index = IVFIndex.build(np.load(embeddings_file, mmap_mode="r"), n_lists=n_lists)
+    try:
+        tmp_dir = tmp_dir_for(directory)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        index.save(tmp_dir)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({**expected, "n_lists": index.n_lists}, f)
+        if not publish_dir(tmp_dir, directory):
+            print(f"IVF index published concurrently by another process, loading {directory}.")
+            return IVFIndex.load(directory)
+    except OSError as e:
+        print(f"Could not persist IVF index: {e}")
+        return index
+    print(f"IVF index with {index.n_lists} lists built in {time.perf_counter() - start:.1f}s and saved to {directory}.")
+    return index
+
+
+def exact_top_k(embeddings, queries, k, query_block=EXACT_QUERY_BLOCK):
+    """Exact blocked search, `query_block` queries at a time; returns (rows, scores)"""
+    results = [blocked_top_k(embeddings, queries[i:i + query_block], k) for i in range(0, len(queries), query_block)]
+    if not results:
+        return blocked_top_k(embeddings, queries, k)
+    return np.concatenate([rows for rows, _ in results]), np.concatenate([scores for _, scores in results])
+
+
+def recall_report(index, embeddings, k=10, n_probe_values=(1, 2, 4, 8, 16, 32), n_queries=1000, seed=42):
+    """Recall@k and throughput of the index against exact blocked search, per n_probe"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(embeddings), min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[sample]
+
+    start = time.perf_counter()
+    exact_rows, _ = exact_top_k(embeddings, queries, k)
+    exact_seconds = time.perf_counter() - start
+
+    results = []
+    for n_probe in n_probe_values:
+        if n_probe > index.n_lists:
+            break
+        start = time.perf_counter()
+        rows, _ = index.search(queries, k, n_probe=n_probe)
+        seconds = time.perf_counter() - start
+        hits = sum(len(np.intersect1d(a[a >= 0], b[b >= 0])) for a, b in zip(rows, exact_rows))
+        results.append({
+            "n_probe": int(n_probe),
+            "recall_at_k": hits / exact_rows[exact_rows >= 0].size,
+            "queries_per_second": len(queries) / seconds,
+            "speedup_vs_exact": exact_seconds / seconds,
+        })
+    return {"k": k, "n_queries": len(queries), "n_lists": index.n_lists, "n_rows": len(embeddings),
+            "exact_queries_per_second": len(queries) / exact_seconds, "results": results}
+
+
+def regenerate_recommendations(engine, index, k=5, n_probe=DEFAULT_N_PROBE, batch_size=QUERY_BATCH_SIZE, rows=None):
+    """Top-k partners of every organization (or of `rows`), excluding itself and its existing partners.
+
+    Candidates come from the IVF index (exact blocked search when `index` is None)
+    with a margin of extra results; the few organizations with more excluded
+    candidates than the margin fall back to exact filtered search. Returns the
+    data.json mapping {name: [[partner, score], ...]}.
+    """
+    names = engine.names
+    rows = np.arange(len(names)) if rows is None else np.asarray(rows, dtype=np.int64)
+    recommendations = {}
+    fallbacks = 0
+    for start in range(0, len(rows), batch_size):
+        batch_rows = rows[start:start + batch_size]
+        queries = np.asarray(engine.embeddings[batch_rows], dtype=np.float32)
+        if index is None:
+            candidates, scores = exact_top_k(engine.embeddings, queries, k + 1 + EXCLUSION_MARGIN)
+        else:
+            candidates, scores = index.search(queries, k + 1 + EXCLUSION_MARGIN, n_probe=n_probe, batch_size=batch_size)
+        for row, candidate_rows, candidate_scores in zip(batch_rows.tolist(), candidates, scores):
+            excluded = set(engine.existing_partners(row).tolist())
+            excluded.add(row)
+            picked = [(r, s) for r, s in zip(candidate_rows.tolist(), candidate_scores.tolist())
+                      if r >= 0 and r not in excluded][:k]
+            if len(picked) < k and len(names) - len(excluded) > len(picked):
+                fallbacks += 1
+                recommendations[names[row]] = [[n, s] for n, s in engine.top_k(names[row], k=k)]
+            else:
+                recommendations[names[row]] = [[names[r], float(_sigmoid(s))] for r, s in picked]
+        print(f"Recommendations computed for {start + len(batch_rows)}/{len(rows)} organizations.")
+    if fallbacks:
+        print(f"{fallbacks} organizations needed exact search.")
+    return recommendations
+
+
+def write_recommendations_json(recommendations, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(recommendations, f)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Approximate nearest-neighbour index over the GAE embeddings.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Cluster the embeddings and save the IVF index")
+    build_parser.add_argument("--lists", type=int, default=None, help="Number of inverted lists (default: 4*sqrt(N))")
+
+    report_parser = subparsers.add_parser("report", help="Recall@k and throughput against exact search")
+    report_parser.add_argument("--k", type=int, default=10)
+    report_parser.add_argument("--queries", type=int, default=1000)
+    report_parser.add_argument("--probes", default="1,2,4,8,16,32", help="Comma-separated n_probe values")
+    report_parser.add_argument("--json", help="Also write the report to this file")
+
+    regen_parser = subparsers.add_parser("regenerate", help="Recompute the recommendations of every organization")
+    regen_parser.add_argument("--k", type=int, default=5)
+    regen_parser.add_argument("--probe", type=int, default=DEFAULT_N_PROBE)
+    regen_parser.add_argument("--output", default="dataset/data.json")
+    regen_parser.add_argument("--ann", action="store_true",
+                              help=f"Use the IVF index even below {EXACT_SEARCH_MAX_ROWS} organizations")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        load_or_build_ivf_index(n_lists=args.lists, rebuild=True)
+    elif args.command == "report":
+        index = load_or_build_ivf_index()
+        probes = [int(p) for p in args.probes.split(",")]
+        report = recall_report(index, np.load(EMBEDDINGS_FILE, mmap_mode="r"), k=args.k,
+                               n_probe_values=probes, n_queries=args.queries)
+        print(f"{report['n_rows']} rows, {report['n_lists']} lists, k={report['k']}, "
+              f"exact: {report['exact_queries_per_second']:.0f} queries/s")
+        for result in report["results"]:
+            print(f"n_probe={result['n_probe']:>3}  recall@{args.k}={result['recall_at_k']:.3f}  "
+                  f"{result['queries_per_second']:.0f} queries/s  ({result['speedup_vs_exact']:.1f}x)")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+    elif args.command == "regenerate":
+        from shared_dataset import get_shared_dataset
+        dataset = get_shared_dataset()
+        engine = load_collaboration_engine(dataset.org_df, dataset.graph_index)
+        if engine is None:
+            return
+        start = time.perf_counter()
+        index = load_or_build_ivf_index() if len(engine) > EXACT_SEARCH_MAX_ROWS or args.ann else None
+        recommendations = regenerate_recommendations(engine, index, k=args.k, n_probe=args.probe)
+        write_recommendations_json(recommendations, args.output)
+        print(f"{len(recommendations)} recommendation lists written to {args.output} in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
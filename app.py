@@ -1,84 +1,116 @@
 from shiny import App, ui, render, reactive
 import pandas as pd
+import numpy as np
 import json
 import os
 from pathlib import Path
 import asyncio 
-from interactive_graph_visualization import create_interactive_heterogeneous_graph
+import functools
+from interactive_graph_visualization import (create_interactive_heterogeneous_graph, is_error_graph, graph_to_html, graph_to_json,
+                                             GRAPH_RENDER_VARIANT, GRAPH_VIEWER_DIR, VIS_NETWORK_DIR)
+from graph_cache import GraphRenderCache, graph_cache_key
+from graph_jobs import GraphJobPool
+from recommendation_store import get_shared_recommendation_store
+from org_search import SELECTIZE_SEARCH_FIELDS, build_org_search_index, build_name_search_index, update_selectize_search
+from collaboration_engine import load_collaboration_engine, ACTIVITY_TYPES
+from shared_dataset import get_shared_dataset
 
 # --- Configuration of Relative Paths ---
-DATA_BASE_PATH = "dataset/projects/"
-ORG_FILE = os.path.join(DATA_BASE_PATH, "organization.xlsx")
-PROJ_FILE = os.path.join(DATA_BASE_PATH, "project.xlsx")
-TOPIC_FILE = os.path.join(DATA_BASE_PATH, "topics.xlsx")
 RECOMMENDATIONS_FILE = "dataset/data.json"
 GRAPH_OUTPUT_DIR = Path("graph")
 GRAPH_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+GRAPH_CACHE_MAX_ENTRIES = 200
+GRAPH_CACHE_MAX_BYTES = 500 * 1024 * 1024
+LOD_MEMBERS_SUFFIX = ".members.json"
+# "json": one shared, browser-cached viewer page that loads a compact graph JSON (works offline)
+# "html": a standalone pyvis page per graph, loading vis.js from the CDN
+GRAPH_VIEWER_MODE = os.environ.get("GRAPH_VIEWER_MODE", "json")
+GRAPH_FILE_SUFFIX = ".graph.json" if GRAPH_VIEWER_MODE == "json" else ".html"
+# Page-relative URLs, so the app also works mounted under a path prefix (see server.py)
+GRAPH_VIEWER_URL = "graph_viewer/viewer.html"
+
+GRAPH_WORKERS = int(os.environ.get("GRAPH_WORKERS", "2"))
+GRAPH_QUEUE_LIMIT = int(os.environ.get("GRAPH_QUEUE_LIMIT", "8"))
+
+# Structural metrics shown in the Network Metrics tab (NetworkMetrics field -> label)
+NETWORK_METRIC_CHOICES = {
+    "betweenness": "Betweenness (brokers)",
+    "pagerank": "PageRank",
+    "core": "k-core number",
+    "degree": "Distinct partners",
+    "strength": "Shared projects",
+    "clustering": "Clustering coefficient",
+}
+
+# Rendered graphs are shared by all sessions and addressed by selection + dataset version
+graph_render_cache = GraphRenderCache(GRAPH_OUTPUT_DIR, max_entries=GRAPH_CACHE_MAX_ENTRIES, max_bytes=GRAPH_CACHE_MAX_BYTES,
+                                      suffix=GRAPH_FILE_SUFFIX)
+# Graph builds run here, off the event loop, shared by all sessions of this worker
+graph_job_pool = GraphJobPool(max_workers=GRAPH_WORKERS, max_queue=GRAPH_QUEUE_LIMIT)
+
+# Metrics and communities pull in scipy.sparse; their modules are imported on first use, not at worker start-up
+def load_network_metrics():
+    from network_metrics import get_shared_network_metrics
+    return get_shared_network_metrics(get_shared_dataset())
+
+def load_communities():
+    from community_detection import get_shared_communities
+    return get_shared_communities(get_shared_dataset())
 
 # Load Recommendations Data 
 def load_recommendations():
-    """Load the recommendations data from JSON file"""
+    """Open the memory-mapped recommendation store built from the JSON file"""
     try:
-        with open(RECOMMENDATIONS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
+        return get_shared_recommendation_store(RECOMMENDATIONS_FILE)
     except Exception as e:
         print(f"Error loading recommendations data: {e}")
         return {}
 
-# Load Data Reactively ---
-@reactive.calc
-def load_data_reactive():
-    """Load all data sources reactively"""
-    print("Loading all data sources...")
+# Load Data Once Per Process ---
+@functools.lru_cache(maxsize=1)
+def load_shared_data():
+    """Load all data sources once per worker process; every session shares the result"""
+    dataset = get_shared_dataset()
+
+    # Load recommendations data
+    recommendations_data = load_recommendations()
+    print(f"{len(recommendations_data)} recommendation entries loaded.")
+
+    # Online scoring over the GAE embeddings; without them only the precomputed lists are shown
     try:
-        # Load Excel data
-        org_df = pd.read_excel(ORG_FILE)
-        proj_df = pd.read_excel(PROJ_FILE)
-        topic_df = pd.read_excel(TOPIC_FILE)
-        
-        # Load recommendations data
-        recommendations_data = load_recommendations()
-        
-        print(f"Data loaded: {len(org_df)} orgs, {len(proj_df)} projects, {len(topic_df)} topics, {len(recommendations_data)} recommendation entries.")
-        
-        if 'name' not in org_df.columns or 'organisationID' not in org_df.columns:
-            raise ValueError("Organization DataFrame must contain 'name' and 'organisationID' columns.")
-        
-        org_df_cleaned = org_df.dropna(subset=['name', 'organisationID'])
-        
-        org_options_df = org_df_cleaned[['name', 'organisationID']].copy() 
-        org_options_df['organisationID'] = org_options_df['organisationID'].astype(str)
-        org_options_df = org_options_df.drop_duplicates(subset=['organisationID'])
+        collaboration_engine = load_collaboration_engine(dataset.org_df, dataset.graph_index)
+    except Exception as e:
+        print(f"Error loading GAE embeddings: {e}")
+        collaboration_engine = None
 
-        org_options_df['display_name'] = org_options_df['name'] + " (" + org_options_df['organisationID'] + ")"
-        org_options_df = org_options_df.sort_values(by='name')
-        
-        organization_choices = pd.Series(org_options_df.display_name.values, index=org_options_df.organisationID).to_dict()
+    return {
+        "org_df": dataset.org_df,
+        "proj_df": dataset.proj_df,
+        "topic_df": dataset.topic_df,
+        "graph_index": dataset.graph_index,
+        "dataset_version": dataset.version,
+        "recommendations_data": recommendations_data,
+        "collaboration_engine": collaboration_engine,
+        "organization_choices": dict(dataset.organization_choices),
+        "all_org_ids": list(dataset.all_org_ids),
+        "top_10_org_ids": list(dataset.top_10_org_ids),
+        "recommendation_orgs": list(recommendations_data.keys())  # the store keeps keys sorted
+    }
 
-        org_df['organisationID'] = org_df['organisationID'].astype(str)
+@functools.lru_cache(maxsize=1)
+def get_org_search_index():
+    """Search index behind the organization selector, built on first use"""
+    return build_org_search_index(load_shared_data()["org_df"])
 
-        # Calculate Top 10 organizations by project participation
-        if 'projectID' in org_df.columns:
-            org_project_counts = org_df['organisationID'].value_counts()
-            top_10_org_ids_list = org_project_counts.nlargest(10).index.astype(str).tolist()
-        else:
-            print("Warning: 'projectID' column not found in organization data for Top 10 calculation.")
-            top_10_org_ids_list = []
+@functools.lru_cache(maxsize=1)
+def get_recommendation_search_index():
+    """Search index behind the recommendations selector, built on first use"""
+    return build_name_search_index(load_shared_data()["recommendation_orgs"])
 
-        # Create recommendation choices (intersection of org data and recommendations)
-        recommendation_orgs = list(recommendations_data.keys())
-        
-        return {
-            "org_df": org_df,
-            "proj_df": proj_df,
-            "topic_df": topic_df,
-            "recommendations_data": recommendations_data,
-            "organization_choices": organization_choices,
-            "all_org_ids": org_options_df.organisationID.tolist(),
-            "top_10_org_ids": top_10_org_ids_list,
-            "recommendation_orgs": sorted(recommendation_orgs)
-        }
+def load_data():
+    """Return the shared data, or an empty placeholder if loading failed"""
+    try:
+        return load_shared_data()
     except FileNotFoundError as e:
         print(f"ERROR: Data file not found: {e}")
         return {"org_df": pd.DataFrame(), "proj_df": pd.DataFrame(), "topic_df": pd.DataFrame(), 
@@ -172,9 +204,12 @@ app_ui = ui.page_fluid(
                             "Select Organizations:",
                             choices={}, 
                             multiple=True,
-                            options={"placeholder": "Search and select organizations..."}
+                            options={"placeholder": "Search and select organizations...", "searchField": SELECTIZE_SEARCH_FIELDS}
                         ),
                         ui.br(),
+                        ui.input_radio_buttons("graph_color_by", "Colour organizations by:",
+                                               choices={"type": "Node type", "community": "Research community"}),
+                        ui.input_checkbox("graph_community_overview", "Community overview", False),
                         ui.input_action_button("update_graph", "🎯 Update Graph", class_="btn-primary w-100 mb-2"),
                         ui.hr(),
                         ui.h5("Quick Actions", style="color: #2c3e50;"),
@@ -205,7 +240,22 @@ app_ui = ui.page_fluid(
                             "",
                             choices=[],
                             selected=None,
-                            options={"placeholder": "Type to search organizations..."}
+                            options={"placeholder": "Type to search organizations...", "searchField": SELECTIZE_SEARCH_FIELDS}
+                        ),
+                        ui.div(
+                            ui.h4("🔎 Filters", style="color: #2c3e50;"),
+                            ui.input_numeric("recommendations_k", "Number of recommendations", value=5, min=1, max=50),
+                            ui.input_selectize(
+                                "recommendations_countries",
+                                "Partner countries",
+                                choices=[],
+                                multiple=True,
+                                options={"placeholder": "Any country"}
+                            ),
+                            ui.input_checkbox_group("recommendations_activity_types", "Partner type", choices=ACTIVITY_TYPES),
+                            ui.input_checkbox("recommendations_sme_only", "Only SMEs", False),
+                            ui.input_checkbox("recommendations_exclude_partners", "Exclude existing partners", True),
+                            class_="network-controls"
                         ),
                         ui.div(
                             ui.h4("📊 Statistics", style="color: #2c3e50;"),
@@ -218,19 +268,47 @@ app_ui = ui.page_fluid(
                 ui.column(
                     8,
                     ui.div(
-                        ui.h3("🎯 Top 5 Collaboration Recommendations", style="color: #2c3e50; margin-bottom: 1.5rem;"),
+                        ui.h3("🎯 Top Collaboration Recommendations", style="color: #2c3e50; margin-bottom: 1.5rem;"),
                         ui.output_ui("recommendations_output"),
                         class_="card"
                     )
                 )
             )
         ),
+
+        ui.nav_panel(
+            "📈 Network Metrics",
+            ui.row(
+                ui.column(
+                    4,
+                    ui.div(
+                        ui.h3("Ranking", style="color: #2c3e50; margin-bottom: 1rem;"),
+                        ui.input_select("network_metric", "Rank organizations by", choices=NETWORK_METRIC_CHOICES),
+                        ui.input_numeric("network_metric_top_n", "Number of organizations", value=20, min=1, max=500),
+                        ui.input_checkbox("network_metric_giant_only", "Only the largest connected component", False),
+                        ui.div(
+                            ui.h4("📊 Whole Network", style="color: #2c3e50;"),
+                            ui.output_ui("network_summary"),
+                            class_="stats-box"
+                        ),
+                        class_="card"
+                    )
+                ),
+                ui.column(
+                    8,
+                    ui.div(
+                        ui.h3("🏆 Top Organizations", style="color: #2c3e50; margin-bottom: 1.5rem;"),
+                        ui.output_data_frame("network_metric_table"),
+                        class_="card"
+                    )
+                )
+            )
+        ),
     )
 )
 
 # Server Logic 
 def server(input, output, session):
-    loaded_data_reactive_calc = load_data_reactive
     
     # Reactive values for managing state
     graph_html_file_reactive = reactive.value(None)
@@ -239,27 +317,32 @@ def server(input, output, session):
     # Update organization choices for both tabs
     @reactive.effect
     def _update_choices():
-        current_data = loaded_data_reactive_calc()
-        network_choices = current_data.get("organization_choices", {"Error": "Choices not available"})
+        current_data = load_data()
         recommendation_choices = current_data.get("recommendation_orgs", [])
+        if current_data.get("org_df") is None or current_data["org_df"].empty:
+            network_choices = current_data.get("organization_choices", {"Error": "Choices not available"})
+            ui.update_selectize("network_selected_orgs_ids", choices=network_choices, selected=None)
+            return
         
-        # Update network visualization choices
-        ui.update_selectize("network_selected_orgs_ids", choices=network_choices, selected=None)
-        
-        # Update recommendation choices
-        ui.update_selectize("recommendations_selected_org", choices=recommendation_choices, 
-                          selected=recommendation_choices[0] if recommendation_choices else None)
+        # Both selectors search on the server; only the matches for each keystroke reach the browser
+        update_selectize_search("network_selected_orgs_ids", get_org_search_index())
+        update_selectize_search("recommendations_selected_org", get_recommendation_search_index(),
+                                selected=recommendation_choices[0] if recommendation_choices else None)
+        engine = current_data.get("collaboration_engine")
+        if engine is not None:
+            ui.update_selectize("recommendations_countries", choices=engine.country_choices())
         
-        print("Organization choices updated in both tabs.")
+        print("Organization search connected in both tabs.")
     
     # Network Visualization Logic
     @reactive.effect
     @reactive.event(input.select_top_10)
     def _handle_select_top_10():
-        current_data = loaded_data_reactive_calc()
+        current_data = load_data()
         top_10_ids = current_data.get("top_10_org_ids", [])
         if top_10_ids:
-            ui.update_selectize("network_selected_orgs_ids", selected=top_10_ids)
+            # Re-register the search so the selected organizations come with their labels
+            update_selectize_search("network_selected_orgs_ids", get_org_search_index(), selected=top_10_ids)
             network_status_message_reactive.set(f"{len(top_10_ids)} Top organizations selected. Click 'Update Graph'.")
         else:
             network_status_message_reactive.set("Could not determine Top 10 organizations. Data might be missing.")
@@ -271,53 +354,124 @@ def server(input, output, session):
         graph_html_file_reactive.set(None)
         network_status_message_reactive.set("Selection cleared. Graph removed.")
 
+    # Communities are precomputed per dataset version; graphs use them once they are loaded
+    @reactive.extended_task
+    async def communities_task():
+        return await asyncio.to_thread(load_communities)
+
+    @reactive.effect
+    def _load_communities():
+        communities_task.invoke()
+
+    # The graph build runs in the shared worker pool; this session only tracks its current job
+    current_graph_job = {"job": None, "n_selected": 0, "note": ""}
+
+    @reactive.extended_task
+    async def graph_build_task(cache_key, selected_ids_list, build):
+        job = graph_job_pool.submit(session.id, cache_key, build)
+        current_graph_job["job"] = job
+        try:
+            # shield: cancelling this session's wait must not cancel a job other sessions joined
+            graph_path = await asyncio.shield(asyncio.wrap_future(job.future))
+        except asyncio.CancelledError:
+            graph_job_pool.release(session.id, cache_key)
+            raise
+        return graph_path, len(selected_ids_list)
+
     @reactive.effect
     @reactive.event(input.update_graph)
-    async def _generate_and_save_graph():
+    def _generate_and_save_graph():
         print("Update graph button clicked.")
-        current_data = loaded_data_reactive_calc()
+        current_data = load_data()
         org_df = current_data.get("org_df")
         proj_df = current_data.get("proj_df")
         topic_df = current_data.get("topic_df")
+        graph_index = current_data.get("graph_index")
         
         selected_ids_tuple = input.network_selected_orgs_ids()
         print(f"Selected organization IDs from input: {selected_ids_tuple}")
 
+        # A new click supersedes whatever this session was still waiting for
+        graph_build_task.cancel()
+
         if not selected_ids_tuple:
+            graph_job_pool.release(session.id)
             network_status_message_reactive.set("Please select at least one organization.")
             graph_html_file_reactive.set(None)
             return
 
         if org_df.empty or proj_df.empty or topic_df.empty:
+            graph_job_pool.release(session.id)
             network_status_message_reactive.set("Data not loaded correctly. Cannot generate graph.")
             graph_html_file_reactive.set(None)
             return
         
         selected_ids_list = list(selected_ids_tuple)
-        print(f"Calling create_interactive_heterogeneous_graph with {len(selected_ids_list)} organization IDs.")
-        
-        net = create_interactive_heterogeneous_graph(org_df.copy(), proj_df.copy(), topic_df.copy(), selected_ids_list)
-
-        if net and hasattr(net, 'nodes'):
-            filename = f"interactive_graph_{session.id}.html"
-            absolute_path_to_save = GRAPH_OUTPUT_DIR / filename
-            
-            try:
-                net.save_graph(str(absolute_path_to_save))
-                print(f"Graph saved to: {absolute_path_to_save}")
-                
-                iframe_src_path = f"/{GRAPH_OUTPUT_DIR.name}/{filename}"
-                graph_html_file_reactive.set(iframe_src_path)
-                network_status_message_reactive.set(f"Graph generated for {len(selected_ids_list)} organization(s). View below.")
-            except Exception as e:
-                print(f"Error saving graph: {e}")
-                network_status_message_reactive.set(f"Error saving graph: {str(e)}")
-                graph_html_file_reactive.set(None)
-        else:
-            print("Graph generation failed or returned an invalid network object.")
-            network_status_message_reactive.set("Graph generation failed. Check logs for details.")
+        color_by = input.graph_color_by()
+        community_overview = input.graph_community_overview()
+        communities = None
+        note = ""
+        if color_by == "community" or community_overview:
+            communities_status = communities_task.status()
+            if communities_status == "success":
+                communities = communities_task.result()[0]
+            else:
+                print(f"Communities not available ({communities_status}); drawing the graph without them.")
+                color_by, community_overview = "type", False
+                reason = "Communities failed to load" if communities_status == "error" else "Communities are still loading"
+                note = f" {reason}: drawn by node type, click 'Update Graph' again later."
+        current_graph_job["note"] = note
+        cache_key = graph_cache_key(selected_ids_list, current_data.get("dataset_version", ""),
+                                    f"{GRAPH_RENDER_VARIANT}-{GRAPH_VIEWER_MODE}-{color_by}-{community_overview}")
+
+        cached_path = graph_render_cache.get(cache_key)
+        if cached_path is not None:
+            graph_job_pool.release(session.id)
+            print(f"Graph served from cache: {cached_path} (cache stats: {graph_render_cache.stats()})")
+            graph_html_file_reactive.set(f"{GRAPH_OUTPUT_DIR.name}/{cached_path.name}")
+            network_status_message_reactive.set(f"Graph generated for {len(selected_ids_list)} organization(s) (cached). View below.{note}")
+            return
+
+        def build(job):
+            print(f"Calling create_interactive_heterogeneous_graph with {len(selected_ids_list)} organization IDs.")
+            # The shared tables are passed as-is: graph building only selects rows, never copies or mutates them
+            net = create_interactive_heterogeneous_graph(org_df, proj_df, topic_df, selected_ids_list, graph_index=graph_index,
+                                                         communities=communities, color_by=color_by,
+                                                         community_overview=community_overview)
+            if not net or not hasattr(net, 'nodes') or is_error_graph(net):
+                raise ValueError("Graph generation failed or returned an invalid network object.")
+            job.check_cancelled()
+            job.set_status("writing")
+            render = graph_to_json if GRAPH_VIEWER_MODE == "json" else graph_to_html
+            if net.lod_members:
+                # Level-of-detail graph: super-node members are fetched by the page on drill-down
+                members_url = f"{cache_key}{LOD_MEMBERS_SUFFIX}"
+                return graph_render_cache.put(cache_key, render(net, members_url=members_url),
+                                              companions={LOD_MEMBERS_SUFFIX: json.dumps(net.lod_members)})
+            return graph_render_cache.put(cache_key, render(net))
+
+        current_graph_job["n_selected"] = len(selected_ids_list)
+        network_status_message_reactive.set(f"Graph for {len(selected_ids_list)} organization(s): queued...")
+        graph_build_task.invoke(cache_key, selected_ids_list, build)
+
+    @reactive.effect
+    def _show_graph_result():
+        status = graph_build_task.status()
+        if status == "success":
+            graph_path, n_selected = graph_build_task.result()
+            print(f"Graph saved to: {graph_path} (cache stats: {graph_render_cache.stats()}, pool: {graph_job_pool.stats()})")
+            graph_html_file_reactive.set(f"{GRAPH_OUTPUT_DIR.name}/{graph_path.name}")
+            network_status_message_reactive.set(f"Graph generated for {n_selected} organization(s). View below.{current_graph_job['note']}")
+        elif status == "error":
+            error = graph_build_task.error.get()
+            print(f"Error generating graph: {error}")
+            network_status_message_reactive.set(f"Graph generation failed: {str(error)}")
             graph_html_file_reactive.set(None)
 
+    @session.on_ended
+    def _release_graph_job():
+        graph_job_pool.release(session.id)
+
     # Output renderers
     @output
     @render.ui
@@ -327,6 +481,9 @@ def server(input, output, session):
             filename = Path(iframe_src).name
             expected_file_path = GRAPH_OUTPUT_DIR / filename
             if os.path.exists(expected_file_path):
+                if filename.endswith(".graph.json"):
+                    # Graph data only: the shared viewer page draws it (data is resolved against the viewer's URL)
+                    iframe_src = f"{GRAPH_VIEWER_URL}?data=../{iframe_src}"
                 return ui.HTML(f'''
                     <iframe src="{iframe_src}" width="100%" height="850px" style="border:none;" title="Pyvis Graph"></iframe>
                 ''')
@@ -342,25 +499,95 @@ def server(input, output, session):
     @output
     @render.text
     def network_status_message():
+        job = current_graph_job["job"]
+        if graph_build_task.status() == "running" and job is not None:
+            # Poll the worker's progress while the build is in flight
+            reactive.invalidate_later(0.5)
+            return f"Graph for {current_graph_job['n_selected']} organization(s): {job.status}..."
         return network_status_message_reactive.get()
 
+    # Network Metrics Logic
+    # Cached per dataset version; the first session after a data update computes them off the event loop
+    @reactive.extended_task
+    async def network_metrics_task():
+        return await asyncio.to_thread(load_network_metrics)
+
+    @reactive.effect
+    def _load_network_metrics():
+        network_metrics_task.invoke()
+
+    @output
+    @render.ui
+    def network_summary():
+        status = network_metrics_task.status()
+        if status == "running":
+            return ui.p("Computing network metrics...", style="color: #6c757d; font-style: italic;")
+        if status == "error":
+            return ui.p(f"Network metrics unavailable: {network_metrics_task.error.get()}")
+        if status != "success":
+            return ui.p("")
+        _, summary = network_metrics_task.result()
+        rows = [
+            ("Organizations", f"{summary['organizations']:,}"),
+            ("Collaborations", f"{summary['collaborations']:,}"),
+            ("Average degree", f"{summary['average_degree']:.2f}"),
+            ("Density", f"{summary['density']:.2e}"),
+            ("Connected components", f"{summary['components']:,}"),
+            ("Largest component", f"{summary['giant_component_size']:,}"),
+            ("Maximum k-core", f"{summary['max_core']}"),
+            ("Average clustering", f"{summary['average_clustering']:.3f}"),
+            ("Transitivity", f"{summary['transitivity']:.3f}"),
+        ]
+        return ui.TagList(*[ui.div(ui.span(label), ui.span(value, style="float: right; font-weight: 600;")) for label, value in rows],
+                          ui.p(f"Betweenness estimated from {summary['betweenness_pivots']} sampled sources.",
+                               style="color: #6c757d; font-size: 0.85rem; margin-top: 0.5rem;"))
+
+    @output
+    @render.data_frame
+    def network_metric_table():
+        if network_metrics_task.status() != "success":
+            return pd.DataFrame()
+        metrics, _ = network_metrics_task.result()
+        metric = input.network_metric()
+        top_n = max(1, min(int(input.network_metric_top_n() or 20), 500))
+        positions = metrics.top(metric, top_n, component=0 if input.network_metric_giant_only() else None)
+        choices = load_data().get("organization_choices", {})
+        org_ids = [str(org_id) for org_id in metrics.org_ids[positions]]
+        table = pd.DataFrame({"Organization": [choices.get(org_id, org_id) for org_id in org_ids]})
+        for column in dict.fromkeys([metric, "degree", "core"]):
+            table[NETWORK_METRIC_CHOICES[column]] = np.asarray(getattr(metrics, column))[positions]
+        table["Component"] = np.asarray(metrics.component)[positions]
+        return render.DataGrid(table, width="100%")
+
     # Recommendations Logic
     @output
     @render.ui
     def recommendations_output():
         selected = input.recommendations_selected_org()
-        current_data = loaded_data_reactive_calc()
+        current_data = load_data()
         recommendations_data = current_data.get("recommendations_data", {})
+        engine = current_data.get("collaboration_engine")
+        k = max(1, min(int(input.recommendations_k() or 5), 50))
         
-        if not selected or selected not in recommendations_data:
+        if engine is not None and selected in engine:
+            # Scored online, so any k and filter combination works
+            recommendations = engine.top_k(
+                selected, k=k,
+                countries=input.recommendations_countries(),
+                sme_only=input.recommendations_sme_only(),
+                activity_types=input.recommendations_activity_types(),
+                exclude_partners=input.recommendations_exclude_partners(),
+            )
+        elif selected and selected in recommendations_data:
+            # Precomputed lists only: filters cannot be applied
+            recommendations = recommendations_data[selected][:k]
+        else:
             return ui.div(
                 ui.p("Please select an organization to see recommendations.", 
                      style="text-align: center; color: #6c757d; font-style: italic;"),
                 style="padding: 2rem;"
             )
         
-        recommendations = recommendations_data[selected]
-        
         if not recommendations:
             return ui.div(
                 ui.p("No recommendations available for this organization.", 
@@ -369,7 +596,7 @@ def server(input, output, session):
             )
         
         recommendation_cards = []
-        for i, (org_name, score) in enumerate(recommendations[:5], 1):
+        for i, (org_name, score) in enumerate(recommendations, 1):
             card = ui.div(
                 ui.div(
                     ui.span(f"#{i}", style="color: #667eea; font-weight: bold; margin-right: 0.5rem;"),
@@ -387,7 +614,7 @@ def server(input, output, session):
     @render.text
     def recommendation_stats_text():
         selected = input.recommendations_selected_org()
-        current_data = loaded_data_reactive_calc()
+        current_data = load_data()
         recommendations_data = current_data.get("recommendations_data", {})
         
         if not selected or selected not in recommendations_data:
@@ -411,7 +638,11 @@ absolute_graph_path_for_static_assets = app_dir / GRAPH_OUTPUT_DIR.name
 app = App(
     app_ui, 
     server, 
-    static_assets={f"/{GRAPH_OUTPUT_DIR.name}": str(absolute_graph_path_for_static_assets)}
+    static_assets={
+        f"/{GRAPH_OUTPUT_DIR.name}": str(absolute_graph_path_for_static_assets),
+        "/graph_viewer": str(GRAPH_VIEWER_DIR),
+        "/vis-network": str(VIS_NETWORK_DIR),
+    }
 )
 
 # To run this app:
@@ -0,0 +1,203 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from graph_index import _csr, gather
+
+# Output of the GAE: one embedding row per organization, in the order of the names file.
+# Organizations are identified by their normalized name (stripped, lower-case), as in data.json.
+GAE_DIR = "dataset/gae"
+EMBEDDINGS_FILE = os.path.join(GAE_DIR, "embeddings.npy")
+NAMES_FILE = os.path.join(GAE_DIR, "organizations.json")
+# Rows scored per matrix product; bounds temporary memory for large embedding matrices
+SCORE_BLOCK_ROWS = 65536
+# Activity types of CORDIS participants, used by the type filter
+ACTIVITY_TYPES = {
+    "PRC": "Private company",
+    "HES": "Higher education",
+    "REC": "Research organisation",
+    "PUB": "Public body",
+    "OTH": "Other",
+}
+
+
+def normalize_org_name(names):
+    """Key used for organizations by the GAE and data.json: stripped, lower-case name"""
+    return names.astype(str).str.strip().str.lower()
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def blocked_top_k(embeddings, queries, k, mask=None, block_rows=SCORE_BLOCK_ROWS):
+    """Top-k rows of `embeddings` by inner product with each query vector.
+
+    Scores are computed block by block (one matrix product per block), rows where
+    `mask` is False are skipped, and each block only keeps its own top k via
+    argpartition, so memory stays at O(block_rows * n_queries). `mask` is a boolean
+    row mask shared by all queries or one row per query. Returns (rows, scores),
+    both (n_queries, k) sorted by descending score; missing slots have row -1.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    n_queries, n_rows = len(queries), len(embeddings)
+    best_rows = np.full((n_queries, 0), -1, dtype=np.int64)
+    best_scores = np.full((n_queries, 0), -np.inf, dtype=np.float32)
+    if k <= 0 or n_rows == 0:
+        return best_rows, best_scores
+
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        scores = np.asarray(queries @ np.asarray(embeddings[start:stop], dtype=np.float32).T)
+        if mask is not None:
+            scores[np.broadcast_to(~mask[..., start:stop], scores.shape)] = -np.inf
+        if stop - start > k:
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, keep, axis=1)
+        else:
+            keep = np.broadcast_to(np.arange(stop - start), scores.shape)
+        best_rows = np.concatenate([best_rows, keep + start], axis=1)
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        if best_rows.shape[1] > k:
+            keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best_rows = np.take_along_axis(best_rows, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_rows[~np.isfinite(best_scores)] = -1
+    return best_rows, best_scores
+
+
+def is_sme(values):
+    """Boolean mask of SME flags, which may be stored as booleans, numbers or strings ("False", "0")"""
+    return values.map(lambda v: str(v).strip().casefold() in ("true", "1", "1.0", "yes") if pd.notna(v) else False).to_numpy(dtype=bool)
+
+
+class CollaborationEngine:
+    """Online top-k partner recommendations from the GAE organization embeddings.
+
+    The score of a pair is sigmoid(z_u . z_v), as in the GAE decoder. Filters are
+    boolean masks over the embedding rows (country, SME, activity type), and
+    existing partners are found through co-participation in the CSR graph index.
+    """
+
+    def __init__(self, embeddings, names, org_df=None, graph_index=None):
+        self.embeddings = embeddings
+        self.names = list(names)
+        self._row_of = {name: row for row, name in enumerate(self.names)}
+        n = len(self.names)
+
+        self.countries = np.full(n, "", dtype=object)
+        self.activity_types = np.full(n, "", dtype=object)
+        self.sme = np.zeros(n, dtype=bool)
+        self._participation_offsets = None
+        self._graph_index = graph_index
+        if org_df is not None and len(org_df):
+            self._attach_attributes(org_df)
+        self.index_attributes()
+
+    def index_attributes(self):
+        """Integer-code the categorical attributes so filter masks compare ints, not strings"""
+        self._country_codes, self._country_values = pd.factorize(self.countries)
+        self._activity_codes, self._activity_values = pd.factorize(self.activity_types)
+
+    @staticmethod
+    def _in(codes, values, wanted):
+        wanted_codes = [i for i, value in enumerate(values) if value in set(wanted)]
+        return np.isin(codes, wanted_codes)
+
+    def _attach_attributes(self, org_df):
+        # Embedding row of every org_df row (-1 if the organization has no embedding)
+        keys = normalize_org_name(org_df['name'])
+        rows = keys.map(self._row_of).fillna(-1).astype(np.int64).to_numpy()
+        known = rows >= 0
+        first = pd.DataFrame({"row": rows[known]}, index=np.flatnonzero(known)).drop_duplicates("row")
+        for column, target in (("country", self.countries), ("activityType", self.activity_types)):
+            if column in org_df.columns:
+                values = org_df[column].to_numpy()[first.index]
+                target[first["row"].to_numpy()] = [str(v) if pd.notna(v) else "" for v in values]
+        if 'SME' in org_df.columns:
+            sme_rows = rows[known & is_sme(org_df['SME'])]
+            self.sme[sme_rows] = True
+        # Embedding row -> org_df rows, for finding existing partners
+        self._participation_offsets, self._participation_rows = _csr(rows, len(self.names))
+        self._org_df_rows = rows
+
+    def __contains__(self, name):
+        return name in self._row_of
+
+    def __len__(self):
+        return len(self.names)
+
+    def country_choices(self):
+        return sorted(c for c in set(self.countries.tolist()) if c)
+
+    def existing_partners(self, row):
+        """Embedding rows of organizations that already share a project with `row`"""
+        if self._participation_offsets is None or self._graph_index is None:
+            return np.empty(0, dtype=np.int64)
+        index = self._graph_index
+        org_rows = gather(self._participation_offsets, self._participation_rows, [row])
+        projects = index.org_row_project[org_rows]
+        projects = np.unique(projects[projects >= 0])
+        partner_org_rows = gather(index.proj_org_offsets, index.proj_org_rows, projects)
+        partners = self._org_df_rows[partner_org_rows]
+        return np.unique(partners[partners >= 0])
+
+    def candidate_mask(self, countries=None, sme_only=False, activity_types=None):
+        """Boolean mask of the rows passing the filters; None when nothing is filtered"""
+        mask = None
+        if countries:
+            mask = self._in(self._country_codes, self._country_values, countries)
+        if activity_types:
+            type_mask = self._in(self._activity_codes, self._activity_values, activity_types)
+            mask = type_mask if mask is None else mask & type_mask
+        if sme_only:
+            mask = self.sme.copy() if mask is None else mask & self.sme
+        return mask
+
+    def top_k(self, name, k=10, countries=None, sme_only=False, activity_types=None, exclude_partners=True):
+        """Return up to k (partner name, score) pairs for `name`, best first"""
+        row = self._row_of.get(name)
+        if row is None:
+            raise KeyError(name)
+        mask = self.candidate_mask(countries=countries, sme_only=sme_only, activity_types=activity_types)
+        mask = np.ones(len(self.names), dtype=bool) if mask is None else mask
+        mask[row] = False
+        if exclude_partners:
+            mask[self.existing_partners(row)] = False
+        query = np.asarray(self.embeddings[row], dtype=np.float32)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) < len(mask) // 2:
+            # Selective filters: score only the rows that pass them
+            rows, scores = blocked_top_k(self.embeddings[candidates], query, k)
+            rows = np.where(rows >= 0, candidates[np.maximum(rows, 0)], -1)
+        else:
+            rows, scores = blocked_top_k(self.embeddings, query, k, mask=mask)
+        return [
+            (self.names[r], float(_sigmoid(s)))
+            for r, s in zip(rows[0].tolist(), scores[0].tolist()) if r >= 0
+        ]
+
+
+def load_collaboration_engine(org_df=None, graph_index=None, embeddings_file=EMBEDDINGS_FILE, names_file=NAMES_FILE):
+    """Open the GAE embeddings (memory-mapped) and build the engine, or None if they are missing.
+
+    Expected files, written after training:
+    - embeddings.npy: float32 array (n_organizations, dim)
+    - organizations.json: the n normalized organization names, in row order
+    """
+    if not os.path.exists(embeddings_file) or not os.path.exists(names_file):
+        print(f"No GAE embeddings found in {os.path.dirname(embeddings_file)}; using precomputed recommendations only.")
+        return None
+    embeddings = np.load(embeddings_file, mmap_mode="r")
+    with open(names_file, "r", encoding="utf-8") as f:
+        names = json.load(f)
+    if len(names) != len(embeddings):
+        raise ValueError(f"{names_file} lists {len(names)} organizations but {embeddings_file} has {len(embeddings)} rows.")
+    print(f"Loaded GAE embeddings for {len(names)} organizations ({embeddings.shape[1]} dimensions).")
+    return CollaborationEngine(embeddings, names, org_df=org_df, graph_index=graph_index)
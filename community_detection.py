@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+
+import numpy as np
+import scipy.sparse as sp
+
+from data_cache import CACHE_DIR, publish_dir, tmp_dir_for
+from network_metrics import organization_adjacency
+
+COMMUNITY_FORMAT_VERSION = 1
+MAX_SWEEPS = 50
+# Nodes updated together: each sweep visits the nodes in this many random batches,
+# which avoids the label oscillation of fully synchronous propagation
+BATCHES_PER_SWEEP = 4
+# A sweep that relabels fewer than this share of organizations ends the propagation
+CONVERGENCE_FRACTION = 1e-3
+ROWS_PER_TASK = 20000
+
+
+@dataclass(frozen=True)
+class Communities:
+    """Community of every organization plus the weighted community-level graph.
+
+    Communities are numbered by decreasing size (0 is the largest). `links_*` is
+    the CSR adjacency between communities, weighted by the co-participations
+    (shared projects) of their members.
+    """
+    org_ids: np.ndarray         # aligned with GraphIndex.org_ids
+    community: np.ndarray       # community of every organization
+    sizes: np.ndarray           # organizations per community
+    labels: np.ndarray          # name of the best-connected member of each community
+    links_offsets: np.ndarray
+    links_targets: np.ndarray
+    links_weights: np.ndarray
+
+    def of(self, organisation_ids):
+        """Community of each organisationID, -1 when unknown"""
+        ids = np.asarray([str(i) for i in organisation_ids], dtype=str)
+        if len(ids) == 0 or len(self.org_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.org_ids, ids), len(self.org_ids) - 1)
+        return np.where(self.org_ids[positions] == ids, np.asarray(self.community)[positions], -1).astype(np.int64)
+
+    def links(self, community):
+        """(neighbouring communities, co-participations) of one community"""
+        start, stop = int(self.links_offsets[community]), int(self.links_offsets[community + 1])
+        return np.asarray(self.links_targets[start:stop]), np.asarray(self.links_weights[start:stop])
+
+    def save(self, directory):
+        directory = os.fspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        for field in fields(self):
+            np.save(os.path.join(directory, f"{field.name}.npy"), getattr(self, field.name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        directory = os.fspath(directory)
+        mode = "r" if mmap else None
+        return cls(**{
+            field.name: np.load(os.path.join(directory, f"{field.name}.npy"), mmap_mode=mode)
+            for field in fields(cls)
+        })
+
+
+def _one_hot(labels, n_labels):
+    n = len(labels)
+    return sp.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, n_labels))
+
+
+def _best_labels(adjacency, labels, rows, membership, rng):
+    """Label with the largest summed edge weight around each of `rows`.
+
+    Ties go to the current label, then to a random one: weights are whole numbers
+    of shared projects, so the 0.5 bonus and the noise below 0.5 never outweigh a
+    real difference.
+    """
+    scores = (adjacency[rows] @ membership).tocsr()
+    row_of_entry = np.repeat(np.arange(len(rows)), np.diff(scores.indptr))
+    scores.data += rng.random(len(scores.data)) * 0.4
+    scores.data += 0.5 * (scores.indices == labels[rows][row_of_entry])
+    # Row-wise argmax over the stored entries (csr argmax loops over rows in Python)
+    nonempty = np.diff(scores.indptr) > 0
+    row_max = np.full(len(rows), -np.inf)
+    if nonempty.any():
+        row_max[nonempty] = np.maximum.reduceat(scores.data, scores.indptr[:-1][nonempty])
+    winners = np.flatnonzero(scores.data == row_max[row_of_entry])
+    best = labels[rows].copy()  # isolated organizations keep their label
+    best[row_of_entry[winners]] = scores.indices[winners]
+    return best
+
+
+def label_propagation(adjacency, executor, max_sweeps=MAX_SWEEPS, seed=42, rows_per_task=ROWS_PER_TASK):
+    """Weighted label propagation; returns one raw label per node.
+
+    Each sweep updates the nodes in BATCHES_PER_SWEEP random batches. Within a
+    batch the new labels are computed in parallel row chunks against the labels
+    of the previous batch.
+    """
+    n = adjacency.shape[0]
+    labels = np.arange(n, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    for sweep in range(max_sweeps):
+        changed = 0
+        for batch in np.array_split(rng.permutation(n), BATCHES_PER_SWEEP):
+            if len(batch) == 0:
+                continue
+            batch = np.sort(batch)
+            membership = _one_hot(labels, n)
+            chunks = [batch[i:i + rows_per_task] for i in range(0, len(batch), rows_per_task)]
+            seeds = rng.integers(0, 2**63, size=len(chunks))
+            results = executor.map(
+                lambda args: _best_labels(adjacency, labels, args[0], membership, np.random.default_rng(args[1])),
+                zip(chunks, seeds),
+            )
+            new_labels = np.concatenate(list(results))
+            changed += int((new_labels != labels[batch]).sum())
+            labels[batch] = new_labels
+        print(f"  sweep {sweep + 1}: {changed} organizations relabelled")
+        if changed <= CONVERGENCE_FRACTION * n:
+            break
+    return labels
+
+
+def renumber_by_size(labels):
+    """Dense community IDs ordered by decreasing size (ties by first member)"""
+    _, first, inverse, sizes = np.unique(labels, return_index=True, return_inverse=True, return_counts=True)
+    order = np.lexsort((first, -sizes))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.ravel()].astype(np.int64), sizes[order].astype(np.int64)
+
+
+def modularity(adjacency, community, n_communities):
+    """Newman modularity of a partition of a weighted undirected graph"""
+    total = adjacency.sum()
+    if total == 0:
+        return 0.0
+    membership = _one_hot(community, n_communities)
+    internal = (membership.T @ adjacency @ membership).diagonal()
+    strength = np.bincount(community, weights=np.asarray(adjacency.sum(axis=1)).ravel(), minlength=n_communities)
+    return float((internal / total).sum() - ((strength / total) ** 2).sum())
+
+
+def _org_names(org_df, org_ids):
+    names = org_df.dropna(subset=['organisationID']).drop_duplicates(subset=['organisationID'])
+    names = dict(zip(names['organisationID'].astype(str), names['name'].astype(object).where(names['name'].notna(), None)))
+    return [str(names.get(org_id) or org_id) for org_id in org_ids]
+
+
+def detect_communities(graph_index, org_df, seed=42, n_threads=None):
+    """Assign every organization a community by label propagation; returns (Communities, summary dict)"""
+    started = time.perf_counter()
+    adjacency = organization_adjacency(graph_index)
+    n = adjacency.shape[0]
+    print(f"Detecting communities among {n} organizations ({adjacency.nnz // 2} collaborations).")
+    with ThreadPoolExecutor(max_workers=n_threads or os.cpu_count() or 1, thread_name_prefix="communities") as executor:
+        raw_labels = label_propagation(adjacency, executor, seed=seed)
+    community, sizes = renumber_by_size(raw_labels)
+    n_communities = len(sizes)
+
+    # Community graph and each community's best-connected member (highest strength)
+    membership = _one_hot(community, n_communities)
+    links = (membership.T @ adjacency @ membership).tocsr()
+    links.setdiag(0)
+    links.eliminate_zeros()
+    links.sort_indices()
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    by_strength = np.lexsort((-strength, community))
+    leaders = by_strength[np.r_[0, np.cumsum(sizes)[:-1]]] if n else np.empty(0, dtype=np.int64)
+    org_ids = np.asarray(graph_index.org_ids)
+
+    communities = Communities(
+        org_ids=org_ids,
+        community=community,
+        sizes=sizes,
+        labels=np.asarray(_org_names(org_df, org_ids[leaders]), dtype=str),
+        links_offsets=links.indptr.astype(np.int64),
+        links_targets=links.indices.astype(np.int64),
+        links_weights=links.data.astype(np.int64),
+    )
+    summary = {
+        "organizations": int(n),
+        "communities": int(n_communities),
+        "largest_community": int(sizes[0]) if n else 0,
+        "singletons": int((sizes == 1).sum()),
+        "modularity": modularity(adjacency, community, n_communities),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    print(f"{n_communities} communities, modularity {summary['modularity']:.3f}, {summary['seconds']:.1f}s.")
+    return communities, summary
+
+
+def communities_dir_for(version):
+    return CACHE_DIR / f"communities-{version}"
+
+
+def load_or_detect_communities(graph_index, org_df, version, seed=42, n_threads=None, rebuild=False):
+    """Load the cached communities of this dataset version, detecting and persisting them if needed"""
+    directory = communities_dir_for(version)
+    meta_path = directory / "meta.json"
+    expected_meta = {
+        "format": COMMUNITY_FORMAT_VERSION,
+        "organizations": len(graph_index.org_ids),
+        "seed": seed,
+    }
+    if meta_path.exists() and not rebuild:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("key") == expected_meta:
+                return Communities.load(directory, mmap=True), meta["summary"]
+        except Exception as e:
+            print(f"Error loading communities from {directory}, recomputing them: {e}")
+
+    communities, summary = detect_communities(graph_index, org_df, seed=seed, n_threads=n_threads)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_dir = tmp_dir_for(directory)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        communities.save(tmp_dir)
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"key": expected_meta, "summary": summary}, f)
+        if not publish_dir(tmp_dir, directory, "communities-*"):
+            print(f"Communities published concurrently by another worker, loading {directory}.")
+            return Communities.load(directory, mmap=True), summary
+        print(f"Communities saved to {directory}.")
+    except OSError as e:
+        print(f"Could not persist communities: {e}")
+    return communities, summary
+
+
+_lock = threading.Lock()
+_shared_communities = {}
+
+
+def get_shared_communities(dataset):
+    """Communities of the shared dataset, detected at most once per worker process"""
+    with _lock:
+        if dataset.version not in _shared_communities:
+            _shared_communities.clear()
+            _shared_communities[dataset.version] = load_or_detect_communities(
+                dataset.graph_index, dataset.org_df, dataset.version
+            )
+        return _shared_communities[dataset.version]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect research communities in the organization collaboration graph.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=None, help="Worker threads (default: all CPUs)")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute even if cached for this dataset version")
+    parser.add_argument("--top", type=int, default=10, help="Largest communities listed")
+    args = parser.parse_args(argv)
+
+    from shared_dataset import get_shared_dataset
+    dataset = get_shared_dataset()
+    communities, summary = load_or_detect_communities(dataset.graph_index, dataset.org_df, dataset.version,
+                                                      seed=args.seed, n_threads=args.threads, rebuild=args.rebuild)
+    print(json.dumps(summary, indent=2))
+    for community in range(min(args.top, len(communities.sizes))):
+        print(f"  {community}: {int(communities.sizes[community])} organizations, led by {communities.labels[community]}")
+
+
+if __name__ == "__main__":
+    main()
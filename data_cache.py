@@ -0,0 +1,224 @@
+import argparse
+import errno
+import hashlib
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# --- Configuration of Relative Paths ---
+DATA_BASE_PATH = "dataset/projects/"
+ORG_FILE = os.path.join(DATA_BASE_PATH, "organization.xlsx")
+PROJ_FILE = os.path.join(DATA_BASE_PATH, "project.xlsx")
+TOPIC_FILE = os.path.join(DATA_BASE_PATH, "topics.xlsx")
+CACHE_DIR = Path("dataset/.cache")
+
+# Workbooks read by the dashboards; these are what `build` pre-converts at deploy time
+DEFAULT_WORKBOOKS = [ORG_FILE, PROJ_FILE, TOPIC_FILE]
+
+_warned_no_parquet = False
+_shared_tables_lock = threading.Lock()
+_shared_tables = {}
+
+
+def _parquet_available():
+    """Check whether a Parquet engine (pyarrow) is installed"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def source_fingerprint(path):
+    """Fingerprint a source file by its absolute path, modification time and size"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _path_tag(path):
+    # Short hash of the absolute path so two workbooks with the same name never share a cache slot
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+
+
+def cache_path_for(path):
+    """Return the Parquet file that caches the current version of `path`"""
+    stem = Path(path).stem
+    return CACHE_DIR / f"{stem}-{_path_tag(path)}-{source_fingerprint(path)}.parquet"
+
+
+def dataset_version(paths=None):
+    """Combined fingerprint of the source workbooks, used to key derived caches"""
+    paths = DEFAULT_WORKBOOKS if paths is None else paths
+    parts = [source_fingerprint(p) if os.path.exists(p) else "missing" for p in paths]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _to_columnar_types(df):
+    """Make object columns storable in a typed columnar format.
+
+    Excel columns that mix numbers and text (e.g. VAT numbers, postcodes) come back
+    as object columns with heterogeneous values, which Arrow cannot type. Those are
+    stored as strings; missing values stay missing.
+    """
+    for col in df.columns:
+        if df[col].dtype == object:
+            inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+            if inferred not in ("string", "empty", "boolean", "date", "datetime", "bytes"):
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _remove_stale_entries(path, keep):
+    for old in CACHE_DIR.glob(f"{Path(path).stem}-{_path_tag(path)}-*.parquet"):
+        if old != keep:
+            try:
+                old.unlink()
+            except OSError as e:
+                print(f"Could not remove stale cache file {old}: {e}")
+
+
+def tmp_dir_for(directory):
+    """Private build directory of this process, published with `publish_dir`"""
+    directory = Path(directory)
+    return directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_abandoned_tmp_dirs(parent, pattern):
+    # <name>.<pid>.tmp left behind by processes that died before publishing
+    for path in parent.glob(f"{pattern}.*.tmp"):
+        match = re.search(r"\.(\d+)\.tmp$", path.name)
+        if match and int(match.group(1)) != os.getpid() and not _pid_alive(int(match.group(1))):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def publish_dir(tmp_dir, directory, stale_glob=None):
+    """Move a completely written `tmp_dir` into place as `directory`.
+
+    Returns False when another process published `directory` between our removal
+    of the old copy and the rename: its copy wins, ours is deleted and the caller
+    should load `directory`. Siblings matching `stale_glob` (older versions) and
+    build directories of dead processes are removed afterwards.
+    """
+    tmp_dir, directory = Path(tmp_dir), Path(directory)
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, directory)
+        published = True
+    except OSError as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+            raise
+        published = False
+    if stale_glob:
+        for old in directory.parent.glob(stale_glob):
+            if old != directory and not old.name.endswith(".tmp"):
+                shutil.rmtree(old, ignore_errors=True)
+    _remove_abandoned_tmp_dirs(directory.parent, stale_glob or directory.name)
+    return published
+
+
+def convert_workbook(path):
+    """Parse an Excel workbook once and write it to the columnar cache"""
+    target = cache_path_for(path)
+    df = _to_columnar_types(pd.read_excel(path))
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first so concurrent readers never see a partial file
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, target)
+    _remove_stale_entries(path, target)
+    print(f"Cached {path} -> {target} ({len(df)} rows).")
+    return df
+
+
+def read_table(path):
+    """Read a CORDIS workbook, serving it from the columnar cache when it is up to date.
+
+    The cache entry is keyed on the source path, mtime and size, so editing or
+    replacing a workbook invalidates it automatically. Without pyarrow this falls
+    back to reading the Excel file directly.
+    """
+    global _warned_no_parquet
+    if not _parquet_available():
+        if not _warned_no_parquet:
+            print("Warning: pyarrow is not installed, reading Excel files without the columnar cache.")
+            _warned_no_parquet = True
+        return pd.read_excel(path)
+
+    target = cache_path_for(path)
+    if target.exists():
+        try:
+            return pd.read_parquet(target)
+        except Exception as e:
+            print(f"Error reading cache file {target}, rebuilding it: {e}")
+    return convert_workbook(path)
+
+
+def read_shared_table(path):
+    """Process-wide copy of a workbook, read once per source version.
+
+    Every app in the process (including apps mounted side by side in one server)
+    gets the same DataFrame, so callers must treat it as read-only.
+    """
+    key = os.path.abspath(path)
+    fingerprint = source_fingerprint(path)
+    with _shared_tables_lock:
+        cached = _shared_tables.get(key)
+        if cached is None or cached[0] != fingerprint:
+            _shared_tables[key] = (fingerprint, read_table(path))
+        return _shared_tables[key][1]
+
+
+def build_cache(paths=None, force=False):
+    """Convert every workbook in `paths` into the columnar cache (deploy-time step)"""
+    paths = DEFAULT_WORKBOOKS if paths is None else paths
+    if not _parquet_available():
+        raise RuntimeError("pyarrow is required to build the columnar cache.")
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Skipping {path}: file not found.")
+            continue
+        if not force and cache_path_for(path).exists():
+            print(f"{path} is already cached.")
+            continue
+        convert_workbook(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the columnar cache of the CORDIS Excel inputs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Convert the workbooks into the cache")
+    build_parser.add_argument("paths", nargs="*", help="Workbooks to convert (default: organization, project, topics)")
+    build_parser.add_argument("--force", action="store_true", help="Rebuild entries that are already up to date")
+
+    subparsers.add_parser("status", help="Show which workbooks have an up-to-date cache entry")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build_cache(args.paths or None, force=args.force)
+    elif args.command == "status":
+        for path in DEFAULT_WORKBOOKS:
+            if not os.path.exists(path):
+                print(f"{path}: missing")
+            else:
+                print(f"{path}: {'cached' if cache_path_for(path).exists() else 'not cached'}")
+
+
+if __name__ == "__main__":
+    main()
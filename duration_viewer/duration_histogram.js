@@ -0,0 +1,41 @@
+// Duration histogram of project_duration_analysis.py.
+// plotly.js is loaded once as a static asset; the server sends only bin edges
+// and counts, and re-bins the zoomed range when the x axis changes.
+
+function drawDurationHistogram(message) {
+  var container = document.getElementById(message.id);
+  if (!container) return;
+  var centers = [], widths = [];
+  for (var i = 0; i < message.counts.length; i++) {
+    centers.push((message.edges[i] + message.edges[i + 1]) / 2);
+    widths.push(message.edges[i + 1] - message.edges[i]);
+  }
+  var trace = {
+    type: "bar", x: centers, y: message.counts, width: widths,
+    hovertemplate: "%{x:.1f} months: %{y} projects<extra></extra>"
+  };
+  var layout = {
+    title: { text: message.title },
+    bargap: 0,
+    xaxis: { title: { text: "Duration (months)" } },
+    yaxis: { title: { text: "Projects" } }
+  };
+  if (message.zoomed) {
+    layout.xaxis.range = [message.edges[0], message.edges[message.edges.length - 1]];
+  }
+  var first = !container.classList.contains("js-plotly-plot");
+  Plotly.react(container, [trace], layout, { responsive: true });
+  if (first) {
+    container.on("plotly_relayout", function(event) {
+      if (event["xaxis.range[0]"] !== undefined) {
+        Shiny.setInputValue(message.input, [event["xaxis.range[0]"], event["xaxis.range[1]"]]);
+      } else if (event["xaxis.autorange"]) {
+        Shiny.setInputValue(message.input, null);
+      }
+    });
+  }
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+  Shiny.addCustomMessageHandler("duration_histogram", drawDurationHistogram);
+});
@@ -0,0 +1,524 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+from ann_index import EXACT_SEARCH_MAX_ROWS, load_or_build_ivf_index, regenerate_recommendations, write_recommendations_json
+from collaboration_engine import EMBEDDINGS_FILE, GAE_DIR, NAMES_FILE, CollaborationEngine, normalize_org_name
+from recommendation_store import RECOMMENDATIONS_FILE, open_recommendation_store
+
+CHECKPOINT_FILE = os.path.join(GAE_DIR, "checkpoint.npz")
+# Graph the current embeddings were trained on, diffed by incremental runs
+SNAPSHOT_FILE = os.path.join(GAE_DIR, "snapshot.npz")
+INPUT_DIM = 64
+HIDDEN_DIM = 128
+OUTPUT_DIM = 64
+LEARNING_RATE = 0.01
+TRAINING_STEPS = 300
+# Positive edges sampled per step (as many negatives are drawn)
+BATCH_EDGES = 65536
+CHECKPOINT_EVERY = 25
+RECOMMENDATIONS_PER_ORG = 5
+# Incremental runs fine-tune this many hops around organizations whose collaborations changed
+INCREMENTAL_HOPS = 2
+INCREMENTAL_STEPS = 50
+# Embedding rows that moved less than this keep their recommendations
+EMBEDDING_TOLERANCE = 1e-5
+# Score matrix elements per block when checking which lists a changed organization enters
+SCORE_BLOCK_ELEMENTS = 1 << 24
+_PARAMETERS = ("features", "w1", "w2")
+
+
+def build_organization_graph(org_df, giant_component=True):
+    """Organization co-participation graph: (names, binary symmetric CSR adjacency).
+
+    Nodes are normalized organization names, as in data.json. The adjacency is
+    B Bᵀ of the sparse organization x project incidence matrix B, so memory is
+    linear in the number of edges. Like the original notebook, only the giant
+    component is kept by default.
+    """
+    orgs = org_df.dropna(subset=['name', 'projectID'])
+    name_codes, names = pd.factorize(normalize_org_name(orgs['name']), sort=True)
+    project_codes, projects = pd.factorize(orgs['projectID'].astype(str))
+    incidence = sp.csr_matrix(
+        (np.ones(len(orgs), dtype=np.float32), (name_codes, project_codes)),
+        shape=(len(names), len(projects)),
+    )
+    incidence.data[:] = 1
+    adjacency = (incidence @ incidence.T).tocsr()
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    adjacency.data[:] = 1
+    names = np.asarray(names, dtype=object)
+    if giant_component and adjacency.shape[0]:
+        _, labels = connected_components(adjacency, directed=False)
+        keep = np.flatnonzero(labels == np.argmax(np.bincount(labels)))
+        adjacency = adjacency[keep][:, keep].tocsr()
+        names = names[keep]
+    return names.tolist(), adjacency
+
+
+def upper_edges(adjacency):
+    """Each undirected edge once, as (u, v) arrays with u < v"""
+    upper = sp.triu(adjacency, k=1).tocoo()
+    return upper.row.astype(np.int64), upper.col.astype(np.int64)
+
+
+def normalized_adjacency(adjacency):
+    """Â = D^-1/2 (A + I) D^-1/2, the GCN propagation matrix"""
+    with_loops = (adjacency + sp.identity(adjacency.shape[0], dtype=np.float32, format="csr")).tocsr()
+    inv_sqrt = 1.0 / np.sqrt(np.asarray(with_loops.sum(axis=1)).ravel())
+    scale = sp.diags(inv_sqrt.astype(np.float32))
+    return (scale @ with_loops @ scale).astype(np.float32).tocsr()
+
+
+def _glorot(rng, n_in, n_out):
+    limit = np.sqrt(6.0 / (n_in + n_out))
+    return rng.uniform(-limit, limit, size=(n_in, n_out)).astype(np.float32)
+
+
+class SparseGCNAutoencoder:
+    """Graph autoencoder with a two-layer GCN encoder and an inner-product decoder.
+
+    Z = Â relu(Â X W1) W2, where X holds one learned feature row per organization,
+    and an edge (u, v) is scored sigmoid(z_u . z_v). Gradients are derived by hand
+    and applied with Adam. Every step costs four sparse products with Â
+    (O(edges * dim)) plus the sampled pairs, so nothing is ever N x N. Sparse
+    products and pair gradients run on a thread pool (SciPy and NumPy release the
+    GIL in these kernels).
+    """
+
+    def __init__(self, adjacency, input_dim=INPUT_DIM, hidden_dim=HIDDEN_DIM, output_dim=OUTPUT_DIM,
+                 seed=42, n_threads=None):
+        self.adjacency = adjacency.tocsr()
+        self.propagation = normalized_adjacency(self.adjacency)
+        self.n_threads = n_threads or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.n_threads, thread_name_prefix="gae")
+        bounds = np.linspace(0, self.n_nodes, self.n_threads + 1).astype(np.int64)
+        self._row_blocks = [self.propagation[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        self.rng = np.random.default_rng(seed)
+        self.params = {
+            "features": self.rng.normal(0.0, 0.1, size=(self.n_nodes, input_dim)).astype(np.float32),
+            "w1": _glorot(self.rng, input_dim, hidden_dim),
+            "w2": _glorot(self.rng, hidden_dim, output_dim),
+        }
+        self.adam_m = {name: np.zeros_like(value) for name, value in self.params.items()}
+        self.adam_v = {name: np.zeros_like(value) for name, value in self.params.items()}
+        self.step_count = 0
+        # Fine-tuning controls: parameters left untouched, and the feature rows that may change
+        self.frozen = set()
+        self.trainable_rows = None
+
+    @property
+    def n_nodes(self):
+        return self.adjacency.shape[0]
+
+    def _propagate(self, x):
+        """Â @ x, one row block per thread"""
+        if len(self._row_blocks) == 1:
+            return self._row_blocks[0] @ x
+        return np.vstack(list(self._executor.map(lambda block: block @ x, self._row_blocks)))
+
+    def _forward(self):
+        p = self.params
+        r = self._propagate(p["features"])
+        q = r @ p["w1"]
+        h = np.maximum(q, 0)
+        a = self._propagate(h)
+        return {"r": r, "q": q, "a": a, "z": a @ p["w2"]}
+
+    def embed(self):
+        return self._forward()["z"]
+
+    def _pair_gradient(self, z, u, v, labels):
+        # Binary cross-entropy on logits z_u . z_v; the gradient scatters back with one sparse product
+        logits = np.einsum("ij,ij->i", z[u], z[v])
+        loss = float(np.sum(np.logaddexp(0, logits) - labels * logits))
+        weights = (1.0 / (1.0 + np.exp(-logits)) - labels).astype(np.float32)
+        coefficients = sp.csr_matrix((weights, (u, v)), shape=(self.n_nodes, self.n_nodes))
+        return loss, coefficients @ z + coefficients.T @ z
+
+    def _backward(self, cache, dz):
+        p = self.params
+        grads = {"w2": cache["a"].T @ dz}
+        dh = self._propagate(dz @ p["w2"].T)  # Â is symmetric
+        dq = dh * (cache["q"] > 0)
+        grads["w1"] = cache["r"].T @ dq
+        grads["features"] = self._propagate(dq @ p["w1"].T)
+        return grads
+
+    def _adam(self, grads, learning_rate, beta1=0.9, beta2=0.999, eps=1e-8):
+        self.step_count += 1
+        correction1 = 1 - beta1 ** self.step_count
+        correction2 = 1 - beta2 ** self.step_count
+        for name, grad in grads.items():
+            if name in self.frozen:
+                continue
+            rows = slice(None)
+            if name == "features" and self.trainable_rows is not None:
+                rows = self.trainable_rows
+                grad = grad[rows]
+            m = beta1 * self.adam_m[name][rows] + (1 - beta1) * grad
+            v = beta2 * self.adam_v[name][rows] + (1 - beta2) * grad * grad
+            self.adam_m[name][rows] = m
+            self.adam_v[name][rows] = v
+            self.params[name][rows] -= (learning_rate / correction1) * m / (np.sqrt(v / correction2) + eps)
+
+    def train_step(self, u, v, labels, learning_rate=LEARNING_RATE):
+        """One Adam step on the pairs (u, v) with 0/1 labels; returns the mean loss"""
+        cache = self._forward()
+        chunks = np.array_split(np.arange(len(u)), self.n_threads)
+        results = list(self._executor.map(
+            lambda c: self._pair_gradient(cache["z"], u[c], v[c], labels[c]), [c for c in chunks if len(c)]
+        ))
+        loss = sum(r[0] for r in results) / len(u)
+        dz = sum(r[1] for r in results) / np.float32(len(u))
+        self._adam(self._backward(cache, dz), learning_rate)
+        return loss
+
+    def sample_pairs(self, positive_u, positive_v, batch_edges, edge_subset=None):
+        """Sampled positive edges plus as many negatives, drawn by corrupting the target node.
+
+        `edge_subset` restricts positives to those edge positions. Negatives are not
+        checked against the graph: in a sparse graph almost all of them are non-edges.
+        """
+        candidates = np.arange(len(positive_u)) if edge_subset is None else edge_subset
+        picked = candidates if len(candidates) <= batch_edges else self.rng.choice(candidates, batch_edges, replace=False)
+        u = positive_u[picked]
+        negatives = self.rng.integers(0, self.n_nodes, size=len(picked))
+        return (
+            np.concatenate([u, u]),
+            np.concatenate([positive_v[picked], negatives]),
+            np.concatenate([np.ones(len(picked), np.float32), np.zeros(len(picked), np.float32)]),
+        )
+
+    def state(self):
+        state = {f"param_{k}": v for k, v in self.params.items()}
+        state.update({f"m_{k}": v for k, v in self.adam_m.items()})
+        state.update({f"v_{k}": v for k, v in self.adam_v.items()})
+        state["step_count"] = np.array(self.step_count)
+        return state
+
+    def load_state(self, state):
+        for name in _PARAMETERS:
+            if state[f"param_{name}"].shape != self.params[name].shape:
+                raise ValueError(f"checkpoint {name} has shape {state[f'param_{name}'].shape}, expected {self.params[name].shape}")
+        for name in _PARAMETERS:
+            self.params[name] = np.array(state[f"param_{name}"], dtype=np.float32)
+            self.adam_m[name] = np.array(state[f"m_{name}"], dtype=np.float32)
+            self.adam_v[name] = np.array(state[f"v_{name}"], dtype=np.float32)
+        self.step_count = int(state["step_count"])
+
+
+def save_checkpoint(model, names, path=CHECKPOINT_FILE):
+    """Parameters, optimizer state and node names, written atomically"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, names=np.asarray(names, dtype=str), **model.state())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(model, names, path=CHECKPOINT_FILE):
+    """Restore `model` from `path`; returns False when it is missing or for another graph"""
+    if not os.path.exists(path):
+        return False
+    try:
+        with np.load(path) as state:
+            if state["names"].tolist() != list(names):
+                print(f"Checkpoint {path} was trained on a different organization graph; starting from scratch.")
+                return False
+            model.load_state(state)
+        return True
+    except Exception as e:
+        print(f"Error loading checkpoint {path}: {e}")
+        return False
+
+
+def train_gae(model, names, steps=TRAINING_STEPS, batch_edges=BATCH_EDGES, learning_rate=LEARNING_RATE,
+              checkpoint_path=CHECKPOINT_FILE, checkpoint_every=CHECKPOINT_EVERY, edge_subset=None):
+    """Run `steps` Adam steps on sampled edges, checkpointing every `checkpoint_every` steps"""
+    positive_u, positive_v = upper_edges(model.adjacency)
+    n_edges = len(positive_u) if edge_subset is None else len(edge_subset)
+    print(f"Training GAE on {model.n_nodes} organizations and {n_edges} edges with {model.n_threads} threads.")
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        u, v, labels = model.sample_pairs(positive_u, positive_v, batch_edges, edge_subset=edge_subset)
+        loss = model.train_step(u, v, labels, learning_rate)
+        if step == 1 or step % 10 == 0:
+            print(f"[GAE] Step {step:03d}, loss: {loss:.4f} ({time.perf_counter() - start:.1f}s)")
+        if checkpoint_path and (step % checkpoint_every == 0 or step == steps):
+            save_checkpoint(model, names, checkpoint_path)
+    return model
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _save_npy(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def save_embeddings(embeddings, names, embeddings_file=EMBEDDINGS_FILE, names_file=NAMES_FILE):
+    """Write the files read by the collaboration engine; the names file is written last"""
+    os.makedirs(os.path.dirname(embeddings_file) or ".", exist_ok=True)
+    _save_npy(embeddings_file, np.asarray(embeddings, dtype=np.float32))
+    _write_json(names_file, list(names))
+    print(f"Embeddings for {len(names)} organizations saved to {embeddings_file}.")
+
+
+def write_recommendations(embeddings, names, dataset, k=RECOMMENDATIONS_PER_ORG, json_path=RECOMMENDATIONS_FILE):
+    """Regenerate data.json from new embeddings and convert it into the memory-mapped store"""
+    engine = CollaborationEngine(embeddings, names, org_df=dataset.org_df, graph_index=dataset.graph_index)
+    index = load_or_build_ivf_index() if len(engine) > EXACT_SEARCH_MAX_ROWS else None
+    recommendations = regenerate_recommendations(engine, index, k=k)
+    write_recommendations_json(recommendations, json_path)
+    store = open_recommendation_store(json_path, rebuild=True)
+    print(f"{len(store)} recommendation lists written to {json_path}.")
+    return store
+
+
+def project_ids(org_df):
+    return np.asarray(org_df['projectID'].dropna().astype(str).unique(), dtype=str)
+
+
+def save_snapshot(names, adjacency, projects, path=SNAPSHOT_FILE):
+    """Record the graph behind the current embeddings for the next incremental run"""
+    edge_u, edge_v = upper_edges(adjacency)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, names=np.asarray(names, dtype=str), edge_u=edge_u, edge_v=edge_v, projects=np.sort(projects))
+    os.replace(tmp_path, path)
+
+
+def diff_graph(snapshot, names, adjacency):
+    """Compare the new graph with a snapshot: (affected, new) boolean masks over the new rows.
+
+    An organization is affected when it gained or lost an edge, including edges to
+    organizations that left the graph, or when it is new.
+    """
+    n = len(names)
+    position = pd.Index(names).get_indexer(snapshot["names"].tolist())  # old row -> new row, -1 if gone
+    old_u, old_v = position[snapshot["edge_u"]], position[snapshot["edge_v"]]
+    both = (old_u >= 0) & (old_v >= 0)
+    lost_partner = np.concatenate([old_u[(old_u >= 0) & (old_v < 0)], old_v[(old_v >= 0) & (old_u < 0)]])
+    old_keys = np.minimum(old_u[both], old_v[both]) * n + np.maximum(old_u[both], old_v[both])
+    new_u, new_v = upper_edges(adjacency)
+    changed = np.setxor1d(old_keys, new_u * n + new_v, assume_unique=True)
+
+    is_new = np.ones(n, dtype=bool)
+    is_new[position[position >= 0]] = False
+    affected = is_new.copy()
+    affected[changed // n] = True
+    affected[changed % n] = True
+    affected[lost_partner] = True
+    return affected, is_new
+
+
+def k_hop_mask(adjacency, seeds, hops):
+    """Rows within `hops` edges of the `seeds` mask, by repeated sparse products"""
+    mask = seeds.copy()
+    for _ in range(hops):
+        mask |= (adjacency @ mask.astype(np.float32)) > 0
+    return mask
+
+
+def checkpoint_dims(path=CHECKPOINT_FILE):
+    with np.load(path) as state:
+        w1, w2 = state["param_w1"].shape, state["param_w2"].shape
+    return w1[0], w1[1], w2[1]
+
+
+def warm_start(model, names, path=CHECKPOINT_FILE):
+    """Initialize `model` from a checkpoint of an earlier graph, matching organizations by name.
+
+    Weights, known feature rows and their Adam moments are copied; organizations new
+    to the graph start from the mean features of their known neighbours.
+    """
+    with np.load(path) as state:
+        position = pd.Index(state["names"].tolist()).get_indexer(names)
+        known = position >= 0
+        for prefix, target in (("param_", model.params), ("m_", model.adam_m), ("v_", model.adam_v)):
+            target["w1"][...] = state[f"{prefix}w1"]
+            target["w2"][...] = state[f"{prefix}w2"]
+            target["features"][known] = state[f"{prefix}features"][position[known]]
+        model.step_count = int(state["step_count"])
+    features = model.params["features"]
+    counts = model.adjacency @ known.astype(np.float32)
+    sums = model.adjacency @ (features * known[:, None])
+    fill = ~known & (counts > 0)
+    features[fill] = sums[fill] / counts[fill, None]
+
+
+def changed_embeddings(embeddings, names, old_embeddings, old_names):
+    """Rows whose embedding is new or moved by more than EMBEDDING_TOLERANCE"""
+    position = pd.Index(old_names).get_indexer(names)
+    changed = position < 0
+    known = ~changed
+    moved = np.abs(embeddings[known] - old_embeddings[position[known]]).max(axis=1, initial=0)
+    changed[known] = moved > EMBEDDING_TOLERANCE
+    return changed
+
+
+def update_recommendations(embeddings, names, dataset, changed, affected, k=RECOMMENDATIONS_PER_ORG,
+                           json_path=RECOMMENDATIONS_FILE):
+    """Recompute only the data.json entries an update can affect, then rebuild the store.
+
+    An entry is recomputed when its organization is new, changed embedding or
+    partners, when it lists an organization that changed or left the graph, or
+    when a changed organization now scores at least its current k-th partner.
+    Scores are compared as logits recomputed from the embeddings, since the
+    sigmoid scores stored in data.json saturate for strong pairs.
+    """
+    if not os.path.exists(json_path):
+        return write_recommendations(embeddings, names, dataset, k=k, json_path=json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    if max((len(entries) for entries in previous.values()), default=0) != k:
+        print(f"{json_path} does not hold top-{k} lists; regenerating all of them.")
+        return write_recommendations(embeddings, names, dataset, k=k, json_path=json_path)
+
+    row_of = {name: row for row, name in enumerate(names)}
+    changed_names = {names[row] for row in np.flatnonzero(changed)}
+    stale = changed | affected
+    listed = np.zeros(len(names), dtype=bool)
+    kth_partner = np.full(len(names), -1, dtype=np.int64)
+    for name, entries in previous.items():
+        row = row_of.get(name)
+        if row is None:
+            continue
+        listed[row] = True
+        if any(partner in changed_names or partner not in row_of for partner, _ in entries):
+            stale[row] = True
+        elif len(entries) == k:
+            kth_partner[row] = row_of[entries[-1][0]]
+    stale |= ~listed
+
+    changed_rows = np.flatnonzero(changed)
+    if len(changed_rows):
+        changed_vectors = np.asarray(embeddings[changed_rows], dtype=np.float32)
+        block_rows = max(1, SCORE_BLOCK_ELEMENTS // len(changed_rows))
+        for start in range(0, len(names), block_rows):
+            block = np.asarray(embeddings[start:start + block_rows], dtype=np.float32)
+            partners = kth_partner[start:start + block_rows]
+            # Unchanged rows with an unchanged k-th partner score it exactly as before
+            kth_logit = np.where(partners >= 0, np.einsum("ij,ij->i", block, np.asarray(embeddings[np.maximum(partners, 0)])), -np.inf)
+            stale[start:start + block_rows] |= (block @ changed_vectors.T).max(axis=1) >= kth_logit
+
+    rows = np.flatnonzero(stale)
+    print(f"Updating {len(rows)} of {len(names)} recommendation lists.")
+    engine = CollaborationEngine(embeddings, names, org_df=dataset.org_df, graph_index=dataset.graph_index)
+    index = load_or_build_ivf_index() if len(engine) > EXACT_SEARCH_MAX_ROWS else None
+    recommendations = {name: entries for name, entries in previous.items() if name in row_of}
+    recommendations.update(regenerate_recommendations(engine, index, k=k, rows=rows))
+    write_recommendations_json(recommendations, json_path)
+    store = open_recommendation_store(json_path, rebuild=True)
+    print(f"{len(store)} recommendation lists written to {json_path}.")
+    return store
+
+
+def incremental_update(dataset, steps=INCREMENTAL_STEPS, hops=INCREMENTAL_HOPS, batch_edges=BATCH_EDGES,
+                       learning_rate=LEARNING_RATE, k=RECOMMENDATIONS_PER_ORG, n_threads=None,
+                       giant_component=True, recommendations=True):
+    """Warm-start from the last run and fine-tune around the organizations whose collaborations changed.
+
+    The weights stay frozen and only the feature rows within `hops` of an affected
+    organization are trained, on the edges touching them, so embeddings elsewhere do
+    not move. Returns False when there is no previous run to start from.
+    """
+    for path in (SNAPSHOT_FILE, CHECKPOINT_FILE, EMBEDDINGS_FILE, NAMES_FILE):
+        if not os.path.exists(path):
+            print(f"{path} is missing; run a full training first.")
+            return False
+
+    names, adjacency = build_organization_graph(dataset.org_df, giant_component=giant_component)
+    projects = project_ids(dataset.org_df)
+    with np.load(SNAPSHOT_FILE) as snapshot:
+        new_projects = len(np.setdiff1d(projects, snapshot["projects"]))
+        removed = len(snapshot["names"]) - int(np.isin(snapshot["names"], np.asarray(names, dtype=str)).sum())
+        affected, is_new = diff_graph(snapshot, names, adjacency)
+    print(f"{new_projects} new projects: {int(is_new.sum())} new and {removed} removed organizations, "
+          f"{int(affected.sum())} organizations with changed collaborations.")
+    if not affected.any() and removed == 0:
+        print("The organization graph has not changed since the last run.")
+        return True
+
+    model = SparseGCNAutoencoder(adjacency, *checkpoint_dims(), n_threads=n_threads)
+    warm_start(model, names)
+    region = k_hop_mask(adjacency, affected, hops)
+    model.frozen = {"w1", "w2"}
+    model.trainable_rows = np.flatnonzero(region)
+    edge_u, edge_v = upper_edges(adjacency)
+    edge_subset = np.flatnonzero(region[edge_u] | region[edge_v])
+    print(f"Fine-tuning {len(model.trainable_rows)} organizations within {hops} hops.")
+    train_gae(model, names, steps=steps, batch_edges=batch_edges, learning_rate=learning_rate, edge_subset=edge_subset)
+
+    embeddings = model.embed()
+    old_embeddings = np.load(EMBEDDINGS_FILE)
+    with open(NAMES_FILE, "r", encoding="utf-8") as f:
+        old_names = json.load(f)
+    changed = changed_embeddings(embeddings, names, old_embeddings, old_names)
+    print(f"{int(changed.sum())} embeddings changed.")
+    save_embeddings(embeddings, names)
+    save_snapshot(names, adjacency, projects)
+    if recommendations:
+        update_recommendations(np.load(EMBEDDINGS_FILE, mmap_mode="r"), names, dataset, changed, affected, k=k)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the organization graph autoencoder on CPU and regenerate recommendations.")
+    parser.add_argument("--steps", type=int, default=None,
+                        help=f"Adam steps (default: {TRAINING_STEPS}, or {INCREMENTAL_STEPS} with --incremental)")
+    parser.add_argument("--batch-edges", type=int, default=BATCH_EDGES, help="Positive edges sampled per step")
+    parser.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    parser.add_argument("--dims", default=f"{INPUT_DIM},{HIDDEN_DIM},{OUTPUT_DIM}", help="Input, hidden and output dimensions")
+    parser.add_argument("--threads", type=int, default=None, help="Worker threads (default: all CPUs)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--resume", action="store_true", help=f"Continue from {CHECKPOINT_FILE} when it matches the graph")
+    parser.add_argument("--all-components", action="store_true", help="Train on every organization, not only the giant component")
+    parser.add_argument("--k", type=int, default=RECOMMENDATIONS_PER_ORG, help="Recommendations per organization")
+    parser.add_argument("--no-recommendations", action="store_true", help="Only write the embeddings")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Warm-start from the last run and fine-tune only around changed collaborations")
+    parser.add_argument("--hops", type=int, default=INCREMENTAL_HOPS, help="Neighbourhood fine-tuned by --incremental")
+    args = parser.parse_args(argv)
+
+    from shared_dataset import get_shared_dataset
+    dataset = get_shared_dataset()
+    if args.incremental:
+        if incremental_update(dataset, steps=args.steps or INCREMENTAL_STEPS, hops=args.hops,
+                              batch_edges=args.batch_edges, learning_rate=args.learning_rate, k=args.k,
+                              n_threads=args.threads, giant_component=not args.all_components,
+                              recommendations=not args.no_recommendations):
+            return
+        print("Falling back to a full training run.")
+    names, adjacency = build_organization_graph(dataset.org_df, giant_component=not args.all_components)
+    input_dim, hidden_dim, output_dim = (int(d) for d in args.dims.split(","))
+    model = SparseGCNAutoencoder(adjacency, input_dim, hidden_dim, output_dim, seed=args.seed, n_threads=args.threads)
+    if args.resume and load_checkpoint(model, names):
+        print(f"Resumed from {CHECKPOINT_FILE} at step {model.step_count}.")
+    train_gae(model, names, steps=args.steps or TRAINING_STEPS, batch_edges=args.batch_edges, learning_rate=args.learning_rate)
+
+    embeddings = model.embed()
+    save_embeddings(embeddings, names)
+    save_snapshot(names, adjacency, project_ids(dataset.org_df))
+    if not args.no_recommendations:
+        write_recommendations(np.load(EMBEDDINGS_FILE, mmap_mode="r"), names, dataset, k=args.k)
+
+
+if __name__ == "__main__":
+    main()
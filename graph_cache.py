@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from data_cache import _pid_alive
+
+DEFAULT_MAX_ENTRIES = 200
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+
+def graph_cache_key(selected_org_ids, dataset_version, variant=""):
+    """Content address of a rendered graph: the sorted selection, the dataset version and render options"""
+    payload = json.dumps([sorted(str(i) for i in selected_org_ids), dataset_version, variant])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class GraphRenderCache:
+    """Rendered graph files addressed by content and evicted in LRU order.
+
+    The cache is bounded both by the number of entries and by their total size.
+    An entry is the main file plus optional companion files sharing its key
+    (e.g. `<key>.members.json`), which are evicted together. Files already present
+    in the directory when the cache is created are adopted (oldest first, orphaned
+    companions before complete entries), so restarts keep the directory bounded too.
+    """
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, suffix=".html"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._entries = OrderedDict()  # key -> file size in bytes, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._adopt_existing_files()
+
+    def _adopt_existing_files(self):
+        existing = {}
+        for path in self.directory.iterdir():
+            if path.name.endswith(".tmp"):
+                self._remove_abandoned_tmp_file(path)
+                continue
+            if not path.is_file():
+                continue
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            # Every file of an entry is named <key>.<suffix>, main file and companions alike
+            key = path.name.split(".", 1)[0]
+            existing[key] = max(existing.get(key, 0.0), mtime)
+        # Companions left without their main file (e.g. by an interrupted run) are adopted too,
+        # ahead of complete entries, so they are the first to be evicted
+        order = sorted(existing, key=lambda key: (self.path_for(key).exists(), existing[key]))
+        for key in order:
+            size = sum(self._file_size(p) for p in self._entry_files(key))
+            self._entries[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def path_for(self, key):
+        return self.directory / f"{key}{self.suffix}"
+
+    def _entry_files(self, key):
+        # In-flight writes (<file>.<pid>.<thread>.tmp) belong to their writer, not to the entry
+        return [path for path in self.directory.glob(f"{key}.*") if not path.name.endswith(".tmp")]
+
+    @staticmethod
+    def _remove_abandoned_tmp_file(path):
+        # Left by a writer that died between writing and renaming; live writers' files are kept
+        parts = path.name.split(".")
+        if len(parts) >= 4 and parts[-3].isdigit() and not _pid_alive(int(parts[-3])):
+            try:
+                path.unlink()
+            except OSError as e:
+                print(f"Could not remove abandoned graph file {path}: {e}")
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+
+    def _write(self, path, data):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        """Return the cached file for `key`, or None on a miss"""
+        with self._lock:
+            path = self.path_for(key)
+            if key in self._entries and path.exists():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return path
+            if key in self._entries:
+                # Removed behind our back (e.g. by another worker's eviction)
+                self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, content, companions=None):
+        """Store rendered content under `key` and evict old entries if over budget.
+
+        `companions` maps a file suffix (e.g. ".members.json") to extra content stored
+        and evicted together with the main file. Companions are written first so the
+        main file never references a missing companion.
+        """
+        size = 0
+        for suffix, extra in (companions or {}).items():
+            extra_data = extra.encode("utf-8") if isinstance(extra, str) else extra
+            self._write(self.directory / f"{key}{suffix}", extra_data)
+            size += len(extra_data)
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        path = self.path_for(key)
+        self._write(path, data)
+        size += len(data)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict(keep=key)
+        return path
+
+    def get_or_render(self, key, render):
+        """Return (path, hit); on a miss `render()` produces the content to store"""
+        path = self.get(key)
+        if path is not None:
+            return path, True
+        return self.put(key, render()), False
+
+    def _evict(self, keep=None):
+        # Caller holds the lock
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            self._total_bytes -= self._entries.pop(key)
+            self.evictions += 1
+            for path in self._entry_files(key):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Could not evict cached graph file {path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,181 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR, publish_dir, tmp_dir_for
+
+INDEX_FORMAT_VERSION = 1
+
+
+def _csr(codes, n):
+    """Group row positions by their dense code: returns (offsets, neighbours)"""
+    valid = codes >= 0
+    rows = np.flatnonzero(valid)
+    order = np.argsort(codes[valid], kind="stable")  # stable keeps table order inside each group
+    neighbours = rows[order].astype(np.int64)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[valid], minlength=n), out=offsets[1:])
+    return offsets, neighbours
+
+
+def gather(offsets, neighbours, codes):
+    """Concatenate the CSR neighbour lists of `codes` in O(len(codes) + result size)"""
+    codes = np.asarray(codes, dtype=np.int64)
+    starts = offsets[codes]
+    lengths = offsets[codes + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=neighbours.dtype)
+    segment_starts = np.cumsum(lengths) - lengths
+    positions = np.arange(total) - np.repeat(segment_starts, lengths) + np.repeat(starts, lengths)
+    return neighbours[positions]
+
+
+@dataclass(frozen=True)
+class GraphIndex:
+    """Integer-coded Organization <-> Project <-> Topic adjacency over the shared tables.
+
+    Organisation IDs and project IDs are remapped to dense codes. Each CSR pair
+    (`*_offsets`, `*_rows`) lists, per code, the row positions in the source
+    table, so a subgraph is extracted by gathering only the rows it touches.
+    """
+    org_ids: np.ndarray           # sorted unique organisationIDs (str); the position is the org code
+    project_keys: np.ndarray      # projectIDs by project code (str, for reference)
+    org_row_project: np.ndarray   # project code of every org_df row, -1 if missing
+    org_offsets: np.ndarray       # org code -> org_df rows (participations)
+    org_rows: np.ndarray
+    proj_org_offsets: np.ndarray  # project code -> org_df rows
+    proj_org_rows: np.ndarray
+    proj_offsets: np.ndarray      # project code -> proj_df rows
+    proj_rows: np.ndarray
+    topic_offsets: np.ndarray     # project code -> topic_df rows
+    topic_rows: np.ndarray
+
+    def org_codes(self, organisation_ids):
+        """Dense codes of the given organisationIDs; unknown IDs are dropped"""
+        ids = np.asarray([str(i) for i in organisation_ids], dtype=str)
+        if len(ids) == 0 or len(self.org_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        positions = np.searchsorted(self.org_ids, ids)
+        positions = np.minimum(positions, len(self.org_ids) - 1)
+        return np.unique(positions[self.org_ids[positions] == ids]).astype(np.int64)
+
+    def projects_of(self, org_codes):
+        """Project codes reached from the given organisation codes"""
+        project_codes = self.org_row_project[gather(self.org_offsets, self.org_rows, org_codes)]
+        return np.unique(project_codes[project_codes >= 0])
+
+    def subgraph_rows(self, selected_org_ids):
+        """Row positions of the selection in (org_df, proj_df, topic_df), in table order.
+
+        Equivalent to filtering org_df by organisationID and proj_df/topic_df by the
+        reached projectIDs with `isin`, at O(sum of degrees) cost.
+        """
+        org_codes = self.org_codes(selected_org_ids)
+        org_rows = np.sort(gather(self.org_offsets, self.org_rows, org_codes))
+        project_codes = self.org_row_project[org_rows]
+        project_codes = np.unique(project_codes[project_codes >= 0])
+        proj_rows = np.sort(gather(self.proj_offsets, self.proj_rows, project_codes))
+        topic_rows = np.sort(gather(self.topic_offsets, self.topic_rows, project_codes))
+        return org_rows, proj_rows, topic_rows
+
+    def subgraph(self, org_df, proj_df, topic_df, selected_org_ids):
+        """Return the (org, project, topic) frames of the selection as row selections of the tables"""
+        org_rows, proj_rows, topic_rows = self.subgraph_rows(selected_org_ids)
+        return org_df.take(org_rows), proj_df.take(proj_rows), topic_df.take(topic_rows)
+
+    def save(self, directory):
+        """Write every array as .npy (loadable with mmap) plus a small metadata file"""
+        directory = os.fspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        for field in fields(self):
+            np.save(os.path.join(directory, f"{field.name}.npy"), getattr(self, field.name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        directory = os.fspath(directory)
+        mode = "r" if mmap else None
+        return cls(**{
+            field.name: np.load(os.path.join(directory, f"{field.name}.npy"), mmap_mode=mode)
+            for field in fields(cls)
+        })
+
+
+def build_graph_index(org_df, proj_df, topic_df):
+    """Build the CSR index from the organisation, project and topic tables"""
+    org_ids, org_codes = np.unique(org_df['organisationID'].astype(str).to_numpy(dtype=str), return_inverse=True)
+
+    # Factorize projectIDs of all three tables together so the same ID gets the same code everywhere
+    all_project_ids = pd.concat(
+        [org_df['projectID'], proj_df['projectID'], topic_df['projectID']], ignore_index=True
+    )
+    project_codes, project_uniques = pd.factorize(all_project_ids)
+    n_projects = len(project_uniques)
+    n_org_rows, n_proj_rows = len(org_df), len(proj_df)
+    org_row_project = project_codes[:n_org_rows].astype(np.int64)
+    proj_row_project = project_codes[n_org_rows:n_org_rows + n_proj_rows].astype(np.int64)
+    topic_row_project = project_codes[n_org_rows + n_proj_rows:].astype(np.int64)
+
+    org_offsets, org_rows = _csr(org_codes.astype(np.int64).ravel(), len(org_ids))
+    proj_org_offsets, proj_org_rows = _csr(org_row_project, n_projects)
+    proj_offsets, proj_rows = _csr(proj_row_project, n_projects)
+    topic_offsets, topic_rows = _csr(topic_row_project, n_projects)
+
+    return GraphIndex(
+        org_ids=org_ids,
+        project_keys=np.asarray(pd.Index(project_uniques).astype(str), dtype=str),
+        org_row_project=org_row_project,
+        org_offsets=org_offsets,
+        org_rows=org_rows,
+        proj_org_offsets=proj_org_offsets,
+        proj_org_rows=proj_org_rows,
+        proj_offsets=proj_offsets,
+        proj_rows=proj_rows,
+        topic_offsets=topic_offsets,
+        topic_rows=topic_rows,
+    )
+
+
+def index_dir_for(version):
+    return CACHE_DIR / f"graph_index-{version}"
+
+
+def load_or_build_graph_index(org_df, proj_df, topic_df, version):
+    """Load the persisted index for this dataset version with mmap, building it if needed.
+
+    The index is written to a temporary directory and renamed into place, so
+    workers starting concurrently either see a complete index or build their own.
+    """
+    directory = index_dir_for(version)
+    meta_path = directory / "meta.json"
+    expected_meta = {
+        "format": INDEX_FORMAT_VERSION,
+        "rows": [len(org_df), len(proj_df), len(topic_df)],
+    }
+    if meta_path.exists():
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                if json.load(f) == expected_meta:
+                    return GraphIndex.load(directory, mmap=True)
+        except Exception as e:
+            print(f"Error loading graph index from {directory}, rebuilding it: {e}")
+
+    index = build_graph_index(org_df, proj_df, topic_df)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_dir = tmp_dir_for(directory)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        index.save(tmp_dir)
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(expected_meta, f)
+        if not publish_dir(tmp_dir, directory, "graph_index-*"):
+            print(f"Graph index published concurrently by another worker, loading {directory}.")
+            return GraphIndex.load(directory, mmap=True)
+        print(f"Graph index saved to {directory}.")
+    except OSError as e:
+        print(f"Could not persist graph index: {e}")
+    return index
@@ -0,0 +1,130 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once every session waiting for it has moved on"""
+
+
+class QueueFullError(Exception):
+    """Raised when the pool already holds the maximum number of queued and running jobs"""
+
+
+class GraphJob:
+    """One graph build, possibly shared by several sessions that asked for the same key"""
+
+    def __init__(self, key):
+        self.key = key
+        self.status = "queued"
+        self.subscribers = set()
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    def set_status(self, status):
+        self.status = status
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Call between stages; aborts the job if nobody is waiting for it any more"""
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.key)
+
+
+class GraphJobPool:
+    """Bounded worker pool for graph builds, kept off the Shiny event loop.
+
+    - Jobs are keyed (e.g. by the render cache key); a request for a key that is
+      already queued or running joins that job instead of starting a new one.
+    - Each session has at most one job: submitting a new one releases the
+      previous job, which is cancelled once no other session waits for it.
+    - At most `max_workers + max_queue` distinct jobs are accepted at a time.
+
+    Threads are used rather than processes so jobs work directly on the shared
+    in-memory dataset; the heavy pandas/NumPy steps release the GIL.
+    """
+
+    def __init__(self, max_workers=2, max_queue=8):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="graph-job")
+        self._lock = threading.Lock()
+        self._jobs = {}           # key -> in-flight GraphJob
+        self._session_jobs = {}   # session id -> key of that session's current job
+        self.coalesced = 0
+
+    def submit(self, session_id, key, fn):
+        """Run `fn(job)` for this session, joining an identical in-flight job if there is one"""
+        with self._lock:
+            previous_key = self._session_jobs.get(session_id)
+            if previous_key is not None and previous_key != key:
+                self._release_locked(session_id, previous_key)
+
+            job = self._jobs.get(key)
+            if job is not None and not job.cancelled:
+                if session_id not in job.subscribers:
+                    self.coalesced += 1
+            else:
+                if len(self._jobs) >= self.max_workers + self.max_queue:
+                    raise QueueFullError(
+                        f"Too many graph requests in progress ({len(self._jobs)}); please try again shortly."
+                    )
+                job = GraphJob(key)
+                self._jobs[key] = job
+                job.future = self._executor.submit(self._run, job, fn)
+            job.subscribers.add(session_id)
+            self._session_jobs[session_id] = key
+            return job
+
+    def _run(self, job, fn):
+        try:
+            job.check_cancelled()
+            job.set_status("building")
+            result = fn(job)
+            job.set_status("done")
+            return result
+        except JobCancelled:
+            job.set_status("cancelled")
+            raise
+        except Exception:
+            job.set_status("failed")
+            raise
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def release(self, session_id, key=None):
+        """Stop waiting for the session's job; cancels it if no other session needs it"""
+        with self._lock:
+            key = self._session_jobs.get(session_id) if key is None else key
+            if key is not None:
+                self._release_locked(session_id, key)
+
+    def _release_locked(self, session_id, key):
+        if self._session_jobs.get(session_id) == key:
+            del self._session_jobs[session_id]
+        job = self._jobs.get(key)
+        if job is None:
+            return
+        job.subscribers.discard(session_id)
+        if not job.subscribers:
+            job._cancel_event.set()
+            if job.future.cancel():
+                # Never started: drop it now instead of waiting for a worker to pick it up
+                job.set_status("cancelled")
+                del self._jobs[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._jobs),
+                "running": sum(1 for job in self._jobs.values() if job.status == "building" or job.status == "writing"),
+                "coalesced": self.coalesced,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
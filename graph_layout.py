@@ -0,0 +1,140 @@
+import numpy as np
+
+# Up to this many nodes repulsion is computed exactly over all pairs
+EXACT_REPULSION_LIMIT = 500
+# Pairs per block when computing all-pairs repulsion, bounds temporary memory
+_BLOCK_PAIRS = 2_000_000
+# Near-field repulsion looks at most this many neighbours on either side within the same grid cell
+_NEAR_FIELD_CAP = 48
+# Distance between connected nodes in the output, in vis.js canvas pixels
+NODE_SPACING = 60.0
+
+
+def _repulsion_from(pos, points, mass, k2, exclude=None):
+    """Sum of k^2 * mass / d repulsion on every node from `points`, in row blocks"""
+    disp = np.zeros_like(pos)
+    block = max(1, _BLOCK_PAIRS // max(len(points), 1))
+    for start in range(0, len(pos), block):
+        dx = pos[start:start + block, 0, None] - points[None, :, 0]
+        dy = pos[start:start + block, 1, None] - points[None, :, 1]
+        weight = dx * dx
+        weight += dy * dy
+        np.maximum(weight, 1e-9, out=weight)
+        np.divide(k2 * mass, weight, out=weight)
+        if exclude is not None:
+            weight[exclude(start, start + block)] = 0.0
+        disp[start:start + block, 0] = np.einsum("ij,ij->i", dx, weight)
+        disp[start:start + block, 1] = np.einsum("ij,ij->i", dy, weight)
+    return disp
+
+
+def _exact_repulsion(pos, k2):
+    return _repulsion_from(pos, pos, np.ones(len(pos), dtype=pos.dtype), k2)
+
+
+def _grid_repulsion(pos, k2):
+    """Approximate repulsion: cell centroids for the far field, node pairs inside each cell for the near field.
+
+    The near field is exact only for cells of up to _NEAR_FIELD_CAP + 1 nodes. It
+    compares nodes at offsets 1.._NEAR_FIELD_CAP in node order within each cell, so in
+    denser cells (the grid stops growing at 16x16) only that subset of pairs repels.
+    """
+    n = len(pos)
+    grid = int(np.clip(np.sqrt(n / 16), 2, 16))
+    lo = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - lo, 1e-9)
+    cell_xy = np.minimum((grid * (pos - lo) / span).astype(np.int64), grid - 1)
+    cell = cell_xy[:, 0] * grid + cell_xy[:, 1]
+
+    # Far field: every node is pushed by the centroid of each other occupied cell, weighted by its count
+    counts = np.bincount(cell, minlength=grid * grid).astype(pos.dtype)
+    occupied = np.flatnonzero(counts)
+    centroids = np.stack([
+        np.bincount(cell, weights=pos[:, 0], minlength=grid * grid)[occupied],
+        np.bincount(cell, weights=pos[:, 1], minlength=grid * grid)[occupied],
+    ], axis=1) / counts[occupied, None]
+    disp = _repulsion_from(
+        pos, centroids, counts[occupied], k2,
+        exclude=lambda start, stop: occupied[None, :] == cell[start:stop, None],
+    )
+
+    # Near field: repulsion between nodes sharing a cell (nodes sorted by cell, compared at offsets)
+    order = np.argsort(cell, kind="stable")
+    sorted_cell = cell[order]
+    sorted_pos = pos[order]
+    near_i, near_j = [], []
+    max_offset = min(int(counts.max()) - 1, _NEAR_FIELD_CAP)
+    for offset in range(1, max_offset + 1):
+        same = np.flatnonzero(sorted_cell[:-offset] == sorted_cell[offset:])
+        if len(same) == 0:
+            break
+        near_i.append(same)
+        near_j.append(same + offset)
+    if near_i:
+        near_i = np.concatenate(near_i)
+        near_j = np.concatenate(near_j)
+        delta = sorted_pos[near_i] - sorted_pos[near_j]
+        dist2 = np.maximum(np.einsum("ij,ij->i", delta, delta), 1e-9)
+        force = delta * (k2 / dist2)[:, None]
+        for axis in range(2):
+            near = np.bincount(near_i, weights=force[:, axis], minlength=n)
+            near -= np.bincount(near_j, weights=force[:, axis], minlength=n)
+            disp[order, axis] += near
+    return disp
+
+
+def force_directed_layout(n_nodes, sources, targets, iterations=80, seed=42):
+    """Fruchterman-Reingold layout computed with vectorized NumPy operations.
+
+    `sources`/`targets` are integer node positions of the edges. Repulsion is exact
+    for small graphs and grid-approximated above EXACT_REPULSION_LIMIT nodes, so the
+    cost per iteration is roughly linear in nodes + edges. Returns an (n_nodes, 2)
+    array of canvas coordinates scaled so connected nodes sit about NODE_SPACING apart.
+    """
+    if n_nodes == 0:
+        return np.zeros((0, 2))
+    if n_nodes == 1:
+        return np.zeros((1, 2))
+
+    rng = np.random.default_rng(seed)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    pos = rng.random((n_nodes, 2))
+    k = 1.0 / np.sqrt(n_nodes)
+    k2 = k * k
+    repulsion = _exact_repulsion if n_nodes <= EXACT_REPULSION_LIMIT else _grid_repulsion
+
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        disp = repulsion(pos, k2)
+
+        if len(sources):
+            delta = pos[sources] - pos[targets]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+            force = delta * (dist / k)[:, None]
+            for axis in range(2):
+                disp[:, axis] -= np.bincount(sources, weights=force[:, axis], minlength=n_nodes)
+                disp[:, axis] += np.bincount(targets, weights=force[:, axis], minlength=n_nodes)
+
+        # Weak gravity keeps disconnected components from drifting apart
+        disp -= (pos - pos.mean(axis=0)) * (k * 0.5)
+
+        length = np.maximum(np.sqrt(np.einsum("ij,ij->i", disp, disp)), 1e-9)
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    return pos * (NODE_SPACING / k)
+
+
+def apply_layout(nodes, edges, iterations=80, seed=42):
+    """Compute positions for pyvis node dicts and store them as fixed x/y coordinates"""
+    node_position = {node["id"]: i for i, node in enumerate(nodes)}
+    sources = [node_position[edge["from"]] for edge in edges]
+    targets = [node_position[edge["to"]] for edge in edges]
+    positions = force_directed_layout(len(nodes), sources, targets, iterations=iterations, seed=seed)
+    for node, (x, y) in zip(nodes, positions.tolist()):
+        node["x"] = round(x, 1)
+        node["y"] = round(y, 1)
+    return nodes
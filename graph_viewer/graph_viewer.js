@@ -0,0 +1,262 @@
+// Interaction layer of the organisation network graphs.
+// Used inline by the standalone HTML graphs and as a static asset by viewer.html.
+// Expects a global `network` (vis.Network); `lodMembersUrl` points to the
+// level-of-detail drill-down JSON when the graph has super-nodes.
+
+// Store original colors and opacity for all nodes
+var allNodesOriginalData = {};
+
+// Function to store original node data
+function storeOriginalNodeData() {
+  var nodes = network.body.data.nodes;
+  var nodeIds = nodes.getIds();
+  nodeIds.forEach(function(nodeId) {
+    var nodeData = nodes.get(nodeId);
+    allNodesOriginalData[nodeId] = {
+      color: nodeData.color,
+      opacity: nodeData.opacity || 1.0,
+      size: nodeData.size
+    };
+  });
+}
+
+// Neighbour index built once per graph: node id -> {nodes: Set, edges: Set},
+// so a hover looks up its neighbourhood instead of scanning every element
+var neighbourIndex = null;
+
+function buildNeighbourIndex() {
+  neighbourIndex = {};
+  function link(nodeId, otherId, edgeId) {
+    var entry = neighbourIndex[nodeId];
+    if (!entry) {
+      entry = neighbourIndex[nodeId] = { nodes: new Set(), edges: new Set() };
+    }
+    entry.nodes.add(otherId);
+    entry.edges.add(edgeId);
+  }
+  network.body.data.edges.forEach(function(edge) {
+    link(edge.from, edge.to, edge.id);
+    link(edge.to, edge.from, edge.id);
+  });
+}
+
+function neighboursOf(nodeId) {
+  if (!neighbourIndex) buildNeighbourIndex();
+  return neighbourIndex[nodeId] || { nodes: new Set(), edges: new Set() };
+}
+
+// Currently highlighted elements; null while the graph is in its normal state
+var highlightedNodes = null;
+var highlightedEdges = null;
+var pendingReset = null;
+
+function highlightedNodeStyle(nodeId) {
+  var originalData = allNodesOriginalData[nodeId];
+  if (!originalData) return null;
+  return { id: nodeId, color: originalData.color, opacity: 1.0, borderWidth: 2, borderWidthSelected: 3 };
+}
+
+function dimmedNodeStyle(nodeId) {
+  return { id: nodeId, opacity: 0.05, borderWidth: 0 };  // Almost invisible
+}
+
+function highlightedEdgeStyle(edgeId) {
+  return { id: edgeId, color: { color: '#2B7CE9', opacity: 0.8 }, width: 2 };
+}
+
+function dimmedEdgeStyle(edgeId) {
+  return { id: edgeId, color: { color: '#D3D3D3', opacity: 0.02 }, width: 0.5 };  // Almost invisible
+}
+
+// Push the style updates for elements entering or leaving the highlighted set.
+// From the normal state every element changes; between two highlights only the
+// symmetric difference of the old and new sets does.
+function diffUpdates(allIds, previous, next, highlightStyle, dimStyle) {
+  var updates = [];
+  function push(update) {
+    if (update) updates.push(update);
+  }
+  if (previous === null) {
+    allIds.forEach(function(id) {
+      push(next.has(id) ? highlightStyle(id) : dimStyle(id));
+    });
+  } else {
+    previous.forEach(function(id) {
+      if (!next.has(id)) push(dimStyle(id));
+    });
+    next.forEach(function(id) {
+      if (!previous.has(id)) push(highlightStyle(id));
+    });
+  }
+  return updates;
+}
+
+// Function to highlight connected nodes with extreme transparency for others
+function highlightConnectedNodes(nodeId) {
+  if (!nodeId) return;
+  cancelPendingReset();
+
+  var allNodes = network.body.data.nodes;
+  var allEdges = network.body.data.edges;
+  var neighbours = neighboursOf(nodeId);
+  var nextNodes = new Set(neighbours.nodes);
+  nextNodes.add(nodeId);
+  var nextEdges = neighbours.edges;
+
+  var nodeUpdates = diffUpdates(highlightedNodes === null ? allNodes.getIds() : null,
+                                highlightedNodes, nextNodes, highlightedNodeStyle, dimmedNodeStyle);
+  var edgeUpdates = diffUpdates(highlightedEdges === null ? allEdges.getIds() : null,
+                                highlightedEdges, nextEdges, highlightedEdgeStyle, dimmedEdgeStyle);
+  highlightedNodes = nextNodes;
+  highlightedEdges = nextEdges;
+  if (nodeUpdates.length) allNodes.update(nodeUpdates);
+  if (edgeUpdates.length) allEdges.update(edgeUpdates);
+}
+
+// Function to reset all nodes to original state
+function resetAllNodes() {
+  cancelPendingReset();
+  if (highlightedNodes === null) return;  // Already in the normal state
+  highlightedNodes = null;
+  highlightedEdges = null;
+
+  var allNodes = network.body.data.nodes;
+  var allEdges = network.body.data.edges;
+
+  // Reset nodes to original appearance
+  var nodeUpdates = [];
+  Object.keys(allNodesOriginalData).forEach(function(nodeId) {
+    var originalData = allNodesOriginalData[nodeId];
+    nodeUpdates.push({
+      id: nodeId,
+      color: originalData.color,
+      opacity: originalData.opacity,
+      borderWidth: 1,
+      borderWidthSelected: 2
+    });
+  });
+  allNodes.update(nodeUpdates);
+
+  // Reset edges to default state
+  var edgeUpdates = [];
+  allEdges.getIds().forEach(function(eId) {
+    edgeUpdates.push({
+      id: eId,
+      color: { color: '#D3D3D3', opacity: 0.3 },
+      width: 0.5
+    });
+  });
+  allEdges.update(edgeUpdates);
+}
+
+// Moving from one node to the next fires blurNode then hoverNode; the reset is
+// deferred briefly so that the next highlight can be applied as a diff instead
+function scheduleReset() {
+  cancelPendingReset();
+  pendingReset = setTimeout(function() {
+    pendingReset = null;
+    resetAllNodes();
+  }, 150);
+}
+
+function cancelPendingReset() {
+  if (pendingReset !== null) {
+    clearTimeout(pendingReset);
+    pendingReset = null;
+  }
+}
+
+// Level-of-detail drill-down: member projects are fetched on first use and
+// placed in a ring around the clicked super-node
+var lodMembers = null;
+var expandedSuperNodes = {};
+
+function expandSuperNode(groupNodeId) {
+  if (expandedSuperNodes[groupNodeId] || typeof lodMembersUrl === "undefined" || !lodMembersUrl) return;
+  expandedSuperNodes[groupNodeId] = true;
+  var membersLoaded = lodMembers
+    ? Promise.resolve(lodMembers)
+    : fetch(lodMembersUrl).then(function(response) { return response.json(); })
+        .then(function(data) { lodMembers = data; return data; });
+
+  membersLoaded.then(function(members) {
+    var entry = members[groupNodeId];
+    if (!entry) return;
+    resetAllNodes();
+    var allNodes = network.body.data.nodes;
+    var allEdges = network.body.data.edges;
+    var center = network.getPositions([groupNodeId])[groupNodeId];
+    var count = entry.projects.length;
+    var radius = 80 + 6 * count;
+    var newNodes = [];
+    var newEdges = [];
+    entry.projects.forEach(function(project, i) {
+      var angle = 2 * Math.PI * i / count;
+      if (!allNodes.get(project.id)) {
+        newNodes.push({
+          id: project.id, label: project.label, title: project.title, group: 1, shape: "ellipse",
+          x: center.x + radius * Math.cos(angle), y: center.y + radius * Math.sin(angle)
+        });
+      }
+      newEdges.push({ from: project.id, to: groupNodeId, color: { color: '#D3D3D3', opacity: 0.3 } });
+      project.orgs.forEach(function(orgId) {
+        if (allNodes.get(orgId)) {
+          newEdges.push({ from: project.id, to: orgId, color: { color: '#D3D3D3', opacity: 0.3 } });
+        }
+      });
+    });
+    allNodes.add(newNodes);
+    allEdges.add(newEdges);
+    storeOriginalNodeData();
+    neighbourIndex = null;
+    if (entry.total > count) {
+      allNodes.update({ id: groupNodeId, title: allNodes.get(groupNodeId).title + "\nShowing " + count + " of " + entry.total });
+    }
+  }).catch(function(error) {
+    expandedSuperNodes[groupNodeId] = false;
+    console.log("Could not load super-node members", error);
+  });
+}
+
+function initGraphInteractions() {
+  // Node positions are precomputed on the server and physics is disabled,
+  // so the network is final as soon as it is drawn
+  storeOriginalNodeData();
+
+  // Event handlers for hover effects
+  network.on("hoverNode", function(params) {
+    var nodeId = params.node;
+    var nodeData = network.body.data.nodes.get(nodeId);
+
+    // Only apply transparency effect for Project (group 1), Topic (group 3) and super-nodes (group 4)
+    if (nodeData && (nodeData.group === 1 || nodeData.group === 3 || nodeData.group === 4)) {
+      highlightConnectedNodes(nodeId);
+    }
+  });
+
+  network.on("blurNode", function(params) {
+    scheduleReset();
+  });
+
+  // Click handling
+  network.on("click", function(params) {
+    if (params.nodes.length === 0) {
+      // Clicked on background
+      resetAllNodes();
+      return;
+    }
+
+    var nodeId = params.nodes[0];
+    var nodeData = network.body.data.nodes.get(nodeId);
+
+    // Reset on organization node click
+    if (nodeData && nodeData.group === 2) {
+      resetAllNodes();
+    }
+
+    // Drill down into a level-of-detail super-node
+    if (nodeData && nodeData.group === 4) {
+      expandSuperNode(nodeId);
+    }
+  });
+}
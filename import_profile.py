@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+REPO_DIR = Path(__file__).parent
+# Modules started by `shiny run` (or run directly) in production
+ENTRY_POINTS = ["app", "organization_recommendations_dashboard", "project_duration_analysis", "Descriptive_Statistics",
+                "server"]
+# Cold-start budget: seconds to import each entry point in a fresh interpreter (best of --repeat runs).
+# Measured on a single-core worker: about 1.35 s for the Shiny apps (shiny and pandas are most of it)
+# and 0.75 s for Descriptive_Statistics, down from 2.1 s (app) and 2.6 s (project_duration_analysis)
+# with pyvis, networkx, plotly and scipy imported eagerly.
+COLD_START_BUDGET = {
+    "app": 1.8,
+    "organization_recommendations_dashboard": 1.8,
+    "project_duration_analysis": 1.8,
+    "Descriptive_Statistics": 1.2,
+    "server": 2.0,  # all three apps in one process: about 1.45 s
+}
+# Libraries that must only be imported on first use, never while a worker starts
+LAZY_MODULES = ["pyvis", "networkx", "plotly", "scipy", "seaborn", "matplotlib", "IPython", "sklearn", "diptest"]
+# Entry points allowed to import some of them eagerly because their main computation needs them
+EAGER_ALLOWED = {"Descriptive_Statistics": {"scipy"}}
+
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into (module, self seconds, cumulative seconds, depth) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:       523 |     627833 |   shiny": self us, cumulative us, name indented by depth
+        head, cumulative_us, name = line.split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), int(head.split(":")[1]) / 1e6, int(cumulative_us) / 1e6, depth))
+    return rows
+
+
+def profile_import(module, cwd=REPO_DIR):
+    """Import `module` in a fresh interpreter; returns (wall seconds, parsed -X importtime rows)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_DIR), os.environ.get("PYTHONPATH")])))
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    rows = parse_importtime(result.stderr)
+    return wall, rows
+
+
+def package_costs(rows):
+    """Self import time summed per top-level package, most expensive first"""
+    costs = defaultdict(float)
+    for name, self_seconds, _, _ in rows:
+        costs[name.split(".")[0]] += self_seconds
+    return dict(sorted(costs.items(), key=lambda item: -item[1]))
+
+
+def profile_entry_point(module, repeat=3, cwd=REPO_DIR):
+    """Best-of-`repeat` cold start of one entry point, with its per-package breakdown"""
+    best = None
+    for _ in range(repeat):
+        wall, rows = profile_import(module, cwd=cwd)
+        if best is None or wall < best[0]:
+            best = (wall, rows)
+    wall, rows = best
+    costs = package_costs(rows)
+    eager = sorted(set(LAZY_MODULES) & set(costs) - EAGER_ALLOWED.get(module, set()))
+    budget = COLD_START_BUDGET.get(module)
+    return {
+        "module": module,
+        "wall_seconds": round(wall, 3),
+        "import_seconds": round(sum(costs.values()), 3),
+        "budget_seconds": budget,
+        "within_budget": budget is None or wall <= budget,
+        "eager_heavy_imports": eager,
+        "packages": {name: round(seconds, 4) for name, seconds in costs.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time (cold start) profile of the Shiny entry points.")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="Entry points to profile (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per entry point; the fastest counts")
+    parser.add_argument("--top", type=int, default=12, help="Packages listed per entry point")
+    parser.add_argument("--cwd", default=str(REPO_DIR), help="Working directory (where dataset/ lives)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if an entry point exceeds its budget or imports a lazy library eagerly")
+    args = parser.parse_args(argv)
+
+    report = [profile_entry_point(module, repeat=args.repeat, cwd=args.cwd) for module in args.modules]
+    failed = False
+    for entry in report:
+        status = "ok" if entry["within_budget"] and not entry["eager_heavy_imports"] else "OVER BUDGET"
+        failed |= status != "ok"
+        print(f"{entry['module']}: {entry['wall_seconds']:.2f}s wall, {entry['import_seconds']:.2f}s importing "
+              f"(budget {entry['budget_seconds']}s) [{status}]")
+        if entry["eager_heavy_imports"]:
+            print(f"  imported at start-up, should be lazy: {', '.join(entry['eager_heavy_imports'])}")
+        for name, seconds in list(entry["packages"].items())[:args.top]:
+            print(f"  {name:<40} {seconds * 1000:8.1f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,367 @@
+import functools
+import importlib.util
+import json
 import pandas as pd
-import networkx as nx 
-from pyvis.network import Network
 import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+from graph_layout import apply_layout
 
-def create_interactive_heterogeneous_graph(org_df: pd.DataFrame, proj_df: pd.DataFrame, topic_df: pd.DataFrame, selected_org_ids: list):
+if TYPE_CHECKING:
+    from pyvis.network import Network
+
+# Characters replaced by "_" when turning a topic title into a node ID
+_TOPIC_ID_TRANSLATION = str.maketrans({c: "_" for c in " /-:;,"})
+EDGE_COLOR = {"color": "#D3D3D3", "opacity": 0.3}
+ERROR_NODE_ID = "ErrorNode"
+# Shared viewer page and interaction script, served as static assets in JSON mode
+GRAPH_VIEWER_DIR = Path(__file__).parent / "graph_viewer"
+GRAPH_VIEWER_SCRIPT = GRAPH_VIEWER_DIR / "graph_viewer.js"
+
+
+def _find_vis_network_dir():
+    """Newest vis-network bundled with pyvis (templates/lib/vis-<version>), located without importing pyvis"""
+    spec = importlib.util.find_spec("pyvis")
+    lib_dir = Path(spec.origin).parent / "templates" / "lib" if spec is not None and spec.origin else None
+    candidates = [d for d in lib_dir.glob("vis-*") if (d / "vis-network.min.js").exists() and (d / "vis-network.css").exists()] if lib_dir else []
+    if not candidates:
+        raise ImportError("The graph viewer needs the vis-network copy bundled with pyvis: pip install pyvis")
+
+    def version(directory):
+        return tuple(int(part) if part.isdigit() else 0 for part in directory.name[len("vis-"):].split("."))
+    return max(candidates, key=version)
+
+
+# vis-network bundled with pyvis, served locally so the viewer needs no CDN
+VIS_NETWORK_DIR = _find_vis_network_dir()
+# Above this many nodes projects are collapsed into per-topic / per-funding-scheme super-nodes
+LOD_NODE_BUDGET = 1500
+# How projects are grouped in the level-of-detail view: "topic" or "fundingScheme"
+LOD_GROUP_BY = "topic"
+# Projects per super-node available for drill-down in the browser
+LOD_MAX_MEMBERS = 100
+# Organization colours by research community (community_detection.py), cycled by community ID
+COMMUNITY_PALETTE = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f",
+                     "#bcbd22", "#17becf", "#aec7e8", "#ffbb78", "#98df8a", "#ff9896", "#c5b0d5", "#c49c94"]
+# Part of the render cache key; bump when the rendered output changes
+GRAPH_RENDER_VARIANT = f"static-layout-v3-lod{LOD_NODE_BUDGET}-{LOD_GROUP_BY}-{LOD_MAX_MEMBERS}"
+
+def _new_network(**options) -> "Network":
+    """pyvis Network, imported on first use to keep pyvis and its dependencies out of worker start-up"""
+    from pyvis.network import Network
+    return Network(**options)
+
+def is_error_graph(net: "Network") -> bool:
+    """True for the placeholder network returned when graph building failed"""
+    return any(node.get("id") == ERROR_NODE_ID for node in net.nodes[:1])
+
+@functools.lru_cache(maxsize=1)
+def _viewer_script() -> str:
+    with open(GRAPH_VIEWER_SCRIPT, "r", encoding="utf-8") as f:
+        return f.read()
+
+def graph_to_html(net: "Network", members_url: str = None) -> str:
+    """Render the network to a standalone HTML document, including the interaction script.
+
+    Network.generate_html() rebuilds net.html from the template, so scripts have to
+    be injected into its output rather than appended to net.html beforehand.
+    `members_url` points the drill-down of level-of-detail super-nodes to the JSON
+    written from `net.lod_members`.
+    """
+    html = net.generate_html()
+    extra_html = (
+        f"<script>var lodMembersUrl = {json.dumps(members_url)};</script>\n"
+        f"<script>{_viewer_script()}</script>\n"
+        "<script>initGraphInteractions();</script>"
+    )
+    return html.replace("</body>", f"{extra_html}\n</body>", 1)
+
+def _columns(records, node_index=None):
+    """Column-wise encoding of a list of dicts: {"count": n, "columns": {key: values}}.
+
+    Missing keys become null. Columns with few distinct values are dictionary-encoded
+    as {"values": [...], "codes": [...]}, and with `node_index` the edge endpoints
+    "from"/"to" are stored as node positions instead of repeating the node IDs.
+    """
+    keys = list(dict.fromkeys(key for record in records for key in record))
+    columns = {}
+    for key in keys:
+        values = [record.get(key) for record in records]
+        if node_index is not None and key in ("from", "to"):
+            columns[key] = [node_index[value] for value in values]
+            continue
+        try:
+            distinct = list(dict.fromkeys(values))
+        except TypeError:  # unhashable values (e.g. colour dicts) are stored as they are
+            columns[key] = values
+            continue
+        if len(distinct) * 4 < len(values):
+            codes = {value: i for i, value in enumerate(distinct)}
+            columns[key] = {"values": distinct, "codes": [codes[value] for value in values]}
+        else:
+            columns[key] = values
+    return {"count": len(records), "columns": columns}
+
+def graph_to_json(net: "Network", members_url: str = None) -> str:
+    """Serialize only the graph data for graph_viewer/viewer.html.
+
+    The viewer page, vis-network and the interaction script are static and cached
+    by the browser, so a graph costs just its nodes, edges and options, encoded
+    column-wise (see _columns). Edges in the default colour omit it (the options
+    carry it). `members_url` is resolved relative to the JSON file.
+    """
+    options = net.options if isinstance(net.options, dict) else json.loads(net.options.to_json())
+    node_index = {node["id"]: i for i, node in enumerate(net.nodes)}
+    edges = [
+        {key: value for key, value in edge.items() if not (key == "color" and value == EDGE_COLOR)}
+        for edge in net.edges
+    ]
+    payload = {
+        "nodes": _columns(net.nodes),
+        "edges": _columns(edges, node_index=node_index),
+        "options": options,
+        "membersUrl": members_url,
+    }
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+def clean_topic_node_ids(titles: pd.Series) -> pd.Series:
+    """Map topic titles to their node IDs ("T_" + title with separators replaced by "_")"""
+    title_strs = titles.astype(object).where(titles.notna(), "Unknown_Topic").map(str)
+    return "T_" + title_strs.str.translate(_TOPIC_ID_TRANSLATION)
+
+def _node(node_id, label, title, group, shape, **options):
+    # Same dict pyvis builds in Network.add_node; grouped nodes take their colour from the group,
+    # and an empty label falls back to the node ID
+    return {"title": title, "group": group, **options, "id": node_id, "label": label or node_id, "shape": shape}
+
+def build_graph_elements(current_org_df: pd.DataFrame, current_proj_df: pd.DataFrame, current_topic_df: pd.DataFrame):
+    """Build the node and edge dicts of the heterogeneous graph column by column.
+
+    Node IDs are deduplicated with a hash set (the first occurrence wins, as with
+    Network.add_node), and edges are kept only when both endpoints exist and the
+    pair has not been added before.
+    """
+    nodes = []
+    node_ids = set()
+
+    def add(node):
+        if node["id"] not in node_ids:
+            node_ids.add(node["id"])
+            nodes.append(node)
+
+    # Layer 1: Projects (Group 1)
+    proj_ids = current_proj_df['projectID'].tolist()
+    acronyms = current_proj_df['acronym'].tolist()
+    acronym_present = current_proj_df['acronym'].notna().tolist()
+    proj_titles = current_proj_df['title'].tolist()
+    for pid, acronym, present, title in zip(proj_ids, acronyms, acronym_present, proj_titles):
+        label = str(acronym)[:30] if present else f"Proj_{pid}"
+        add(_node(f"P_{pid}", label, f"Project: {title}\nID: {pid}", 1, "ellipse"))
+
+    # Layer 2: Organizations (Group 2)
+    unique_orgs = current_org_df.drop_duplicates(subset=['organisationID'])
+    for oid, name, present, country in zip(unique_orgs['organisationID'].tolist(), unique_orgs['name'].tolist(),
+                                           unique_orgs['name'].notna().tolist(), unique_orgs['country'].tolist()):
+        label = str(name)[:40] if present else f"Org_{oid}"
+        add(_node(f"O_{oid}", label, f"Organization: {name}\nID: {oid}\nCountry: {country}", 2, "box"))
+
+    # Layer 3: Topics (Group 3)
+    topic_node_ids = clean_topic_node_ids(current_topic_df['title'])
+    unique_topic_mask = ~current_topic_df['title'].duplicated()
+    unique_titles = current_topic_df['title'][unique_topic_mask]
+    for node_id, title, present in zip(topic_node_ids[unique_topic_mask].tolist(), unique_titles.tolist(),
+                                       unique_titles.notna().tolist()):
+        label = str(title)[:30] if present else "Unknown Topic"
+        add(_node(node_id, label, f"Topic: {title}", 3, "dot", size=10))
+
+    # Edges: Project to Organization, then Project to Topic
+    edge_frame = pd.concat([
+        pd.DataFrame({
+            "from": ["P_" + str(pid) for pid in current_org_df['projectID'].tolist()],
+            "to": ["O_" + str(oid) for oid in current_org_df['organisationID'].tolist()],
+            "title": "participates in",
+        }),
+        pd.DataFrame({
+            "from": ["P_" + str(pid) for pid in current_topic_df['projectID'].tolist()],
+            "to": topic_node_ids.tolist(),
+            "title": "covers topic",
+        }),
+    ], ignore_index=True)
+    valid = edge_frame["from"].isin(node_ids) & edge_frame["to"].isin(node_ids)
+    edge_frame = edge_frame[valid].drop_duplicates(subset=["from", "to"])
+    edges = [
+        {"title": title, "color": dict(EDGE_COLOR), "from": src, "to": dst}
+        for src, dst, title in zip(edge_frame["from"].tolist(), edge_frame["to"].tolist(), edge_frame["title"].tolist())
+    ]
+    return nodes, edges
+
+def build_aggregated_graph_elements(current_org_df: pd.DataFrame, current_proj_df: pd.DataFrame, current_topic_df: pd.DataFrame,
+                                    group_by: str = "topic", node_budget: int = None, max_members: int = None):
+    """Level-of-detail graph: projects collapsed into super-nodes (Group 4) weighted by project count.
+
+    Projects are grouped by their first topic (`group_by="topic"`) or by funding
+    scheme (`group_by="fundingScheme"`). Organizations stay individual nodes and are
+    linked to a super-node with an edge weighted by how many of its projects they
+    join. When there are more groups than the node budget allows, the smallest are
+    merged into one "Other" super-node. Returns (nodes, edges, members), where
+    `members` maps each super-node ID to at most `max_members` of its projects for
+    drill-down in the browser.
+    """
+    node_budget = LOD_NODE_BUDGET if node_budget is None else node_budget
+    max_members = LOD_MAX_MEMBERS if max_members is None else max_members
+
+    # One group per project
+    if group_by == "topic":
+        first_topic = current_topic_df.drop_duplicates(subset=['projectID'])
+        project_group = pd.Series(first_topic['title'].astype(object).values, index=first_topic['projectID'].values)
+        group_label = "Topic"
+    else:
+        projects = current_proj_df.drop_duplicates(subset=['projectID'])
+        project_group = pd.Series(projects[group_by].astype(object).values, index=projects['projectID'].values)
+        group_label = group_by
+    projects = current_proj_df.drop_duplicates(subset=['projectID'])
+    groups = projects['projectID'].map(project_group).astype(object)
+    groups = groups.where(groups.notna(), f"No {group_label.lower()}").map(str)
+
+    unique_orgs = current_org_df.drop_duplicates(subset=['organisationID'])
+    group_sizes = groups.value_counts()
+    max_groups = max(node_budget - len(unique_orgs), 1)
+    if len(group_sizes) > max_groups:
+        kept = set(group_sizes.index[:max_groups - 1])
+        groups = groups.where(groups.isin(kept), f"Other ({len(group_sizes) - len(kept)} groups)")
+        group_sizes = groups.value_counts()
+    group_ids = {name: f"G_{i}" for i, name in enumerate(group_sizes.index)}
+
+    nodes = []
+    for name, count in group_sizes.items():
+        nodes.append(_node(group_ids[name], f"{str(name)[:30]} ({count})",
+                           f"{group_label}: {name}\n{count} projects (click to expand)", 4, "dot", value=int(count)))
+    for oid, name, present, country in zip(unique_orgs['organisationID'].tolist(), unique_orgs['name'].tolist(),
+                                           unique_orgs['name'].notna().tolist(), unique_orgs['country'].tolist()):
+        label = str(name)[:40] if present else f"Org_{oid}"
+        nodes.append(_node(f"O_{oid}", label, f"Organization: {name}\nID: {oid}\nCountry: {country}", 2, "box"))
+
+    # Organization -> super-node edges weighted by the number of shared projects
+    project_to_group = pd.Series(groups.values, index=projects['projectID'].values)
+    participation = pd.DataFrame({
+        "org": current_org_df['organisationID'].values,
+        "projectID": current_org_df['projectID'].values,
+    }).drop_duplicates()
+    participation["group"] = participation["projectID"].map(project_to_group)
+    participation = participation.dropna(subset=["group"])
+    weights = participation.groupby(["org", "group"], sort=False).size()
+    edges = [
+        {"title": f"{int(weight)} shared projects", "value": int(weight), "color": dict(EDGE_COLOR),
+         "from": f"O_{org}", "to": group_ids[group]}
+        for (org, group), weight in weights.items()
+    ]
+
+    # Drill-down members: the first `max_members` projects of each group with their organizations
+    orgs_by_project = participation.groupby("projectID", sort=False)["org"].agg(list)
+    members = {}
+    member_projects = projects.assign(_group=groups.values).groupby("_group", sort=False).head(max_members)
+    for pid, acronym, present, title, group in zip(member_projects['projectID'].tolist(), member_projects['acronym'].tolist(),
+                                                   member_projects['acronym'].notna().tolist(), member_projects['title'].tolist(),
+                                                   member_projects['_group'].tolist()):
+        entry = members.setdefault(group_ids[group], {"total": int(group_sizes[group]), "projects": []})
+        entry["projects"].append({
+            "id": f"P_{pid}",
+            "label": str(acronym)[:30] if present else f"Proj_{pid}",
+            "title": f"Project: {title}\nID: {pid}",
+            "orgs": [f"O_{org}" for org in orgs_by_project.get(pid, [])],
+        })
+    return nodes, edges, members
+
+def community_color(community: int) -> str:
+    return COMMUNITY_PALETTE[community % len(COMMUNITY_PALETTE)] if community >= 0 else "#cccccc"
+
+def _community_title(communities, community: int) -> str:
+    if community < 0:
+        return "Community: unknown"
+    return f"Community {community}: {communities.labels[community]} ({int(communities.sizes[community])} organizations)"
+
+def color_by_community(nodes: list, communities):
+    """Colour organization nodes by their precomputed community and name it in the tooltip"""
+    org_nodes = [node for node in nodes if node["group"] == 2]
+    assigned = communities.of([node["id"][2:] for node in org_nodes])
+    for node, community in zip(org_nodes, assigned.tolist()):
+        node["color"] = community_color(community)
+        node["title"] = f"{node['title']}\n{_community_title(communities, community)}"
+
+def build_community_overview_elements(current_org_df: pd.DataFrame, communities):
+    """Community-level overview: projects and topics collapsed away, selected organizations
+    attached to one super-node (Group 4) per community they belong to.
+
+    Super-nodes are sized by their organization count in the whole network, and linked
+    to each other with edges weighted by the co-participations between their members.
+    """
+    unique_orgs = current_org_df.drop_duplicates(subset=['organisationID'])
+    org_ids = unique_orgs['organisationID'].astype(str).tolist()
+    assigned = communities.of(org_ids)
+    present = sorted(set(assigned.tolist()) - {-1})
+    selected_counts = pd.Series(assigned).value_counts()
+
+    nodes = []
+    for community in present:
+        size = int(communities.sizes[community])
+        nodes.append(_node(f"C_{community}", f"{str(communities.labels[community])[:30]} ({size})",
+                           f"{_community_title(communities, community)}\n{int(selected_counts[community])} selected",
+                           4, "dot", value=size, color=community_color(community)))
+    for oid, name, present_name, country, community in zip(org_ids, unique_orgs['name'].tolist(),
+                                                           unique_orgs['name'].notna().tolist(),
+                                                           unique_orgs['country'].tolist(), assigned.tolist()):
+        label = str(name)[:40] if present_name else f"Org_{oid}"
+        nodes.append(_node(f"O_{oid}", label, f"Organization: {name}\nID: {oid}\nCountry: {country}\n"
+                           f"{_community_title(communities, community)}", 2, "box", color=community_color(community)))
+
+    edges = [
+        {"title": "member of", "color": dict(EDGE_COLOR), "from": f"O_{oid}", "to": f"C_{community}"}
+        for oid, community in zip(org_ids, assigned.tolist()) if community >= 0
+    ]
+    shown = set(present)
+    for community in present:
+        targets, weights = communities.links(community)
+        for target, weight in zip(targets.tolist(), weights.tolist()):
+            if target > community and target in shown:
+                edges.append({"title": f"{weight} co-participations", "value": weight, "color": dict(EDGE_COLOR),
+                              "from": f"C_{community}", "to": f"C_{target}"})
+    return nodes, edges
+
+def _populate_network(net: "Network", nodes: list, edges: list):
+    """Append prebuilt node and edge dicts to a pyvis Network.
+
+    Network.add_node and Network.add_edge scan Python lists on every call, which
+    makes inserting E edges into N nodes O(E*N).
+    """
+    for node in nodes:
+        net.nodes.append(node)
+        net.node_ids.append(node["id"])
+        net.node_map[node["id"]] = node
+    net.edges.extend(edges)
+
+def select_subgraph(org_df: pd.DataFrame, proj_df: pd.DataFrame, topic_df: pd.DataFrame, selected_org_ids: list, graph_index=None):
+    """Return the participations, projects and topics reached from the selected organizations.
+
+    With a GraphIndex this costs O(sum of degrees); without one the tables are filtered with `isin`.
+    """
+    if graph_index is not None:
+        return graph_index.subgraph(org_df, proj_df, topic_df, selected_org_ids)
+
+    current_org_df = org_df[org_df['organisationID'].isin(selected_org_ids)]
+    project_ids_for_selected_orgs = current_org_df['projectID'].unique()
+    current_proj_df = proj_df[proj_df['projectID'].isin(project_ids_for_selected_orgs)]
+    current_topic_df = topic_df[topic_df['projectID'].isin(project_ids_for_selected_orgs)]
+    return current_org_df, current_proj_df, current_topic_df
+
+def create_interactive_heterogeneous_graph(org_df: pd.DataFrame, proj_df: pd.DataFrame, topic_df: pd.DataFrame, selected_org_ids: list, graph_index=None,
+                                          node_budget: int = LOD_NODE_BUDGET, lod_group_by: str = LOD_GROUP_BY,
+                                          communities=None, color_by: str = "type", community_overview: bool = False):
     print(f"Generating interactive graph for selected organization IDs: {selected_org_ids}")
 
     try:
         if not selected_org_ids:
             print("No organization IDs selected. Skipping graph generation.")
-            net = Network(height="900px", width="100%", notebook=False, directed=False, cdn_resources="remote")
+            net = _new_network(height="900px", width="100%", notebook=False, directed=False, cdn_resources="remote")
             net.set_options("""
             {
               "interaction": { "tooltipDelay": 200 },
@@ -18,76 +370,47 @@ def create_interactive_heterogeneous_graph(org_df: pd.DataFrame, proj_df: pd.Dat
             """)
             return net
             
-        filtered_org_df = org_df[org_df['organisationID'].isin(selected_org_ids)]
-        related_project_ids = filtered_org_df['projectID'].unique().tolist()
-        
-        participating_org_df = org_df[org_df['organisationID'].isin(selected_org_ids)]
-        project_ids_for_selected_orgs = participating_org_df['projectID'].unique()
-
-        current_proj_df = proj_df[proj_df['projectID'].isin(project_ids_for_selected_orgs)]
-        current_topic_df = topic_df[topic_df['projectID'].isin(project_ids_for_selected_orgs)]
-        current_org_df = org_df[org_df['organisationID'].isin(selected_org_ids)]
+        current_org_df, current_proj_df, current_topic_df = select_subgraph(
+            org_df, proj_df, topic_df, selected_org_ids, graph_index=graph_index
+        )
 
         print(f"Filtered data for graph: {len(current_org_df)} org participations, {len(current_proj_df)} projects, {len(current_topic_df)} topics.")
 
-        net = Network(height="900px", width="100%", notebook=False, directed=False, cdn_resources="remote") 
-
-        # Add nodes
-        # Layer 1: Projects (Group 1)
-        for _, row in current_proj_df.iterrows():
-            node_id = f"P_{row['projectID']}"
-            label = str(row['acronym'])[:30] if pd.notna(row['acronym']) else f"Proj_{row['projectID']}"
-            title_text = f"Project: {row['title']}\nID: {row['projectID']}"
-            net.add_node(node_id, label=label, title=title_text, group=1, color="skyblue", shape="ellipse")
-
-        # Layer 2: Organizations (Group 2)
-        unique_orgs_to_add = current_org_df.drop_duplicates(subset=['organisationID'])
-        for _, row in unique_orgs_to_add.iterrows():
-            node_id = f"O_{row['organisationID']}"
-            label = str(row['name'])[:40] if pd.notna(row['name']) else f"Org_{row['organisationID']}"
-            title_text = f"Organization: {row['name']}\nID: {row['organisationID']}\nCountry: {row['country']}"
-            net.add_node(node_id, label=label, title=title_text, group=2, color="lightgreen", shape="box")
-
-        # Layer 3: Topics (Group 3)
-        unique_topics = current_topic_df.drop_duplicates(subset=['title'])
-        for _, row in unique_topics.iterrows():
-            topic_title_str = str(row['title']) if pd.notna(row['title']) else "Unknown_Topic"
-            clean_title_id = topic_title_str.replace(" ", "_").replace("/", "_").replace("-", "_").replace(":", "_").replace(";", "_").replace(",", "_")
-            node_id = f"T_{clean_title_id}"
-            label = str(row['title'])[:30] if pd.notna(row['title']) else "Unknown Topic"
-            title_text = f"Topic: {row['title']}"
-            net.add_node(node_id, label=label, title=title_text, group=3, color="salmon", shape="dot", size=10)
-
-        # Add edges
-        # Project to Organization
-        for _, row in current_org_df.iterrows():
-            proj_node_id = f"P_{row['projectID']}"
-            org_node_id = f"O_{row['organisationID']}"
-            if proj_node_id in [n['id'] for n in net.nodes] and org_node_id in [n['id'] for n in net.nodes]:
-                net.add_edge(proj_node_id, org_node_id, title="participates in", color={"color": "#D3D3D3", "opacity": 0.3})
-
-        # Project to Topic
-        for _, row in current_topic_df.iterrows():
-            proj_node_id = f"P_{row['projectID']}"
-            topic_title_str = str(row['title']) if pd.notna(row['title']) else "Unknown_Topic"
-            clean_title_id = topic_title_str.replace(" ", "_").replace("/", "_").replace("-", "_").replace(":", "_").replace(";", "_").replace(",", "_")
-            topic_node_id = f"T_{clean_title_id}"
-            if proj_node_id in [n['id'] for n in net.nodes] and topic_node_id in [n['id'] for n in net.nodes]:
-                net.add_edge(proj_node_id, topic_node_id, title="covers topic", color={"color": "#D3D3D3", "opacity": 0.3})
+        net = _new_network(height="900px", width="100%", notebook=False, directed=False, cdn_resources="remote") 
+
+        estimated_nodes = (current_proj_df['projectID'].nunique() + current_org_df['organisationID'].nunique()
+                           + current_topic_df['title'].nunique(dropna=False))
+        net.lod_members = None
+        if community_overview and communities is not None:
+            nodes, edges = build_community_overview_elements(current_org_df, communities)
+        elif node_budget is not None and estimated_nodes > node_budget:
+            # Level-of-detail mode: keep payload and render time bounded for very large selections
+            print(f"{estimated_nodes} nodes exceed the budget of {node_budget}; collapsing projects by {lod_group_by}.")
+            nodes, edges, net.lod_members = build_aggregated_graph_elements(
+                current_org_df, current_proj_df, current_topic_df, group_by=lod_group_by, node_budget=node_budget
+            )
+        else:
+            nodes, edges = build_graph_elements(current_org_df, current_proj_df, current_topic_df)
+        if color_by == "community" and communities is not None and not community_overview:
+            color_by_community(nodes, communities)
+        apply_layout(nodes, edges)
+        _populate_network(net, nodes, edges)
         
         print(f"Interactive graph has {len(net.nodes)} nodes and {len(net.edges)} edges.")
 
-        # Corrected JSON options string
+        # Positions come from the server-side layout, so the browser runs no physics simulation
         json_options_physics = """
         {
           "nodes": {
             "font": {
               "size": 12
-            }
+            },
+            "scaling": { "min": 10, "max": 50 }
           },
           "edges": {
             "width": 0.5,
-            "color": { "color": "#D3D3D3", "highlight": "#000000", "hover": "#000000" },
+            "scaling": { "min": 0.5, "max": 6 },
+            "color": { "color": "#D3D3D3", "opacity": 0.3, "highlight": "#000000", "hover": "#000000" },
             "smooth": {
                 "type": "continuous"
             }
@@ -99,230 +422,16 @@ def create_interactive_heterogeneous_graph(org_df: pd.DataFrame, proj_df: pd.Dat
             "keyboard": true,
             "tooltipDelay": 200
           },
+          "layout": {
+            "improvedLayout": false
+          },
           "physics": {
-            "enabled": true,
-            "stabilization": {
-              "enabled": true,
-              "iterations": 1000,
-              "updateInterval": 50,
-              "onlyDynamicEdges": false,
-              "fit": true
-            },
-            "forceAtlas2Based": {
-              "gravitationalConstant": -50,
-              "centralGravity": 0.01,
-              "springLength": 100,
-              "springConstant": 0.08,
-              "damping": 0.4
-            },
-            "minVelocity": 0.75,
-            "solver": "forceAtlas2Based",
-            "adaptiveTimestep": true
+            "enabled": false
           }
         }
         """
         net.set_options(json_options_physics)
         
-        # Enhanced JavaScript for static network and transparency effects
-        enhanced_js = """
-        // Store original colors and opacity for all nodes
-        var allNodesOriginalData = {};
-        var physicsDisabled = false;
-        var initialStabilizationComplete = false;
-        
-        // Function to store original node data
-        function storeOriginalNodeData() {
-          var nodes = network.body.data.nodes;
-          var nodeIds = nodes.getIds();
-          nodeIds.forEach(function(nodeId) {
-            var nodeData = nodes.get(nodeId);
-            allNodesOriginalData[nodeId] = {
-              color: nodeData.color,
-              opacity: nodeData.opacity || 1.0,
-              size: nodeData.size
-            };
-          });
-        }
-        
-        // Immediate physics disable on network ready
-        network.once("afterDrawing", function() {
-          console.log("Network drawn - disabling physics immediately");
-          network.setOptions({physics:{enabled:false}});
-          physicsDisabled = true;
-          storeOriginalNodeData();
-        });
-        
-        // Backup: disable physics after stabilization
-        network.on("stabilizationIterationsDone", function() {
-          if (!physicsDisabled) {
-            console.log("Stabilization complete - disabling physics");
-            network.setOptions({physics:{enabled:false}});
-            physicsDisabled = true;
-            storeOriginalNodeData();
-          }
-          initialStabilizationComplete = true;
-        });
-        
-        // Force disable physics after very short timeout
-        setTimeout(function() {
-          if (!physicsDisabled) {
-            console.log("Force disabling physics");
-            network.setOptions({physics:{enabled:false}});
-            physicsDisabled = true;
-            if (Object.keys(allNodesOriginalData).length === 0) {
-              storeOriginalNodeData();
-            }
-          }
-        }, 100);
-        
-        // Function to highlight connected nodes with extreme transparency for others
-        function highlightConnectedNodes(nodeId) {
-          if (!nodeId) return;
-          
-          var allNodes = network.body.data.nodes;
-          var allEdges = network.body.data.edges;
-          var allNodeIds = allNodes.getIds();
-          var connectedNodes = network.getConnectedNodes(nodeId);
-          var connectedEdges = network.getConnectedEdges(nodeId);
-          var highlightNodes = [nodeId].concat(connectedNodes);
-          
-          // Update nodes: highlight connected, make others almost invisible
-          var nodeUpdates = [];
-          allNodeIds.forEach(function(nId) {
-            if (highlightNodes.includes(nId)) {
-              // Restore original appearance for connected nodes
-              var originalData = allNodesOriginalData[nId];
-              if (originalData) {
-                nodeUpdates.push({
-                  id: nId,
-                  color: originalData.color,
-                  opacity: 1.0,
-                  borderWidth: 2,
-                  borderWidthSelected: 3
-                });
-              }
-            } else {
-              // Make unconnected nodes almost completely transparent
-              nodeUpdates.push({
-                id: nId,
-                opacity: 0.05,  // Almost invisible
-                borderWidth: 0
-              });
-            }
-          });
-          allNodes.update(nodeUpdates);
-          
-          // Update edges: highlight connected, make others almost invisible
-          var edgeUpdates = [];
-          allEdges.getIds().forEach(function(eId) {
-            if (connectedEdges.includes(eId)) {
-              edgeUpdates.push({
-                id: eId,
-                color: { color: '#2B7CE9', opacity: 0.8 },
-                width: 2
-              });
-            } else {
-              edgeUpdates.push({
-                id: eId,
-                color: { color: '#D3D3D3', opacity: 0.02 },  // Almost invisible
-                width: 0.5
-              });
-            }
-          });
-          allEdges.update(edgeUpdates);
-        }
-        
-        // Function to reset all nodes to original state
-        function resetAllNodes() {
-          var allNodes = network.body.data.nodes;
-          var allEdges = network.body.data.edges;
-          
-          // Reset nodes to original appearance
-          var nodeUpdates = [];
-          Object.keys(allNodesOriginalData).forEach(function(nodeId) {
-            var originalData = allNodesOriginalData[nodeId];
-            nodeUpdates.push({
-              id: nodeId,
-              color: originalData.color,
-              opacity: originalData.opacity,
-              borderWidth: 1,
-              borderWidthSelected: 2
-            });
-          });
-          allNodes.update(nodeUpdates);
-          
-          // Reset edges to default state
-          var edgeUpdates = [];
-          allEdges.getIds().forEach(function(eId) {
-            edgeUpdates.push({
-              id: eId,
-              color: { color: '#D3D3D3', opacity: 0.3 },
-              width: 0.5
-            });
-          });
-          allEdges.update(edgeUpdates);
-        }
-        
-        // Event handlers for hover effects
-        network.on("hoverNode", function(params) {
-          var nodeId = params.node;
-          var nodeData = network.body.data.nodes.get(nodeId);
-          
-          // Only apply transparency effect for Project (group 1) and Topic (group 3) nodes
-          if (nodeData && (nodeData.group === 1 || nodeData.group === 3)) {
-            highlightConnectedNodes(nodeId);
-          }
-        });
-        
-        network.on("blurNode", function(params) {
-          resetAllNodes();
-        });
-        
-        // Click handling
-        network.on("click", function(params) {
-          if (params.nodes.length === 0) {
-            // Clicked on background
-            resetAllNodes();
-            return;
-          }
-          
-          var nodeId = params.nodes[0];
-          var nodeData = network.body.data.nodes.get(nodeId);
-          
-          // Reset on organization node click
-          if (nodeData && nodeData.group === 2) {
-            resetAllNodes();
-          }
-        });
-        
-        // Prevent any physics re-enabling
-        network.on("dragStart", function() {
-          if (!physicsDisabled) {
-            network.setOptions({physics:{enabled:false}});
-            physicsDisabled = true;
-          }
-        });
-        
-        // Ensure physics stays disabled after any interaction
-        network.on("dragEnd", function() {
-          if (!physicsDisabled) {
-            network.setOptions({physics:{enabled:false}});
-            physicsDisabled = true;
-          }
-        });
-        
-        // Prevent physics from being re-enabled during zoom
-        network.on("zoom", function() {
-          if (!physicsDisabled) {
-            network.setOptions({physics:{enabled:false}});
-            physicsDisabled = true;
-          }
-        });
-        """
-        
-        # Add the enhanced JavaScript to the HTML
-        net.html += f"<script>{enhanced_js}</script>"
-        
         return net
 
     except FileNotFoundError as e:
@@ -332,6 +441,6 @@ def create_interactive_heterogeneous_graph(org_df: pd.DataFrame, proj_df: pd.Dat
         print(f"Error building or visualizing interactive graph: {e}")
         import traceback
         traceback.print_exc()
-        net = Network(height="100px", width="100%", notebook=False, directed=False, cdn_resources="remote")
-        net.add_node("ErrorNode", label=f"Error: {str(e)[:50]}", title=str(e), color="red")
+        net = _new_network(height="100px", width="100%", notebook=False, directed=False, cdn_resources="remote")
+        net.add_node(ERROR_NODE_ID, label=f"Error: {str(e)[:50]}", title=str(e), color="red")
         return net
\ No newline at end of file
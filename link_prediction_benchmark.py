@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from collaboration_engine import EMBEDDINGS_FILE, NAMES_FILE
+from gae_training import SparseGCNAutoencoder, build_organization_graph, train_gae, upper_edges
+
+RESULTS_FILE = "link_prediction_results.json"
+# Fraction of projects (by signature date) used for training when no cutoff date is given
+TRAIN_FRACTION = 0.8
+# Test collaborations sampled for ranking metrics; each is ranked against NEGATIVES_PER_POSITIVE corrupted pairs
+MAX_TEST_EDGES = 10000
+NEGATIVES_PER_POSITIVE = 100
+HITS_AT = (1, 3, 10)
+GAE_STEPS = 100
+# Pairs scored per chunk, bounding the gathered rows held at once
+SCORE_CHUNK_PAIRS = 200000
+
+
+class StageTimer:
+    """Wall-clock time and, optionally, peak traced memory of named stages.
+
+    Peak memory comes from tracemalloc, which sees NumPy and SciPy buffers, and is
+    reset at the start of every stage. Tracing slows allocation-heavy stages down,
+    so it is opt-in: time a run without it and measure memory in a separate run.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.stages = {}
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = {"seconds": round(time.perf_counter() - start, 4)}
+            message = f"{name}: {self.stages[name]['seconds']:.2f}s"
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                self.stages[name]["peak_mb"] = round(peak / 2**20, 2)
+                message += f", peak {self.stages[name]['peak_mb']:.1f} MB"
+            print(message)
+
+
+def project_dates(proj_df):
+    """Signature date of every project, falling back to its start date"""
+    projects = proj_df.drop_duplicates(subset=['projectID'])
+    dates = pd.Series(pd.NaT, index=projects['projectID'].astype(str).to_numpy(), dtype="datetime64[ns]")
+    for column in ('ecSignatureDate', 'startDate'):
+        if column in projects.columns:
+            dates = dates.fillna(pd.Series(pd.to_datetime(projects[column], errors="coerce").to_numpy(), index=dates.index))
+    return dates
+
+
+def temporal_split(org_df, proj_df, cutoff=None, train_fraction=TRAIN_FRACTION):
+    """Split collaborations in time: train on projects signed before `cutoff`, test on later ones.
+
+    Returns (names, train adjacency, test_u, test_v, cutoff). Test edges are new
+    collaborations between organizations already in the training graph.
+    """
+    dates = project_dates(proj_df)
+    participations = org_df.dropna(subset=['name', 'projectID'])
+    participation_dates = dates.reindex(participations['projectID'].astype(str).to_numpy()).to_numpy()
+    dated = ~pd.isna(participation_dates)
+    if cutoff is None:
+        cutoff = pd.Series(dates.dropna().sort_values().to_numpy()).quantile(train_fraction)
+    cutoff = pd.Timestamp(cutoff)
+    train_rows = dated & (participation_dates < cutoff)
+    test_rows = dated & (participation_dates >= cutoff)
+
+    names, train_adjacency = build_organization_graph(participations[train_rows], giant_component=False)
+    test_names, test_adjacency = build_organization_graph(participations[test_rows], giant_component=False)
+    # Test edges in training-graph coordinates, minus those already present in training
+    position = pd.Index(names).get_indexer(test_names)
+    test_u, test_v = upper_edges(test_adjacency)
+    test_u, test_v = position[test_u], position[test_v]
+    known = (test_u >= 0) & (test_v >= 0)
+    test_u, test_v = test_u[known], test_v[known]
+    is_new = np.asarray(train_adjacency[test_u, test_v]).ravel() == 0
+    return names, train_adjacency, test_u[is_new], test_v[is_new], cutoff
+
+
+def sample_negatives(adjacency, n_pairs, rng, forbidden_keys=None, sources=None):
+    """Uniform random node pairs that are not edges of `adjacency` (nor in `forbidden_keys`).
+
+    With `sources`, the pairs keep those first nodes and only the second node is
+    drawn (corrupted targets for ranking metrics).
+    """
+    n = adjacency.shape[0]
+    u = rng.integers(0, n, n_pairs) if sources is None else np.asarray(sources, dtype=np.int64).copy()
+    v = rng.integers(0, n, n_pairs)
+
+    def rejected(u, v):
+        bad = (u == v) | (np.asarray(adjacency[u, v]).ravel() != 0)
+        if forbidden_keys is not None:
+            bad |= np.isin(np.minimum(u, v) * n + np.maximum(u, v), forbidden_keys)
+        return bad
+
+    bad = rejected(u, v)
+    while bad.any():
+        if sources is None:
+            u[bad] = rng.integers(0, n, int(bad.sum()))
+        v[bad] = rng.integers(0, n, int(bad.sum()))
+        bad[bad] = rejected(u[bad], v[bad])
+    return u, v
+
+
+def _chunked(score_chunk):
+    def score(u, v):
+        return np.concatenate([
+            score_chunk(u[i:i + SCORE_CHUNK_PAIRS], v[i:i + SCORE_CHUNK_PAIRS])
+            for i in range(0, len(u), SCORE_CHUNK_PAIRS)
+        ]) if len(u) else np.empty(0, dtype=np.float64)
+    return score
+
+
+def common_neighbours(adjacency):
+    adjacency = adjacency.tocsr()
+    return _chunked(lambda u, v: np.asarray(adjacency[u].multiply(adjacency[v]).sum(axis=1)).ravel())
+
+
+def adamic_adar(adjacency):
+    adjacency = adjacency.tocsr()
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    weights = np.where(degrees > 1, 1.0 / np.log(np.maximum(degrees, 2)), 0.0)
+    return _chunked(lambda u, v: adjacency[u].multiply(adjacency[v]) @ weights)
+
+
+def jaccard(adjacency):
+    adjacency = adjacency.tocsr()
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+
+    def score(u, v):
+        shared = np.asarray(adjacency[u].multiply(adjacency[v]).sum(axis=1)).ravel()
+        union = degrees[u] + degrees[v] - shared
+        return np.divide(shared, union, out=np.zeros_like(shared, dtype=np.float64), where=union > 0)
+    return _chunked(score)
+
+
+def preferential_attachment(adjacency):
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    return lambda u, v: degrees[u] * degrees[v]
+
+
+def embedding_scorer(embeddings):
+    """Inner-product decoder of the GAE: score(u, v) = z_u . z_v"""
+    return _chunked(lambda u, v: np.einsum("ij,ij->i", embeddings[u], embeddings[v]))
+
+
+def gae_predictor(steps=GAE_STEPS):
+    def build(adjacency, names):
+        model = SparseGCNAutoencoder(adjacency)
+        train_gae(model, names, steps=steps, checkpoint_path=None)
+        return embedding_scorer(model.embed())
+    return build
+
+
+def saved_embeddings_predictor(adjacency, names):
+    """The production embeddings in dataset/gae; trained on all data, so optimistic on the test period"""
+    embeddings = np.load(EMBEDDINGS_FILE, mmap_mode="r")
+    with open(NAMES_FILE, "r", encoding="utf-8") as f:
+        position = pd.Index(json.load(f)).get_indexer(names)
+    aligned = np.zeros((len(names), embeddings.shape[1]), dtype=np.float32)
+    aligned[position >= 0] = embeddings[position[position >= 0]]
+    return embedding_scorer(aligned)
+
+
+# name -> factory(train adjacency, node names) returning score(u, v)
+PREDICTORS = {
+    "common_neighbours": lambda adjacency, names: common_neighbours(adjacency),
+    "adamic_adar": lambda adjacency, names: adamic_adar(adjacency),
+    "jaccard": lambda adjacency, names: jaccard(adjacency),
+    "preferential_attachment": lambda adjacency, names: preferential_attachment(adjacency),
+    "gae": gae_predictor(),
+    "gae_saved": saved_embeddings_predictor,
+}
+
+
+def roc_auc(positive_scores, negative_scores):
+    """Mann-Whitney AUC with average ranks for ties"""
+    scores = np.concatenate([positive_scores, negative_scores])
+    order = np.argsort(scores, kind="stable")
+    ranks = np.empty(len(scores), dtype=np.float64)
+    sorted_scores = scores[order]
+    boundaries = np.flatnonzero(np.diff(sorted_scores)) + 1
+    starts = np.concatenate(([0], boundaries))
+    stops = np.concatenate((boundaries, [len(scores)]))
+    ranks[order] = np.repeat((starts + stops + 1) / 2.0, stops - starts)
+    n_pos, n_neg = len(positive_scores), len(negative_scores)
+    return float((ranks[:n_pos].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+def average_precision(positive_scores, negative_scores):
+    """Area under the precision-recall step curve, with tied scores grouped into one threshold"""
+    scores = np.concatenate([positive_scores, negative_scores])
+    labels = np.concatenate([np.ones(len(positive_scores)), np.zeros(len(negative_scores))])
+    order = np.argsort(-scores, kind="stable")
+    scores, labels = scores[order], labels[order]
+    thresholds = np.concatenate((np.flatnonzero(np.diff(scores)), [len(scores) - 1]))
+    true_positives = np.cumsum(labels)[thresholds]
+    precision = true_positives / (thresholds + 1)
+    recall = true_positives / true_positives[-1]
+    return float(np.sum(np.diff(np.concatenate(([0.0], recall))) * precision))
+
+
+def ranking_metrics(positive_scores, negative_scores, hits_at=HITS_AT):
+    """Hits@k and MRR of each positive against its own row of negatives (ties count half)"""
+    higher = (negative_scores > positive_scores[:, None]).sum(axis=1)
+    tied = (negative_scores == positive_scores[:, None]).sum(axis=1)
+    ranks = 1 + higher + tied / 2.0
+    metrics = {f"hits@{k}": float(np.mean(ranks <= k)) for k in hits_at}
+    metrics["mrr"] = float(np.mean(1.0 / ranks))
+    return metrics
+
+
+def evaluate(score, test_u, test_v, negative_u, negative_v, ranking_v):
+    """All metrics for one scorer; `ranking_v` (n_test x m) are the corrupted targets per test edge"""
+    positive_scores = np.asarray(score(test_u, test_v), dtype=np.float64)
+    negative_scores = np.asarray(score(negative_u, negative_v), dtype=np.float64)
+    ranked = np.asarray(score(np.repeat(test_u, ranking_v.shape[1]), ranking_v.ravel()), dtype=np.float64)
+    metrics = {
+        "auc": roc_auc(positive_scores, negative_scores),
+        "ap": average_precision(positive_scores, negative_scores),
+    }
+    metrics.update(ranking_metrics(positive_scores, ranked.reshape(ranking_v.shape)))
+    return metrics
+
+
+def run_benchmark(org_df, proj_df, predictors, cutoff=None, max_test_edges=MAX_TEST_EDGES,
+                  negatives_per_positive=NEGATIVES_PER_POSITIVE, seed=42, trace_memory=False):
+    timer = StageTimer(trace_memory=trace_memory)
+    rng = np.random.default_rng(seed)
+    with timer.stage("split"):
+        names, adjacency, test_u, test_v, cutoff = temporal_split(org_df, proj_df, cutoff=cutoff)
+        total_test_edges = len(test_u)
+        if len(test_u) > max_test_edges:
+            keep = rng.choice(len(test_u), max_test_edges, replace=False)
+            test_u, test_v = test_u[keep], test_v[keep]
+    print(f"Training graph: {len(names)} organizations, {adjacency.nnz // 2} edges before {cutoff.date()}; "
+          f"{total_test_edges} new collaborations after it ({len(test_u)} evaluated).")
+    if len(test_u) == 0:
+        raise ValueError("No test collaborations between organizations of the training period; choose an earlier cutoff.")
+
+    with timer.stage("negatives"):
+        n = len(names)
+        test_keys = np.sort(np.minimum(test_u, test_v) * n + np.maximum(test_u, test_v))
+        negative_u, negative_v = sample_negatives(adjacency, len(test_u), rng, test_keys)
+        _, ranking_v = sample_negatives(adjacency, len(test_u) * negatives_per_positive, rng, test_keys,
+                                        sources=np.repeat(test_u, negatives_per_positive))
+        ranking_v = ranking_v.reshape(len(test_u), negatives_per_positive)
+
+    results = {}
+    for name in predictors:
+        try:
+            with timer.stage(f"{name}/fit"):
+                score = PREDICTORS[name](adjacency, names)
+            with timer.stage(f"{name}/score"):
+                metrics = evaluate(score, test_u, test_v, negative_u, negative_v, ranking_v)
+        except Exception as e:
+            print(f"Error evaluating {name}: {e}")
+            continue
+        results[name] = metrics
+        print(f"{name}: " + ", ".join(f"{key}={value:.4f}" for key, value in metrics.items()))
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "split": {
+            "cutoff": str(cutoff.date()),
+            "train_organizations": len(names),
+            "train_edges": int(adjacency.nnz // 2),
+            "test_edges": int(total_test_edges),
+            "evaluated_test_edges": int(len(test_u)),
+            "negatives_per_positive": negatives_per_positive,
+            "seed": seed,
+        },
+        "metrics": results,
+        "stages": timer.stages,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare_with_baseline(report, baseline_path):
+    """Print metric and time changes against an earlier results file"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Compared with {baseline_path} ({baseline.get('created')}):")
+    for name, metrics in report["metrics"].items():
+        for key, value in metrics.items():
+            previous = baseline.get("metrics", {}).get(name, {}).get(key)
+            if previous is not None:
+                print(f"  {name} {key}: {previous:.4f} -> {value:.4f} ({value - previous:+.4f})")
+    for stage, values in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous:
+            line = f"  {stage}: {previous['seconds']:.2f}s -> {values['seconds']:.2f}s"
+            if "peak_mb" in previous and "peak_mb" in values:
+                line += f", {previous['peak_mb']:.1f} -> {values['peak_mb']:.1f} MB"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temporal link-prediction benchmark for collaboration predictors.")
+    parser.add_argument("--predictors", default="common_neighbours,adamic_adar,jaccard,preferential_attachment,gae",
+                        help=f"Comma-separated, from: {', '.join(PREDICTORS)}")
+    parser.add_argument("--cutoff", help=f"Train on projects signed before this date (default: the {TRAIN_FRACTION:.0%} quantile)")
+    parser.add_argument("--max-test-edges", type=int, default=MAX_TEST_EDGES)
+    parser.add_argument("--negatives", type=int, default=NEGATIVES_PER_POSITIVE, help="Negatives per positive for hits@k and MRR")
+    parser.add_argument("--gae-steps", type=int, default=GAE_STEPS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record peak memory per stage with tracemalloc (slows the stages, so times are not comparable)")
+    args = parser.parse_args(argv)
+
+    predictors = [p.strip() for p in args.predictors.split(",") if p.strip()]
+    unknown = [p for p in predictors if p not in PREDICTORS]
+    if unknown:
+        parser.error(f"unknown predictors: {', '.join(unknown)}")
+    PREDICTORS["gae"] = gae_predictor(args.gae_steps)
+
+    from data_cache import ORG_FILE, PROJ_FILE, read_table
+    report = run_benchmark(read_table(ORG_FILE), read_table(PROJ_FILE), predictors, cutoff=args.cutoff,
+                           max_test_edges=args.max_test_edges, negatives_per_positive=args.negatives, seed=args.seed,
+                           trace_memory=args.trace_memory)
+    report["predictors"] = predictors
+    tmp_path = f"{args.output}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, args.output)
+    print(f"Results written to {args.output}.")
+    if args.baseline:
+        compare_with_baseline(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
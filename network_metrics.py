@@ -0,0 +1,376 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+
+from data_cache import CACHE_DIR, publish_dir, tmp_dir_for
+from graph_index import gather
+
+METRICS_FORMAT_VERSION = 1
+BETWEENNESS_PIVOTS = 256          # sampled BFS sources for approximate betweenness
+BETWEENNESS_BATCH_BYTES = 128 * 1024 * 1024  # dense (organizations x sources) state of all concurrent batches
+TRIANGLE_BLOCK_WORK = 20_000_000  # sparse products per row block when counting triangles
+PAGERANK_ALPHA = 0.85
+PAGERANK_TOLERANCE = 1e-10
+PAGERANK_MAX_ITERATIONS = 200
+
+
+def organization_adjacency(graph_index):
+    """Symmetric organization x organization matrix, weighted by the number of shared projects"""
+    n_orgs = len(graph_index.org_ids)
+    n_projects = len(graph_index.proj_org_offsets) - 1
+    org_codes = np.repeat(np.arange(n_orgs, dtype=np.int64), np.diff(graph_index.org_offsets))
+    project_codes = np.asarray(graph_index.org_row_project)[np.asarray(graph_index.org_rows)]
+    valid = project_codes >= 0
+    incidence = sp.csr_matrix(
+        (np.ones(int(valid.sum()), dtype=np.float64), (org_codes[valid], project_codes[valid])),
+        shape=(n_orgs, n_projects),
+    )
+    incidence.data[:] = 1.0  # an organization counts once per project, however many rows it has
+    adjacency = (incidence @ incidence.T).tocsr()
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    adjacency.sort_indices()
+    return adjacency
+
+
+def _binary(adjacency):
+    binary = adjacency.copy()
+    binary.data = np.ones_like(binary.data)
+    return binary
+
+
+def components(adjacency):
+    """Connected component of every organization, numbered by decreasing size (0 = giant component)"""
+    _, labels = csgraph.connected_components(adjacency, directed=False)
+    sizes = np.bincount(labels)
+    rank = np.empty_like(sizes)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+    return rank[labels].astype(np.int64)
+
+
+def core_numbers(adjacency):
+    """k-core number of every organization by batch peeling.
+
+    All organizations whose remaining degree is at most k are removed together;
+    only the neighbours of removed organizations are re-examined, so each round
+    costs O(removed degree) instead of O(n).
+    """
+    n = adjacency.shape[0]
+    degree = np.diff(adjacency.indptr).astype(np.int64)
+    core = np.zeros(n, dtype=np.int64)
+    alive = np.ones(n, dtype=bool)
+    remaining, k = n, 0
+    frontier = np.empty(0, dtype=np.int64)
+    while remaining:
+        if len(frontier) == 0:
+            k = max(k, int(degree[alive].min()))
+            frontier = np.flatnonzero(alive & (degree <= k))
+        alive[frontier] = False
+        core[frontier] = k
+        remaining -= len(frontier)
+        neighbours = gather(adjacency.indptr, adjacency.indices, frontier)
+        neighbours = np.sort(neighbours[alive[neighbours]])
+        if len(neighbours) == 0:
+            frontier = neighbours
+            continue
+        starts = np.flatnonzero(np.r_[True, neighbours[1:] != neighbours[:-1]])
+        touched = neighbours[starts]
+        degree[touched] -= np.diff(np.r_[starts, len(neighbours)])
+        frontier = touched[degree[touched] <= k]
+    return core
+
+
+def _row_blocks(work, budget):
+    """Split rows into contiguous blocks whose summed work stays near `budget`"""
+    cumulative = np.cumsum(work)
+    cuts = np.searchsorted(cumulative, np.arange(budget, cumulative[-1] if len(work) else 0, budget))
+    bounds = np.unique(np.r_[0, cuts + 1, len(work)])
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def triangle_counts(binary, executor, block_work=TRIANGLE_BLOCK_WORK):
+    """Triangles through every organization: row sums of (A @ A) * A, computed in row blocks"""
+    degree = np.diff(binary.indptr).astype(np.float64)
+    work = binary @ degree + 1  # size of the intermediate product of each row
+    triangles = np.zeros(binary.shape[0], dtype=np.int64)
+
+    def count(block):
+        start, stop = block
+        rows = binary[start:stop]
+        closed = (rows @ binary).multiply(rows)
+        triangles[start:stop] = np.asarray(closed.sum(axis=1)).ravel().astype(np.int64) // 2
+
+    list(executor.map(count, _row_blocks(work, block_work)))
+    return triangles
+
+
+def clustering_coefficients(triangles, degree):
+    """Local clustering of every organization (0 below degree 2), the average and the transitivity"""
+    pairs = degree * (degree - 1) / 2.0
+    local = np.divide(triangles, pairs, out=np.zeros(len(degree)), where=pairs > 0)
+    average = float(local.mean()) if len(local) else 0.0
+    transitivity = float(triangles.sum() / pairs.sum()) if pairs.sum() > 0 else 0.0
+    return local, average, transitivity
+
+
+def _brandes_batch(binary, sources):
+    """Dependency of every node on shortest paths from each source (Brandes), all sources at once"""
+    n, s = binary.shape[0], len(sources)
+    columns = np.arange(s)
+    distance = np.full((n, s), -1, dtype=np.int32)
+    sigma = np.zeros((n, s), dtype=np.float64)
+    distance[sources, columns] = 0
+    sigma[sources, columns] = 1.0
+    frontier = np.zeros((n, s), dtype=np.float64)
+    frontier[sources, columns] = 1.0
+    level = 0
+    while True:
+        paths = binary @ frontier
+        reached = (paths > 0) & (distance < 0)
+        if not reached.any():
+            break
+        level += 1
+        distance[reached] = level
+        sigma[reached] = paths[reached]
+        frontier = np.where(reached, sigma, 0.0)
+
+    delta = np.zeros((n, s), dtype=np.float64)
+    for depth in range(level, 0, -1):
+        at_depth = distance == depth
+        coefficient = np.divide(1.0 + delta, sigma, out=np.zeros((n, s)), where=at_depth)
+        above = distance == depth - 1
+        delta += np.where(above, sigma * (binary @ coefficient), 0.0)
+    delta[sources, columns] = 0.0
+    return delta.sum(axis=1)
+
+
+def approximate_betweenness(binary, executor, n_workers, n_pivots=BETWEENNESS_PIVOTS, seed=42,
+                            batch_bytes=BETWEENNESS_BATCH_BYTES):
+    """Normalized betweenness estimated from `n_pivots` uniformly sampled BFS sources.
+
+    Matches networkx's `betweenness_centrality(k=n_pivots, normalized=True)`; with
+    n_pivots >= n it is exact. Up to `n_workers` batches run at once, so each gets
+    an equal share of `batch_bytes`.
+    """
+    n = binary.shape[0]
+    if n < 3:
+        return np.zeros(n)
+    n_pivots = min(n_pivots, n)
+    pivots = np.random.default_rng(seed).choice(n, size=n_pivots, replace=False)
+    # distance, sigma, frontier, delta and temporaries: about six dense float64 copies
+    batch = max(1, min(n_pivots, batch_bytes // (6 * 8 * n * max(1, n_workers))))
+    batches = [pivots[i:i + batch] for i in range(0, n_pivots, batch)]
+    total = np.zeros(n, dtype=np.float64)
+    for partial in executor.map(lambda sources: _brandes_batch(binary, sources), batches):
+        total += partial
+    return total * (n / n_pivots) / ((n - 1) * (n - 2))
+
+
+def pagerank(adjacency, alpha=PAGERANK_ALPHA, tolerance=PAGERANK_TOLERANCE, max_iterations=PAGERANK_MAX_ITERATIONS):
+    """Weighted PageRank by power iteration; isolated organizations spread their rank uniformly"""
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = strength == 0
+    inverse = np.divide(1.0, strength, out=np.zeros(n), where=~dangling)
+    transition = adjacency.T.tocsr()  # symmetric, but keeps the general form readable
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        previous = rank
+        rank = alpha * (transition @ (previous * inverse))
+        rank += (alpha * previous[dangling].sum() + 1.0 - alpha) / n
+        if np.abs(rank - previous).sum() < n * tolerance:
+            break
+    else:
+        print(f"PageRank did not converge in {max_iterations} iterations.")
+    return rank / rank.sum()
+
+
+@dataclass(frozen=True)
+class NetworkMetrics:
+    """Per-organization structural metrics, aligned with `GraphIndex.org_ids`"""
+    org_ids: np.ndarray
+    component: np.ndarray     # 0 is the largest connected component
+    degree: np.ndarray        # distinct partners
+    strength: np.ndarray      # partners weighted by shared projects
+    core: np.ndarray          # k-core number
+    triangles: np.ndarray
+    clustering: np.ndarray    # local clustering coefficient
+    betweenness: np.ndarray   # normalized, estimated from sampled sources
+    pagerank: np.ndarray
+
+    def save(self, directory):
+        directory = os.fspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        for field in fields(self):
+            np.save(os.path.join(directory, f"{field.name}.npy"), getattr(self, field.name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        directory = os.fspath(directory)
+        mode = "r" if mmap else None
+        return cls(**{
+            field.name: np.load(os.path.join(directory, f"{field.name}.npy"), mmap_mode=mode)
+            for field in fields(cls)
+        })
+
+    def top(self, metric, n=20, component=None):
+        """Positions of the `n` organizations with the highest `metric`, best first"""
+        values = np.asarray(getattr(self, metric), dtype=np.float64)
+        candidates = np.arange(len(values)) if component is None else np.flatnonzero(np.asarray(self.component) == component)
+        n = min(n, len(candidates))
+        if n == 0:
+            return candidates
+        best = candidates[np.argpartition(-values[candidates], n - 1)[:n]]
+        return best[np.lexsort((best, -values[best]))]
+
+
+def compute_network_metrics(graph_index, n_pivots=BETWEENNESS_PIVOTS, seed=42, n_threads=None):
+    """Compute every metric on the full organization graph; returns (NetworkMetrics, summary dict)"""
+    timings = {}
+    started = time.perf_counter()
+    adjacency = organization_adjacency(graph_index)
+    binary = _binary(adjacency)
+    n = adjacency.shape[0]
+    timings["graph"] = time.perf_counter() - started
+    print(f"Organization graph: {n} organizations, {binary.nnz // 2} collaborations.")
+
+    n_workers = n_threads or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="metrics") as executor:
+        def timed(name, function, *args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            timings[name] = time.perf_counter() - start
+            print(f"  {name}: {timings[name]:.1f}s")
+            return result
+
+        component = timed("components", components, binary)
+        core = timed("k-core", core_numbers, binary)
+        triangles = timed("triangles", triangle_counts, binary, executor)
+        betweenness = timed("betweenness", approximate_betweenness, binary, executor, n_workers,
+                            n_pivots=n_pivots, seed=seed)
+        rank = timed("pagerank", pagerank, adjacency)
+
+    degree = np.diff(binary.indptr).astype(np.int64)
+    clustering, average_clustering, transitivity = clustering_coefficients(triangles, degree)
+    metrics = NetworkMetrics(
+        org_ids=np.asarray(graph_index.org_ids),
+        component=component,
+        degree=degree,
+        strength=np.asarray(adjacency.sum(axis=1)).ravel().astype(np.int64),
+        core=core,
+        triangles=triangles,
+        clustering=clustering,
+        betweenness=betweenness,
+        pagerank=rank,
+    )
+    component_sizes = np.bincount(component) if n else np.zeros(0, dtype=np.int64)
+    summary = {
+        "organizations": int(n),
+        "collaborations": int(binary.nnz // 2),
+        "average_degree": float(degree.mean()) if n else 0.0,
+        "density": float(binary.nnz / (n * (n - 1))) if n > 1 else 0.0,
+        "components": int(len(component_sizes)),
+        "giant_component_size": int(component_sizes[0]) if n else 0,
+        "isolated_organizations": int((degree == 0).sum()),
+        "max_core": int(core.max()) if n else 0,
+        "triangles": int(triangles.sum() // 3),
+        "average_clustering": average_clustering,
+        "transitivity": transitivity,
+        "betweenness_pivots": int(min(n_pivots, n)),
+        "seconds": {name: round(value, 3) for name, value in timings.items()},
+    }
+    return metrics, summary
+
+
+def metrics_dir_for(version):
+    return CACHE_DIR / f"network_metrics-{version}"
+
+
+def load_or_compute_network_metrics(graph_index, version, n_pivots=BETWEENNESS_PIVOTS, seed=42,
+                                    n_threads=None, rebuild=False):
+    """Load the cached metrics of this dataset version, computing and persisting them if needed.
+
+    Returns (NetworkMetrics, summary dict). Like the graph index, results are written
+    to a temporary directory and renamed into place.
+    """
+    directory = metrics_dir_for(version)
+    meta_path = directory / "meta.json"
+    expected_meta = {
+        "format": METRICS_FORMAT_VERSION,
+        "organizations": len(graph_index.org_ids),
+        "pivots": n_pivots,
+        "seed": seed,
+    }
+    if meta_path.exists() and not rebuild:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("key") == expected_meta:
+                return NetworkMetrics.load(directory, mmap=True), meta["summary"]
+        except Exception as e:
+            print(f"Error loading network metrics from {directory}, recomputing them: {e}")
+
+    metrics, summary = compute_network_metrics(graph_index, n_pivots=n_pivots, seed=seed, n_threads=n_threads)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_dir = tmp_dir_for(directory)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        metrics.save(tmp_dir)
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"key": expected_meta, "summary": summary}, f)
+        if not publish_dir(tmp_dir, directory, "network_metrics-*"):
+            print(f"Network metrics published concurrently by another worker, loading {directory}.")
+            return NetworkMetrics.load(directory, mmap=True), summary
+        print(f"Network metrics saved to {directory}.")
+    except OSError as e:
+        print(f"Could not persist network metrics: {e}")
+    return metrics, summary
+
+
+_lock = threading.Lock()
+_shared_metrics = {}
+
+
+def get_shared_network_metrics(dataset):
+    """Metrics of the shared dataset, computed at most once per worker process"""
+    with _lock:
+        if dataset.version not in _shared_metrics:
+            _shared_metrics.clear()
+            _shared_metrics[dataset.version] = load_or_compute_network_metrics(dataset.graph_index, dataset.version)
+        return _shared_metrics[dataset.version]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Structural metrics of the full organization collaboration graph.")
+    parser.add_argument("--pivots", type=int, default=BETWEENNESS_PIVOTS, help="Sampled sources for approximate betweenness")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=None, help="Worker threads (default: all CPUs)")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute even if cached for this dataset version")
+    parser.add_argument("--top", type=int, default=10, help="Organizations listed per metric")
+    args = parser.parse_args(argv)
+
+    from shared_dataset import get_shared_dataset
+    dataset = get_shared_dataset()
+    metrics, summary = load_or_compute_network_metrics(dataset.graph_index, dataset.version, n_pivots=args.pivots,
+                                                       seed=args.seed, n_threads=args.threads, rebuild=args.rebuild)
+    print(json.dumps(summary, indent=2))
+    for metric in ("betweenness", "pagerank", "core", "degree"):
+        print(f"Top {args.top} by {metric}:")
+        for position in metrics.top(metric, args.top):
+            org_id = str(metrics.org_ids[position])
+            print(f"  {dataset.organization_choices.get(org_id, org_id)}: {float(getattr(metrics, metric)[position]):.6g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from shiny.session import require_active_session
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from graph_index import _csr, gather
+
+# Matches returned per keystroke
+SEARCH_LIMIT = 50
+# Substring (trigram) matching starts at this query length; shorter queries match word prefixes only
+MIN_SUBSTRING_LENGTH = 3
+# Option fields selectize filters on in the browser. Options carry the normalized text of every
+# indexed field as "search", so server matches on short name or VAT number are not filtered out
+# again client-side; pass as `options={"searchField": SELECTIZE_SEARCH_FIELDS}`.
+SELECTIZE_SEARCH_FIELDS = ["label", "search"]
+
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_text(text):
+    """Lower-case, accent-free, alphanumeric words separated by single spaces"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = _COMBINING_MARKS.sub("", text).casefold()
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def _normalize_series(values):
+    # Vectorized normalize_text over a Series; missing values become ""
+    text = values.astype(object).where(values.notna(), "").map(str)
+    text = text.str.normalize("NFKD").str.replace(_COMBINING_MARKS, "", regex=True).str.casefold()
+    return text.str.replace(_SEPARATORS, " ", regex=True).str.strip()
+
+
+def _sorted_unique(values):
+    # Sort-based unique; np.unique's hash path is much slower on large integer arrays
+    values = np.sort(values)
+    if len(values) == 0:
+        return values
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def _unique_inverse(values):
+    """Sorted unique values and, per element, its position among them"""
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    first = np.concatenate(([True], ordered[1:] != ordered[:-1])) if len(ordered) else np.empty(0, dtype=bool)
+    inverse = np.empty(len(values), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return ordered[first], inverse
+
+
+def _trigram_codes(codepoints):
+    c = codepoints.astype(np.uint64)
+    return (c[:-2] << np.uint64(42)) | (c[1:-1] << np.uint64(21)) | c[2:]
+
+
+class OrgSearchIndex:
+    """Prebuilt search index over selectize choices, queried once per keystroke.
+
+    Entries are stored in rank order (e.g. by number of participations), so
+    every candidate list is already sorted by relevance and a query stops as
+    soon as it has `limit` matches. Results come in three tiers:
+    1. exact match of a whole field (ID, VAT number, name)
+    2. every query word is a prefix of a word of the entry (sorted word list + bisect)
+    3. the query is a substring of the entry (trigram postings, verified)
+    """
+
+    def __init__(self, values, labels, fields, rank=None):
+        """`fields` are equally long sequences of searchable text (name, short name, VAT, ID...)"""
+        values = pd.Series(values, dtype=object).reset_index(drop=True)
+        order = np.arange(len(values)) if rank is None else np.argsort(-np.asarray(rank), kind="stable")
+        self.values = values.take(order).tolist()
+        self.labels = pd.Series(labels, dtype=object).take(order).tolist()
+        self._position = {value: i for i, value in reversed(list(enumerate(self.values)))}
+        normalized = [_normalize_series(pd.Series(field, dtype=object).take(order)).tolist() for field in fields]
+        self.texts = [" ".join(part for part in parts if part) for parts in zip(*normalized)]
+
+        # Tier 1: whole fields, also without spaces so "be 0123 456" finds "BE0123456"
+        self.exact = {}
+        for field in normalized:
+            for entry, text in enumerate(field):
+                if text:
+                    self.exact.setdefault(text, entry)
+                    self.exact.setdefault(text.replace(" ", ""), entry)
+
+        # Tier 2: sorted unique words -> entries (CSR)
+        words = pd.Series(self.texts).str.split().explode().dropna()
+        word_codes, self.words = pd.factorize(words, sort=True)
+        self.words = self.words.tolist()
+        self.word_offsets, self.word_entries = _csr(word_codes.astype(np.int64), len(self.words))
+        self.word_entries = words.index.to_numpy(dtype=np.int64)[self.word_entries]
+
+        # Tier 3: trigram code -> entries, computed over all texts at once
+        joined = "\0".join(self.texts)
+        codepoints = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+        entry_of_char = np.repeat(np.arange(len(self.texts)), [len(t) + 1 for t in self.texts])[:len(codepoints)]
+        if len(codepoints) >= 3:
+            codes = _trigram_codes(codepoints)
+            entries = entry_of_char[:-2]
+            inside = entry_of_char[2:] == entries  # drop trigrams spanning two entries
+            self.gram_codes, gram = _unique_inverse(codes[inside])
+            # One int64 key per (trigram, entry) pair: sorting it groups postings by trigram, entries ascending
+            n_entries = max(len(self.texts), 1)
+            pairs = _sorted_unique(gram * n_entries + entries[inside])
+            self.gram_entries = pairs % n_entries
+            self.gram_offsets = np.zeros(len(self.gram_codes) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(pairs // n_entries, minlength=len(self.gram_codes)), out=self.gram_offsets[1:])
+        else:
+            self.gram_codes = np.empty(0, dtype=np.uint64)
+            self.gram_offsets = np.zeros(1, dtype=np.int64)
+            self.gram_entries = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.values)
+
+    def label(self, value):
+        position = self._position.get(value)
+        return value if position is None else self.labels[position]
+
+    def option(self, value):
+        """Selectize option for `value`, with the searchable text of all its fields"""
+        position = self._position.get(value)
+        if position is None:
+            return {"value": value, "label": value, "search": normalize_text(value)}
+        return {"value": value, "label": self.labels[position], "search": self.texts[position]}
+
+    def _prefix_entries(self, word):
+        start = bisect.bisect_left(self.words, word)
+        stop = bisect.bisect_left(self.words, word + "\U0010ffff", lo=start)
+        return _sorted_unique(gather(self.word_offsets, self.word_entries, np.arange(start, stop)))
+
+    def _substring_candidates(self, query):
+        codes = _sorted_unique(_trigram_codes(np.frombuffer(query.encode("utf-32-le"), dtype=np.uint32)))
+        positions = np.searchsorted(self.gram_codes, codes)
+        if np.any(positions >= len(self.gram_codes)) or np.any(self.gram_codes[np.minimum(positions, len(self.gram_codes) - 1)] != codes):
+            return np.empty(0, dtype=np.int64)
+        lists = sorted((self.gram_entries[self.gram_offsets[p]:self.gram_offsets[p + 1]] for p in positions), key=len)
+        candidates = lists[0]
+        for entries in lists[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, entries, assume_unique=True)
+        return candidates
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Return up to `limit` (value, label) pairs matching `query`, best first"""
+        query = normalize_text(query)
+        if not query:
+            return [(self.values[i], self.labels[i]) for i in range(min(limit, len(self.values)))]
+
+        found = []
+        seen = set()
+
+        def take(entries):
+            for entry in entries:
+                if len(found) >= limit:
+                    return
+                if entry not in seen:
+                    seen.add(entry)
+                    found.append(entry)
+
+        exact = self.exact.get(query, self.exact.get(query.replace(" ", "")))
+        if exact is not None:
+            take([exact])
+
+        prefix_matches = None
+        for word in query.split():
+            entries = self._prefix_entries(word)
+            prefix_matches = entries if prefix_matches is None else np.intersect1d(prefix_matches, entries, assume_unique=True)
+            if len(prefix_matches) == 0:
+                break
+        take(prefix_matches[:limit].tolist())
+
+        if len(found) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+            # Trigram candidates can be false positives, so each one is verified
+            texts = self.texts
+            take(entry for entry in self._substring_candidates(query).tolist() if query in texts[entry])
+
+        return [(self.values[i], self.labels[i]) for i in found]
+
+
+def build_org_search_index(org_df):
+    """Index organizations by name, short name, VAT number and ID, most active first"""
+    orgs = org_df.dropna(subset=['name', 'organisationID'])
+    participations = orgs['organisationID'].astype(str).value_counts()
+    orgs = orgs.drop_duplicates(subset=['organisationID'])
+    ids = orgs['organisationID'].astype(str)
+    labels = orgs['name'].astype(str) + " (" + ids + ")"
+    fields = [orgs['name'], ids]
+    for column in ('shortName', 'vatNumber'):
+        if column in orgs.columns:
+            fields.append(orgs[column])
+    return OrgSearchIndex(ids.tolist(), labels.tolist(), fields, rank=ids.map(participations).to_numpy())
+
+
+def build_name_search_index(names):
+    """Index plain names (e.g. the organizations of the recommendation store), in the given order"""
+    names = list(names)
+    return OrgSearchIndex(names, names, [names])
+
+
+def update_selectize_search(input_id, index, selected=None, limit=SEARCH_LIMIT, session=None):
+    """Let a selectize input query `index` on the server instead of holding every choice.
+
+    Uses the same protocol as `ui.update_selectize(server=True)`: the input fetches
+    options from a session route as the user types. Selected values are always
+    included in the response so the input can display them. The input must be
+    created with `options={"searchField": SELECTIZE_SEARCH_FIELDS}`.
+    """
+    session = require_active_session(session)
+    if selected is None:
+        selected_values = []
+    elif isinstance(selected, str):
+        selected_values = [selected]
+    else:
+        selected_values = list(selected)
+    selected_set = set(selected_values)
+    selected_choices = [index.option(v) for v in selected_values]
+
+    def search_choices(request: Request):
+        query = request.query_params.get("query", "")
+        try:
+            max_options = min(int(request.query_params.get("maxop", limit)), limit)
+        except ValueError:
+            max_options = limit
+        matches = index.search(query, limit=max_options + len(selected_set))
+        choices = [index.option(v) for v, _ in matches if v not in selected_set][:max_options]
+        return JSONResponse(choices + selected_choices)
+
+    message = {"url": session.dynamic_route(f"search_{input_id}", search_choices)}
+    if selected_values:
+        message["value"] = selected_values if len(selected_values) > 1 else selected_values[0]
+    session.send_input_message(input_id, message)
@@ -1,22 +1,22 @@
-import json
 import pandas as pd
 from shiny import App, ui, render, reactive
 from pathlib import Path
+from recommendation_store import get_shared_recommendation_store
+from org_search import SELECTIZE_SEARCH_FIELDS, build_name_search_index, update_selectize_search
 
 # Load the recommendations data
 def load_recommendations():
-    """Load the recommendations data from JSON file"""
+    """Open the memory-mapped recommendation store built from dataset/data.json"""
     try:
-        with open("dataset/data.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
+        return get_shared_recommendation_store("dataset/data.json")
     except Exception as e:
         print(f"Error loading data: {e}")
         return {}
 
 # Load data
 recommendations_data = load_recommendations()
-organization_list = sorted(list(recommendations_data.keys()))
+organization_list = list(recommendations_data.keys())  # the store keeps keys sorted
+organization_search = build_name_search_index(organization_list)
 
 # Define UI
 app_ui = ui.page_fluid(
@@ -86,9 +86,8 @@ app_ui = ui.page_fluid(
                     ui.input_selectize(
                         "selected_org",
                         "",
-                        choices=organization_list,
-                        selected=organization_list[0] if organization_list else None,
-                        options={"placeholder": "Type to search organizations..."}
+                        choices=[],
+                        options={"placeholder": "Type to search organizations...", "searchField": SELECTIZE_SEARCH_FIELDS}
                     ),
                     ui.br(),
                     ui.div(
@@ -125,6 +124,10 @@ app_ui = ui.page_fluid(
 # Define server logic
 def server(input, output, session):
     
+    # Organizations are searched on the server instead of being sent to the browser
+    update_selectize_search("selected_org", organization_search,
+                            selected=organization_list[0] if organization_list else None)
+    
     @output
     @render.ui
     def recommendations_output():
@@ -1,15 +1,51 @@
+import importlib.util
+import threading
 import pandas as pd
 import numpy as np
-from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from scipy import stats
-from shiny import App, ui, render
+from shiny import App, ui, render, reactive
 from pathlib import Path
+from data_cache import PROJ_FILE, read_shared_table, dataset_version
+
+# Durations outside (0, MAX_DURATION_MONTHS) months are treated as data errors
+MAX_DURATION_MONTHS = 120
+DAYS_PER_MONTH = 30
+# Equal-width bins of the duration histogram, for the full range and for every zoomed range
+HISTOGRAM_BINS = 30
+DURATION_VIEWER_DIR = Path(__file__).parent / "duration_viewer"
+# Trend analysis picks the number of duration clusters in 1..MAX_DURATION_CLUSTERS by BIC
+MAX_DURATION_CLUSTERS = 6
+# Least variance of a cluster, in months²: durations are whole days / DAYS_PER_MONTH, so a
+# cluster is never known more precisely than a uniform spread over one day
+MIN_CLUSTER_VARIANCE = (1 / DAYS_PER_MONTH) ** 2 / 12
+
+
+def _find_plotly_js_dir():
+    """Directory of the plotly.js bundled with the plotly package (located without importing plotly)"""
+    spec = importlib.util.find_spec("plotly")
+    directory = Path(spec.origin).parent / "package_data" if spec is not None and spec.origin else None
+    if directory is None or not (directory / "plotly.min.js").exists():
+        raise ImportError("The duration histogram needs plotly.js from the plotly package: pip install plotly")
+    return directory
+
+
+# plotly.js, served once as a static asset and cached by the browser; the browser
+# draws the chart, so Python never imports plotly
+PLOTLY_JS_DIR = _find_plotly_js_dir()
+# Breakdowns offered in the UI: column (or "startYear") -> label
+BREAKDOWNS = {
+    "fundingScheme": "Funding scheme",
+    "legalBasis": "Legal basis",
+    "masterCall": "Master call",
+    "startYear": "Start year",
+}
 
 # Define the UI
 app_ui = ui.page_fluid(
+    # Page-relative script URLs, so the app also works mounted under a path prefix (see server.py)
+    ui.head_content(
+        ui.tags.script(src="plotly/plotly.min.js"),
+        ui.tags.script(src="duration_viewer/duration_histogram.js"),
+    ),
     ui.h1("Project Duration Analysis", align="center"),
     
     # Statistics cards section
@@ -77,6 +113,15 @@ app_ui = ui.page_fluid(
         full_screen=True
     ),
     
+    # Grouped statistics, precomputed for every breakdown
+    ui.card(
+        ui.card_header("Duration by Group"),
+        ui.input_select("breakdown", "Break down by", choices=BREAKDOWNS),
+        ui.output_data_frame("breakdown_table"),
+        class_="mt-4",
+        full_screen=True
+    ),
+    
     # Add Trend Analysis card
     ui.card(
         ui.card_header("Trend Analysis"),
@@ -88,34 +133,245 @@ app_ui = ui.page_fluid(
     # Add Duration Distribution card
     ui.card(
         ui.card_header("Duration Distribution"),
-        ui.output_ui("duration_plot"),  # Changed from output_plot to output_ui
+        # Drawn in the browser from the bins sent by the server; zooming re-bins the visible range
+        ui.div(id="duration_histogram", style="height: 450px;"),
         class_="mt-4",
         full_screen=True
     ),
 )
 
-# Move perform_trend_analysis outside server function
+def compute_project_durations(df):
+    """Duration in months of every project with valid YYYY-MM-DD start and end dates.
+
+    Returns (durations, valid) where `valid` marks the rows of `df` that were kept.
+    """
+    start = pd.to_datetime(df['startDate'], format='%Y-%m-%d', errors='coerce')
+    end = pd.to_datetime(df['endDate'], format='%Y-%m-%d', errors='coerce')
+    durations = ((end - start).dt.days / DAYS_PER_MONTH).to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = (durations > 0) & (durations < MAX_DURATION_MONTHS)  # NaN compares False
+    return durations[valid], valid
+
+
+def summary_statistics(durations):
+    q1, median, q3 = np.percentile(durations, [25, 50, 75])
+    return {
+        'count': len(durations),
+        'mean': np.mean(durations),
+        'median': median,
+        'std_dev': np.std(durations),
+        'min': np.min(durations),
+        'max': np.max(durations),
+        'q1': q1,
+        'q3': q3,
+        'iqr': q3 - q1,
+        'cv': (np.std(durations) / np.mean(durations)) * 100
+    }
+
+
+def _segment_quantile(sorted_values, starts, counts, q):
+    # Linear interpolation between closest ranks, as np.percentile does
+    position = q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    fraction = position - lower
+    return sorted_values[starts + lower] * (1 - fraction) + sorted_values[starts + upper] * fraction
+
+
+def grouped_statistics(codes, categories, durations):
+    """Count, mean, median, std, min, max and quartiles of `durations` per group code, in one pass.
+
+    Rows are sorted by (group, duration) once; every statistic is then read from
+    the contiguous segment of its group. Rows with a negative code are ignored.
+    """
+    keep = codes >= 0
+    codes, durations = codes[keep], durations[keep]
+    order = np.lexsort((durations, codes))
+    codes, values = codes[order], durations[order]
+    present, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+    means = np.add.reduceat(values, starts) / counts if len(values) else np.empty(0)
+    squares = np.add.reduceat((values - np.repeat(means, counts)) ** 2, starts) if len(values) else np.empty(0)
+    table = pd.DataFrame({
+        'group': np.asarray(categories, dtype=object)[present],
+        'count': counts,
+        'mean': means,
+        'median': _segment_quantile(values, starts, counts, 0.5),
+        'std_dev': np.sqrt(squares / counts),
+        'min': values[starts],
+        'max': values[starts + counts - 1],
+        'q1': _segment_quantile(values, starts, counts, 0.25),
+        'q3': _segment_quantile(values, starts, counts, 0.75),
+    })
+    return table.sort_values(['count', 'group'], ascending=[False, True], ignore_index=True)
+
+
+def histogram_bins(sorted_durations, low=None, high=None, n_bins=HISTOGRAM_BINS):
+    """Bin edges and counts of a sorted array over [low, high] (default: the data range).
+
+    Counts come from binary searches of the edges, O(n_bins log n); like np.histogram,
+    the last bin includes its right edge.
+    """
+    if len(sorted_durations) == 0:
+        return {"edges": [0.0, 1.0], "counts": [0]}
+    low = float(sorted_durations[0]) if low is None else float(low)
+    high = float(sorted_durations[-1]) if high is None else float(high)
+    if high <= low:
+        high = low + 1.0
+    edges = np.linspace(low, high, n_bins + 1)
+    positions = np.searchsorted(sorted_durations, edges, side='left')
+    positions[-1] = np.searchsorted(sorted_durations, edges[-1], side='right')
+    return {"edges": edges.tolist(), "counts": np.diff(positions).tolist()}
+
+
+def build_duration_cache(df):
+    """Durations, overall statistics and every breakdown table of a project table"""
+    durations, valid = compute_project_durations(df)
+    kept = df[valid]
+    breakdowns = {}
+    for key in BREAKDOWNS:
+        if key == "startYear":
+            groups = pd.to_datetime(kept['startDate'], format='%Y-%m-%d', errors='coerce').dt.year
+        elif key in kept.columns:
+            groups = kept[key]
+        else:
+            print(f"Warning: '{key}' column not found in project data; breakdown skipped.")
+            continue
+        codes, categories = pd.factorize(groups, sort=True)
+        table = grouped_statistics(np.asarray(codes, dtype=np.int64), categories, durations)
+        breakdowns[key] = table.sort_values('group', ignore_index=True) if key == "startYear" else table
+    sorted_durations = np.sort(durations)
+    return {
+        "durations": durations,
+        "sorted_durations": sorted_durations,
+        "histogram": histogram_bins(sorted_durations),
+        "stats": summary_statistics(durations),
+        "trend": perform_trend_analysis(durations),
+        "breakdowns": breakdowns,
+    }
+
+
+_duration_lock = threading.Lock()
+_duration_cache = {}
+
+
+def get_duration_cache():
+    """Duration data of the current project workbook, shared by all sessions.
+
+    Computed once per dataset version: replacing the workbook triggers one rebuild.
+    """
+    version = dataset_version([PROJ_FILE])
+    with _duration_lock:
+        if version not in _duration_cache:
+            _duration_cache.clear()
+            _duration_cache[version] = build_duration_cache(read_shared_table(PROJ_FILE))
+        return _duration_cache[version]
+
+def _segment_argmin(values, starts):
+    """Position of the minimum of each contiguous segment of `values` (first on ties)"""
+    minima = np.minimum.reduceat(values, starts)
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(values)]))
+    hits = np.flatnonzero(values == minima[segment])
+    first = np.full(len(starts), -1)
+    first[segment[hits[::-1]]] = hits[::-1]  # reversed so the first hit of each segment is written last
+    return first
+
+
+def optimal_kmeans_1d(values, k, weights=None):
+    """Exact weighted k-means of sorted 1-D `values` by dynamic programming.
+
+    D[q][i], the least within-cluster sum of squares of values[:i+1] in q clusters,
+    is min over j of D[q-1][j-1] + cost(j, i). The best j never decreases with i, so
+    each level is solved by divide and conquer; all subproblems of one recursion
+    depth are evaluated together with array operations, O(n log n) per level and
+    O(k·n log n) in total (not the O(k·n) of the SMAWK-based variant).
+    Returns (cluster start positions, centers, within-cluster sum of squares).
+    """
+    x = np.asarray(values, dtype=np.float64)
+    w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=np.float64)
+    n = len(x)
+    k = int(np.clip(k, 1, n))
+    s0, s1, s2 = (np.r_[0.0, np.cumsum(w * x ** p)] for p in (0, 1, 2))
+
+    def cost(j, i):
+        # Weighted sum of squares of x[j..i] around its mean
+        weight, total = s0[i + 1] - s0[j], s1[i + 1] - s1[j]
+        return np.maximum(s2[i + 1] - s2[j] - total * total / weight, 0.0)
+
+    all_i = np.arange(n)
+    previous = cost(np.zeros(n, dtype=np.int64), all_i)
+    backtrack = [np.zeros(n, dtype=np.int64)]
+    for q in range(1, k):
+        current = np.full(n, np.inf)
+        best = np.zeros(n, dtype=np.int64)
+        # Pending subproblems: rows lo..hi whose best split lies in opt_lo..opt_hi
+        lo, hi, opt_lo, opt_hi = (np.array([v], dtype=np.int64) for v in (q, n - 1, q, n - 1))
+        while len(lo):
+            mid = (lo + hi) // 2
+            lengths = np.minimum(mid, opt_hi) - opt_lo + 1
+            starts = np.r_[0, np.cumsum(lengths)[:-1]]
+            task = np.repeat(np.arange(len(mid)), lengths)
+            j = opt_lo[task] + np.arange(lengths.sum()) - starts[task]
+            candidates = previous[j - 1] + cost(j, mid[task])
+            winner = _segment_argmin(candidates, starts)
+            chosen = j[winner]
+            current[mid] = candidates[winner]
+            best[mid] = chosen
+            left, right = lo <= mid - 1, mid + 1 <= hi
+            lo, hi, opt_lo, opt_hi = (np.r_[a[left], b[right]] for a, b in
+                                      ((lo, mid + 1), (mid - 1, hi), (opt_lo, chosen), (chosen, opt_hi)))
+        previous = current
+        backtrack.append(best)
+
+    bounds = [n]
+    for q in range(k - 1, -1, -1):
+        bounds.append(int(backtrack[q][bounds[-1] - 1]))
+    starts = np.asarray(bounds[::-1][:-1], dtype=np.int64)
+    ends = np.r_[starts[1:], n]
+    centers = (s1[ends] - s1[starts]) / (s0[ends] - s0[starts])
+    return starts, centers, float(previous[n - 1])
+
+
+def select_duration_clusters(durations, max_k=MAX_DURATION_CLUSTERS):
+    """Optimal 1-D k-means for k = 1..max_k, keeping the k with the best Gaussian-mixture BIC.
+
+    Durations repeat a lot (whole days / 30), so clustering runs on the distinct
+    values weighted by their counts. A cluster of a single distinct value would have
+    a near-zero variance and an unbounded likelihood, so such partitions are skipped
+    and variances are floored at MIN_CLUSTER_VARIANCE. Returns (k, sorted cluster centers).
+    """
+    values, counts = np.unique(np.asarray(durations, dtype=np.float64), return_counts=True)
+    n = counts.sum()
+    best = None
+    for k in range(1, min(max_k, len(values)) + 1):
+        starts, centers, _ = optimal_kmeans_1d(values, k, counts)
+        if k > 1 and np.diff(np.r_[starts, len(values)]).min() < 2:
+            continue
+        cluster = np.repeat(np.arange(k), np.diff(np.r_[starts, len(values)]))
+        share = np.bincount(cluster, weights=counts, minlength=k) / n
+        spread = np.bincount(cluster, weights=counts * (values - centers[cluster]) ** 2, minlength=k)
+        variance = np.maximum(spread / np.maximum(share * n, 1), MIN_CLUSTER_VARIANCE)
+        # Log-likelihood of the distinct values under the fitted mixture, weighted by their counts
+        density = share * np.exp(-(values[:, None] - centers) ** 2 / (2 * variance)) / np.sqrt(2 * np.pi * variance)
+        log_likelihood = float((counts * np.log(np.maximum(density.sum(axis=1), 1e-300))).sum())
+        bic = 2 * log_likelihood - (3 * k - 1) * np.log(n)
+        if best is None or bic > best[0]:
+            best = (bic, k, centers)
+    return best[1], best[2]
+
+
 def perform_trend_analysis(durations):
-    # Identify clusters in the data using KMeans
-    from sklearn.cluster import KMeans
-    
-    # Convert durations to 2D array for KMeans
-    X = durations.reshape(-1, 1)
-    
-    # Determine optimal number of clusters (simplified)
-    k = min(3, len(durations))  # 3 clusters or less if we have less data points
-    
+    """Duration clusters, multimodality and skewness; run once per dataset version with the duration cache"""
+    from scipy import stats  # imported here, on first use, to keep it out of worker start-up
+
     skew_str = ""
     multimodal_str = ""
     cluster_analysis = ""
     
     if len(durations) >= 5:  # Only perform clustering with enough data
-        kmeans = KMeans(n_clusters=k, random_state=42).fit(X)
-        centers = kmeans.cluster_centers_.flatten()
-        centers_str = ", ".join([f"{center:.1f} months" for center in sorted(centers)])
+        k, centers = select_duration_clusters(durations)
+        centers_str = ", ".join([f"{center:.1f} months" for center in centers])
         
         # Check for bimodal distribution
-        if k >= 2 and len(durations) >= 10:
+        if len(durations) >= 10:
             # Calculate Hartigan's dip test for unimodality
             try:
                 from diptest import diptest
@@ -136,7 +392,8 @@ def perform_trend_analysis(durations):
         else:
             skew_str = f"The distribution is negatively skewed (skewness: {skewness:.2f}), indicating a tail toward shorter project durations."
             
-        cluster_analysis = f"Analysis identified {k} potential duration clusters centered at {centers_str}."
+        cluster_analysis = (f"Analysis identified {k} potential duration cluster{'s' if k > 1 else ''} "
+                            f"centered at {centers_str}.")
     else:
         cluster_analysis = "Insufficient data for cluster analysis."
         
@@ -148,50 +405,10 @@ def perform_trend_analysis(durations):
 
 # Define the server
 def server(input, output, session):
-    # Calculate project durations and statistics
-    def get_project_durations():
-        # Load project data
-        df = pd.read_excel('dataset/projects/project.xlsx')
-        
-        # Calculate durations in months
-        durations = []
-        for _, row in df.iterrows():
-            try:
-                if pd.notna(row['startDate']) and pd.notna(row['endDate']):
-                    # Check if date format is valid
-                    if isinstance(row['startDate'], str) and isinstance(row['endDate'], str):
-                        if row['startDate'].count('-') == 2 and row['endDate'].count('-') == 2:
-                            start_date = datetime.strptime(row['startDate'], '%Y-%m-%d')
-                            end_date = datetime.strptime(row['endDate'], '%Y-%m-%d')
-                            
-                            # Calculate duration in months (approximate)
-                            duration_months = (end_date - start_date).days / 30
-                            
-                            # Filter out unreasonable durations
-                            if 0 < duration_months < 120:  # Sanity check
-                                durations.append(duration_months)
-            except:
-                # Skip if there are parsing issues
-                continue
-                
-        return np.array(durations)
-    
-    # Get durations once
-    durations = get_project_durations()
-    
-    # Calculate statistics
-    stats_data = {
-        'count': len(durations),
-        'mean': np.mean(durations),
-        'median': np.median(durations),
-        'std_dev': np.std(durations),
-        'min': np.min(durations),
-        'max': np.max(durations),
-        'q1': np.percentile(durations, 25),
-        'q3': np.percentile(durations, 75),
-        'iqr': np.percentile(durations, 75) - np.percentile(durations, 25),
-        'cv': (np.std(durations) / np.mean(durations)) * 100
-    }
+    # Durations and statistics are computed once per dataset version and shared by every session
+    duration_cache = get_duration_cache()
+    durations = duration_cache["durations"]
+    stats_data = duration_cache["stats"]
     
     # Output renderers
     @render.text
@@ -262,10 +479,19 @@ def server(input, output, session):
     def cv():
         return f"{stats_data['cv']:.2f}% (Measures relative variability)"
     
+    @render.data_frame
+    def breakdown_table():
+        # Precomputed: switching the breakdown is a lookup
+        table = duration_cache["breakdowns"].get(input.breakdown())
+        if table is None:
+            return pd.DataFrame()
+        table = table.rename(columns={'group': BREAKDOWNS[input.breakdown()]})
+        return render.DataGrid(table.round(2), width="100%")
+    
     @render.ui
     def trend_analysis():
         # Get analysis results
-        analysis_results = perform_trend_analysis(durations)
+        analysis_results = duration_cache["trend"]
         
         # Return trend analysis insights
         return ui.tags.div(
@@ -276,22 +502,30 @@ def server(input, output, session):
             ui.tags.p("")
         )
     
-    @render.ui
-    def duration_plot():
-        import plotly.express as px
-        import plotly.offline as offline
-        
-        # Create histogram
-        fig = px.histogram(durations, x=durations, nbins=30, title="Distribution of Project Durations (Months)")
-        
-        # Generate HTML representation of the plot
-        plot_html = offline.plot(fig, include_plotlyjs=True, output_type='div')
-        
-        # Return the HTML content
-        return ui.HTML(plot_html)
+    @reactive.effect
+    async def _send_duration_histogram():
+        zoom = input.duration_zoom() if "duration_zoom" in input else None
+        sorted_durations = duration_cache["sorted_durations"]
+        if zoom and len(zoom) == 2 and len(sorted_durations):
+            # Re-bin only the visible range, clamped to the data (min/max are output names here)
+            low, high = np.clip(np.asarray(zoom, dtype=np.float64), sorted_durations[0], sorted_durations[-1])
+            bins, zoomed = histogram_bins(sorted_durations, low, high), True
+        else:
+            bins, zoomed = duration_cache["histogram"], False
+        # Only the bins travel to the browser; plotly.js comes from the static asset
+        await session.send_custom_message("duration_histogram", {
+            "id": "duration_histogram",
+            "input": "duration_zoom",
+            "title": "Distribution of Project Durations (Months)",
+            "zoomed": zoomed,
+            **bins,
+        })
 
 # Create and run the app
-app = App(app_ui, server)
+app = App(app_ui, server, static_assets={
+    "/plotly": str(PLOTLY_JS_DIR),
+    "/duration_viewer": str(DURATION_VIEWER_DIR),
+})
 
 # For running the app
 if __name__ == "__main__":
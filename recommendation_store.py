@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+
+from data_cache import CACHE_DIR, _path_tag, publish_dir, source_fingerprint, tmp_dir_for
+
+RECOMMENDATIONS_FILE = "dataset/data.json"
+STORE_FORMAT_VERSION = 1
+_ARRAYS = ("string_bytes", "string_offsets", "key_strings", "neighbours", "scores", "counts", "hash_slots")
+
+
+def _key_hash(encoded):
+    """Stable 64-bit hash of a UTF-8 key (Python's hash() is randomized per process)"""
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+
+class RecommendationStore(Mapping):
+    """Read-only, memory-mapped view of the GAE collaboration recommendations.
+
+    Behaves like the dict loaded from data.json (organization name -> list of
+    (partner name, score)), but holds no Python objects per entry:
+    - every name is interned once in a UTF-8 string table (`string_bytes`, `string_offsets`)
+    - recommendations are fixed-width int32 partner string IDs and float32 scores,
+      padded to the longest list, with the real length in `counts`
+    - keys are found through an open-addressing hash table (`hash_slots`), so a
+      lookup is O(1) and touches only the pages it needs
+    Keys are stored sorted, so iteration yields them in alphabetical order.
+    """
+
+    def __init__(self, arrays):
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self._mask = len(self.hash_slots) - 1
+
+    def _string(self, string_id):
+        start, stop = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+        return self.string_bytes[start:stop].tobytes().decode("utf-8")
+
+    def _row_of(self, key):
+        if not isinstance(key, str):
+            return -1
+        encoded = key.encode("utf-8")
+        slot = _key_hash(encoded) & self._mask
+        while True:
+            row = int(self.hash_slots[slot])
+            if row < 0:
+                return -1
+            string_id = self.key_strings[row]
+            start, stop = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+            if stop - start == len(encoded) and self.string_bytes[start:stop].tobytes() == encoded:
+                return row
+            slot = (slot + 1) & self._mask
+
+    def __getitem__(self, key):
+        row = self._row_of(key)
+        if row < 0:
+            raise KeyError(key)
+        count = int(self.counts[row])
+        neighbours = self.neighbours[row, :count].tolist()
+        scores = self.scores[row, :count].tolist()
+        return [(self._string(n), score) for n, score in zip(neighbours, scores)]
+
+    def __contains__(self, key):
+        return self._row_of(key) >= 0
+
+    def __iter__(self):
+        for string_id in self.key_strings.tolist():
+            yield self._string(string_id)
+
+    def __len__(self):
+        return len(self.key_strings)
+
+    def save(self, directory):
+        directory = os.fspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        directory = os.fspath(directory)
+        mode = "r" if mmap else None
+        return cls({name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in _ARRAYS})
+
+
+def build_recommendation_store(recommendations):
+    """Build a store from the data.json mapping {org name: [[partner name, score], ...]}"""
+    strings = {}
+
+    def intern(name):
+        string_id = strings.get(name)
+        if string_id is None:
+            string_id = strings[name] = len(strings)
+        return string_id
+
+    keys = sorted(recommendations)
+    key_strings = np.array([intern(key) for key in keys], dtype=np.int32)
+    width = max((len(recommendations[key]) for key in keys), default=0)
+    neighbours = np.full((len(keys), width), -1, dtype=np.int32)
+    scores = np.full((len(keys), width), np.nan, dtype=np.float32)
+    counts = np.zeros(len(keys), dtype=np.int32)
+    for row, key in enumerate(keys):
+        entries = recommendations[key] or []
+        counts[row] = len(entries)
+        for col, (name, score) in enumerate(entries):
+            neighbours[row, col] = intern(str(name))
+            scores[row, col] = score
+
+    encoded = [name.encode("utf-8") for name in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=string_offsets[1:])
+    string_bytes = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    # Open addressing with linear probing, at most half full
+    n_slots = 1 << max(1, int(2 * len(keys) - 1).bit_length())
+    hash_slots = np.full(n_slots, -1, dtype=np.int32)
+    for row, key in enumerate(keys):
+        slot = _key_hash(key.encode("utf-8")) & (n_slots - 1)
+        while hash_slots[slot] >= 0:
+            slot = (slot + 1) & (n_slots - 1)
+        hash_slots[slot] = row
+
+    return RecommendationStore({
+        "string_bytes": string_bytes,
+        "string_offsets": string_offsets,
+        "key_strings": key_strings,
+        "neighbours": neighbours,
+        "scores": scores,
+        "counts": counts,
+        "hash_slots": hash_slots,
+    })
+
+
+def store_dir_for(json_path):
+    # The path tag keeps the stores of different JSON files (e.g. regenerated recommendations) apart
+    return CACHE_DIR / f"recommendations-{_path_tag(json_path)}-{source_fingerprint(json_path)}"
+
+
+def open_recommendation_store(json_path=RECOMMENDATIONS_FILE, rebuild=False):
+    """Open the store for the current data.json with mmap, converting the JSON if needed.
+
+    The store is keyed on the JSON file's path, mtime and size, so replacing
+    data.json triggers a rebuild. It is written to a temporary directory and
+    renamed into place, so concurrent workers never see a partial store.
+    """
+    directory = store_dir_for(json_path)
+    meta_path = directory / "meta.json"
+    if meta_path.exists() and not rebuild:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                if json.load(f).get("format") == STORE_FORMAT_VERSION:
+                    return RecommendationStore.load(directory, mmap=True)
+        except Exception as e:
+            print(f"Error loading recommendation store from {directory}, rebuilding it: {e}")
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        store = build_recommendation_store(json.load(f))
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_dir = tmp_dir_for(directory)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        store.save(tmp_dir)
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"format": STORE_FORMAT_VERSION, "entries": len(store)}, f)
+        # Only older versions of this JSON file are stale; other files' stores may be open elsewhere
+        if publish_dir(tmp_dir, directory, f"recommendations-{_path_tag(json_path)}-*"):
+            print(f"Recommendation store saved to {directory}.")
+        return RecommendationStore.load(directory, mmap=True)
+    except OSError as e:
+        print(f"Could not persist recommendation store: {e}")
+        return store
+
+
+_lock = threading.Lock()
+_shared_stores = {}
+
+
+def get_shared_recommendation_store(json_path=RECOMMENDATIONS_FILE):
+    """Recommendation store opened once per process and per version of `json_path`.
+
+    Apps mounted in the same server share the instance (and its mapped pages);
+    replacing the JSON file makes the next call open the new store.
+    """
+    key = os.path.abspath(json_path)
+    fingerprint = source_fingerprint(json_path)
+    with _lock:
+        cached = _shared_stores.get(key)
+        if cached is None or cached[0] != fingerprint:
+            _shared_stores[key] = (fingerprint, open_recommendation_store(json_path))
+        return _shared_stores[key][1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the GAE recommendations JSON into the memory-mapped store.")
+    parser.add_argument("command", choices=["build", "status"])
+    parser.add_argument("path", nargs="?", default=RECOMMENDATIONS_FILE, help="Recommendations JSON (default: dataset/data.json)")
+    parser.add_argument("--force", action="store_true", help="Rebuild the store even if it is up to date")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"{args.path}: missing")
+        return
+    directory = store_dir_for(args.path)
+    if args.command == "status":
+        print(f"{args.path}: {'converted' if (directory / 'meta.json').exists() else 'not converted'}")
+    else:
+        store = open_recommendation_store(args.path, rebuild=args.force)
+        print(f"{len(store)} organizations with recommendations in {directory}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.responses import RedirectResponse
+from starlette.routing import Mount, Route
+
+import app as network_app
+import organization_recommendations_dashboard as recommendations_app
+import project_duration_analysis as duration_app
+
+# URL prefix of every Shiny app served by the combined server. The apps run in one
+# process, so they share one copy of the CORDIS tables (data_cache.read_shared_table,
+# shared_dataset) and of the recommendation store (get_shared_recommendation_store).
+MOUNTS = {
+    "/recommendations": recommendations_app.app,
+    "/durations": duration_app.app,
+    "/": network_app.app,  # last: it catches every path the other prefixes do not
+}
+
+
+def _add_trailing_slash(request):
+    # Shiny pages load their assets with page-relative URLs, so a prefix must end in "/"
+    return RedirectResponse(request.url.replace(path=request.url.path + "/"))
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_):
+    """Run the startup and shutdown hooks (App.on_shutdown) of every mounted app"""
+    async with contextlib.AsyncExitStack() as stack:
+        for shiny_app in MOUNTS.values():
+            starlette_app = shiny_app.starlette_app
+            await stack.enter_async_context(starlette_app.router.lifespan_context(starlette_app))
+        yield
+
+
+routes = [Route(prefix, _add_trailing_slash) for prefix in MOUNTS if prefix != "/"]
+routes += [Mount(prefix, app=shiny_app) for prefix, shiny_app in MOUNTS.items()]
+app = Starlette(routes=routes, lifespan=lifespan)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve all dashboards from one process that shares the data.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    for prefix in MOUNTS:
+        print(f"Serving http://{args.host}:{args.port}{prefix.rstrip('/')}/")
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+import pandas as pd
+
+from data_cache import ORG_FILE, PROJ_FILE, TOPIC_FILE, read_shared_table, dataset_version
+from graph_index import GraphIndex, load_or_build_graph_index
+
+# With Copy-on-Write, filtered frames and column selections are lazy views of the
+# shared tables and can never write back into them. It is always on from pandas 3.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+_lock = threading.Lock()
+_shared_dataset = None
+
+
+@dataclass(frozen=True)
+class SharedDataset:
+    """Read-only CORDIS tables and derived lookups, loaded once per worker process.
+
+    Every Shiny session receives the same instance. Consumers must treat the
+    DataFrames as immutable: select rows with boolean masks or positions instead
+    of copying the tables.
+    """
+    org_df: pd.DataFrame
+    proj_df: pd.DataFrame
+    topic_df: pd.DataFrame
+    organization_choices: Mapping[str, str]
+    all_org_ids: Tuple[str, ...]
+    top_10_org_ids: Tuple[str, ...]
+    graph_index: GraphIndex
+    version: str
+
+
+def _build_shared_dataset():
+    print("Loading all data sources...")
+    org_df = read_shared_table(ORG_FILE)
+    proj_df = read_shared_table(PROJ_FILE)
+    topic_df = read_shared_table(TOPIC_FILE)
+
+    if 'name' not in org_df.columns or 'organisationID' not in org_df.columns:
+        raise ValueError("Organization DataFrame must contain 'name' and 'organisationID' columns.")
+
+    org_options_df = org_df.dropna(subset=['name', 'organisationID'])[['name', 'organisationID']]
+    org_options_df = org_options_df.assign(organisationID=org_options_df['organisationID'].astype(str))
+    org_options_df = org_options_df.drop_duplicates(subset=['organisationID'])
+    org_options_df = org_options_df.assign(
+        display_name=org_options_df['name'] + " (" + org_options_df['organisationID'] + ")"
+    ).sort_values(by='name')
+
+    organization_choices = pd.Series(org_options_df.display_name.values, index=org_options_df.organisationID).to_dict()
+
+    # A new frame rather than an in-place write: the table read is shared with the other apps in the process
+    org_df = org_df.assign(organisationID=org_df['organisationID'].astype(str))
+
+    # Calculate Top 10 organizations by project participation
+    if 'projectID' in org_df.columns:
+        org_project_counts = org_df['organisationID'].value_counts()
+        top_10_org_ids = tuple(org_project_counts.nlargest(10).index.astype(str).tolist())
+    else:
+        print("Warning: 'projectID' column not found in organization data for Top 10 calculation.")
+        top_10_org_ids = ()
+
+    print(f"Data loaded: {len(org_df)} orgs, {len(proj_df)} projects, {len(topic_df)} topics.")
+
+    version = dataset_version()
+    graph_index = load_or_build_graph_index(org_df, proj_df, topic_df, version)
+
+    return SharedDataset(
+        org_df=org_df,
+        proj_df=proj_df,
+        topic_df=topic_df,
+        organization_choices=MappingProxyType(organization_choices),
+        all_org_ids=tuple(org_options_df.organisationID.tolist()),
+        top_10_org_ids=top_10_org_ids,
+        graph_index=graph_index,
+        version=version,
+    )
+
+
+def get_shared_dataset():
+    """Return the process-wide dataset, loading it on first use.
+
+    Loading happens under a lock so concurrent sessions starting at the same
+    time still parse the inputs only once.
+    """
+    global _shared_dataset
+    if _shared_dataset is None:
+        with _lock:
+            if _shared_dataset is None:
+                _shared_dataset = _build_shared_dataset()
+    return _shared_dataset
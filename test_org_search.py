@@ -0,0 +1,66 @@
+import json
+import unicodedata
+
+import pandas as pd
+from starlette.requests import Request
+
+from org_search import SELECTIZE_SEARCH_FIELDS, build_org_search_index, update_selectize_search
+
+ORGS = pd.DataFrame({
+    "organisationID": ["1", "2", "3"],
+    "name": ["Katholieke Universiteit Leuven", "Fraunhofer Gesellschaft", "Société Générale"],
+    "shortName": ["KU Leuven", "FhG", "SocGen"],
+    "vatNumber": ["BE0419052173", "DE129515865", "FR27552120222"],
+})
+
+
+class RecordingSession:
+    """Just enough of a Shiny session to capture the search route and input message"""
+
+    def __init__(self):
+        self.routes = {}
+        self.messages = {}
+
+    def dynamic_route(self, name, handler):
+        self.routes[name] = handler
+        return f"session/test/dynamic_route/{name}"
+
+    def send_input_message(self, input_id, message):
+        self.messages[input_id] = message
+
+
+def _fetch(handler, query):
+    request = Request({"type": "http", "method": "GET", "query_string": f"query={query}&maxop=10".encode(), "headers": []})
+    return json.loads(handler(request).body)
+
+
+def _fold(text):
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)).casefold()
+
+
+def _client_keeps(option, query):
+    """Selectize's own filter over the returned options: every query token in one of the search fields"""
+    fields = [_fold(str(option.get(field, ""))) for field in SELECTIZE_SEARCH_FIELDS]
+    return all(any(token in field for field in fields) for token in _fold(query).split())
+
+
+def _search(query):
+    session = RecordingSession()
+    update_selectize_search("orgs", build_org_search_index(ORGS), session=session)
+    options = _fetch(session.routes["search_orgs"], query)
+    return [option["value"] for option in options if _client_keeps(option, query)]
+
+
+def test_short_name_match_reaches_client():
+    assert _search("FhG")[0] == "2"
+    assert _search("socgen") == ["3"]
+
+
+def test_vat_match_reaches_client():
+    assert _search("BE0419052173") == ["1"]
+    assert _search("de 129515865") == ["2"]
+
+
+def test_name_and_accent_insensitive_match_reaches_client():
+    assert _search("societe") == ["3"]
+    assert _search("leuven")[0] == "1"